@@ -1,15 +1,25 @@
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
 import joblib
 import logging
 from datetime import datetime, timedelta
+from feature_assembly import feature_assembler
 import warnings
 warnings.filterwarnings('ignore')
 
+# Readings assess_environmental_risks looks at, with the value it assumes when a
+# feature dict lacks one
+ENVIRONMENT_DEFAULTS = {
+    'chlorophyll_a': 0,
+    'dissolved_oxygen': 8,
+    'ph_level': 8.1,
+    'nitrate_nitrogen': 0,
+    'phosphate_phosphorus': 0
+}
+
+TOXIC_BLOOM_TYPES = ['dinoflagellate_bloom', 'cyanobacteria_bloom']
+
 class AlgalBloomPredictor:
     def __init__(self):
         self.bloom_classifier = RandomForestClassifier(n_estimators=150, random_state=42)
@@ -59,6 +69,7 @@ class AlgalBloomPredictor:
 
     def generate_synthetic_data(self, n_samples=3000):
         """Generate synthetic algal bloom data"""
+        import pandas as pd
         np.random.seed(42)
         
         # Generate base environmental conditions
@@ -216,17 +227,13 @@ class AlgalBloomPredictor:
         return bloom_type, max(0, min(100, severity))
 
     def preprocess_data(self, data):
-        """Preprocess input data for model"""
-        if isinstance(data, dict):
-            features = [data.get(feature, 0) for feature in self.feature_names]
-            return np.array(features).reshape(1, -1)
-        elif isinstance(data, pd.DataFrame):
-            return data[self.feature_names].values
-        else:
-            return data
+        """Preprocess input data for model (missing features are handled per CTAS_MISSING_FEATURES)"""
+        return feature_assembler(self.feature_names).assemble(data)
 
     def train(self, data=None):
         """Train the algal bloom prediction models"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report, accuracy_score
         if data is None:
             self.logger.info("Generating synthetic training data...")
             data = self.generate_synthetic_data()
@@ -283,8 +290,8 @@ class AlgalBloomPredictor:
             'feature_importance': dict(zip(self.feature_names, self.bloom_classifier.feature_importances_))
         }
 
-    def predict_bloom(self, features):
-        """Predict algal bloom type and severity"""
+    def predict_bloom(self, features, profile='full'):
+        """Predict algal bloom type and severity ('minimal' profile: labels and scores only)"""
         if not self.is_trained:
             raise ValueError("Model must be trained before prediction")
         
@@ -304,6 +311,13 @@ class AlgalBloomPredictor:
         if bloom_type != 'no_bloom':
             bloom_severity = max(0, min(100, self.severity_regressor.predict(X_scaled)[0]))
         
+        if profile == 'minimal':
+            return {
+                'bloom_type': bloom_type,
+                'bloom_severity': float(bloom_severity),
+                'risk_level': self.determine_risk_level(bloom_type, bloom_severity)
+            }
+        
         # Assess environmental risk factors
         risk_assessment = self.assess_environmental_risks(features)
         
@@ -317,6 +331,67 @@ class AlgalBloomPredictor:
             'monitoring_priority': self.determine_monitoring_priority(bloom_type, bloom_severity)
         }
 
+    def predict_bloom_batch(self, data, profile='full', features=None):
+        """
+        Vectorized predict_bloom over many rows: a DataFrame, an array in
+        feature_names order or a list of feature dicts. Classifies every row in
+        one call, runs the severity regressor on blooming rows only and
+        derives risk tiers with array comparisons. Returns a BloomBatchResult
+        whose row(i) equals predict_bloom on row i. When data is an assembled
+        matrix, features (the rows' feature dicts) lets environmental risks
+        and recommendations apply the single-row defaults for absent readings.
+        """
+        if not self.is_trained:
+            raise ValueError("Model must be trained before prediction")
+        
+        if features is None and isinstance(data, (list, tuple)):
+            features = data
+        n_features = len(self.feature_names)
+        X = self.preprocess_data(data) if len(data) else np.empty((0, n_features))
+        
+        # Predict bloom type (predict's argmax over predict_proba, from a single call)
+        classes = self.label_encoder.classes_
+        if len(X):
+            X_scaled = self.scaler.transform(X)
+            bloom_probabilities = self.bloom_classifier.predict_proba(X_scaled)
+        else:
+            X_scaled = X
+            bloom_probabilities = np.empty((0, len(classes)))
+        bloom_types = self.label_encoder.inverse_transform(
+            self.bloom_classifier.classes_.take(np.argmax(bloom_probabilities, axis=1))
+        )
+        
+        # Predict severity for rows predicted to bloom only
+        bloom_severity = np.zeros(len(X), dtype=np.float64)
+        blooming = bloom_types != 'no_bloom'
+        if blooming.any():
+            bloom_severity[blooming] = np.clip(self.severity_regressor.predict(X_scaled[blooming]), 0, 100)
+        
+        return BloomBatchResult(self, bloom_types, bloom_severity, bloom_probabilities,
+                                self.determine_risk_levels(bloom_types, bloom_severity),
+                                self.determine_monitoring_priorities(bloom_types, bloom_severity),
+                                X, features, profile)
+
+    def determine_risk_levels(self, bloom_types, severities):
+        """determine_risk_level over arrays of bloom types and severities"""
+        blooming = bloom_types != 'no_bloom'
+        toxic = np.isin(bloom_types, TOXIC_BLOOM_TYPES)
+        return np.select(
+            [~blooming, toxic & (severities > 70), toxic & (severities > 50), toxic & (severities > 30), toxic,
+             severities > 80, severities > 60],
+            ['low', 'extreme', 'high', 'moderate', 'low', 'high', 'moderate'], 'low'
+        ).astype(object)
+
+    def determine_monitoring_priorities(self, bloom_types, severities):
+        """determine_monitoring_priority over arrays of bloom types and severities"""
+        blooming = bloom_types != 'no_bloom'
+        toxic = np.isin(bloom_types, TOXIC_BLOOM_TYPES)
+        return np.select(
+            [~blooming, toxic & (severities > 60), toxic & (severities > 40), toxic,
+             severities > 70, severities > 50],
+            ['routine', 'critical', 'high', 'elevated', 'high', 'elevated'], 'routine'
+        ).astype(object)
+
     def assess_environmental_risks(self, features):
         """Assess environmental risk factors"""
         risks = {}
@@ -479,9 +554,9 @@ class AlgalBloomPredictor:
         joblib.dump(model_data, filepath)
         self.logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath):
+    def load_model(self, filepath, mmap_mode=None):
         """Load trained model"""
-        model_data = joblib.load(filepath)
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         
         self.bloom_classifier = model_data['bloom_classifier']
         self.severity_regressor = model_data['severity_regressor']
@@ -494,6 +569,116 @@ class AlgalBloomPredictor:
         
         self.logger.info(f"Model loaded from {filepath}")
 
+class BloomBatchResult:
+    """
+    Columnar predict_bloom_batch output. bloom_type, bloom_severity,
+    bloom_probabilities (one column per bloom_classes entry), risk_level and
+    monitoring_priority are arrays over the rows; environmental risks are
+    derived when first needed, and row(i) (or result[i]) builds
+    predict_bloom's dict for one row, recommendations included, on demand.
+    """
+
+    def __init__(self, model, bloom_type, bloom_severity, bloom_probabilities, risk_level,
+                 monitoring_priority, X, features=None, profile='full'):
+        self.model = model
+        self.bloom_type = bloom_type
+        self.bloom_severity = bloom_severity
+        self.bloom_probabilities = bloom_probabilities
+        self.bloom_classes = model.label_encoder.classes_
+        self.risk_level = risk_level
+        self.monitoring_priority = monitoring_priority
+        self.profile = profile
+        self._X = X
+        self._features = features
+        self._environment = None
+        self._environmental_risks = None
+
+    def __len__(self):
+        return len(self.bloom_severity)
+
+    def __getitem__(self, i):
+        return self.row(i)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(len(self)))
+
+    @property
+    def environment(self):
+        """The readings environmental risks are assessed on, with the single-row defaults for absent ones"""
+        if self._environment is None:
+            if self._features is not None:
+                self._environment = {
+                    name: np.fromiter((row.get(name, default) for row in self._features),
+                                      dtype=np.float64, count=len(self))
+                    for name, default in ENVIRONMENT_DEFAULTS.items()
+                }
+            else:
+                self._environment = {name: self._X[:, self.model.feature_names.index(name)]
+                                     for name in ENVIRONMENT_DEFAULTS}
+        return self._environment
+
+    @property
+    def environmental_risks(self):
+        """assess_environmental_risks as one column per factor"""
+        if self._environmental_risks is None:
+            environment = self.environment
+            thresholds = self.model.risk_thresholds
+            chl_a = environment['chlorophyll_a']
+            do = environment['dissolved_oxygen']
+            ph = environment['ph_level']
+            nutrients = environment['nitrate_nitrogen'] + environment['phosphate_phosphorus']
+            
+            self._environmental_risks = {
+                'chlorophyll_a': np.select(
+                    [chl_a > thresholds['chlorophyll_a'][tier] for tier in ('extreme', 'high', 'moderate', 'low')],
+                    ['extreme', 'high', 'moderate', 'low'], 'normal').astype(object),
+                'dissolved_oxygen': np.select(
+                    [do < thresholds['dissolved_oxygen']['hypoxic'], do < thresholds['dissolved_oxygen']['low']],
+                    ['hypoxic', 'low'], 'normal').astype(object),
+                'ph_level': np.select(
+                    [ph < thresholds['ph_level']['acidic'], ph > thresholds['ph_level']['alkaline']],
+                    ['acidic', 'alkaline'], 'normal').astype(object),
+                'nutrients': np.select(
+                    [nutrients > 8, nutrients > 5, nutrients > 2],
+                    ['very_high', 'high', 'moderate'], 'low').astype(object)
+            }
+        return self._environmental_risks
+
+    def features(self, i):
+        """Row i's feature dict, as predict_bloom would have been given it"""
+        if self._features is not None:
+            return self._features[i]
+        return dict(zip(self.model.feature_names, self._X[i].tolist()))
+
+    def recommendations(self, i):
+        """generate_recommendations for row i"""
+        return self.model.generate_recommendations(self.bloom_type[i], self.bloom_severity[i], self.features(i))
+
+    def row(self, i, profile=None):
+        """Row i as predict_bloom returns it (profile defaults to the one the batch was predicted with)"""
+        bloom_type = self.bloom_type[i]
+        bloom_severity = float(self.bloom_severity[i])
+        if (profile or self.profile) == 'minimal':
+            return {
+                'bloom_type': bloom_type,
+                'bloom_severity': bloom_severity,
+                'risk_level': self.risk_level[i]
+            }
+        
+        return {
+            'bloom_type': bloom_type,
+            'bloom_severity': bloom_severity,
+            'bloom_probabilities': dict(zip(self.bloom_classes, self.bloom_probabilities[i].tolist())),
+            'risk_level': self.risk_level[i],
+            'environmental_risks': {name: tiers[i] for name, tiers in self.environmental_risks.items()},
+            'recommendations': self.recommendations(i),
+            'monitoring_priority': self.monitoring_priority[i]
+        }
+
+    def rows(self, profile=None):
+        """Every row as predict_bloom returns it"""
+        return [self.row(i, profile) for i in range(len(self))]
+
 # Example usage and testing
 if __name__ == "__main__":
     # Initialize and train model
@@ -0,0 +1,83 @@
+"""
+CTAS Admission Control
+Assigns every request a priority class from its API key or X-CTAS-Priority
+header; the inference executor admits waiting work highest priority first and
+sheds low-priority work first under overload. The request's deadline
+(X-CTAS-Deadline-Ms) is set here too.
+
+Requests with neither are interactive traffic and default to high
+(CTAS_DEFAULT_PRIORITY). Low is the default of background work: grid scoring
+(CTAS_BACKGROUND_PATHS) and the station refresher, while bulk jobs run on
+their own process pool.
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+from deadlines import DEADLINE_HEADER, parse_deadline, request_deadline
+from inference_executor import PRIORITIES, parse_model_settings, request_priority
+
+PRIORITY_HEADER = 'x-ctas-priority'
+API_KEY_HEADER = 'x-api-key'
+
+# Path prefixes whose requests default to low priority
+BACKGROUND_PATHS = tuple(p.strip() for p in os.getenv('CTAS_BACKGROUND_PATHS', '/predict/grid').split(',') if p.strip())
+
+
+class PriorityResolver:
+    def __init__(self, api_key_priorities: Optional[Dict[str, str]] = None,
+                 allow_header: Optional[bool] = None, default_priority: Optional[str] = None,
+                 background_paths: Optional[Tuple[str, ...]] = None):
+        # 'ops-key=high,dashboard-key=low'
+        self.api_key_priorities = api_key_priorities if api_key_priorities is not None else parse_model_settings(
+            os.getenv('CTAS_API_KEY_PRIORITIES', ''), str
+        )
+        if allow_header is None:
+            allow_header = os.getenv('CTAS_PRIORITY_HEADER', 'true').lower() in ('1', 'true', 'yes')
+        self.allow_header = allow_header
+        self.default_priority = default_priority or os.getenv('CTAS_DEFAULT_PRIORITY', PRIORITIES[0])
+        self.background_paths = background_paths if background_paths is not None else BACKGROUND_PATHS
+
+        for priority in (self.default_priority, *self.api_key_priorities.values()):
+            if priority not in PRIORITIES:
+                raise ValueError(f"Unknown priority '{priority}' (expected one of {', '.join(PRIORITIES)})")
+
+    def resolve(self, headers: Dict[str, str], path: str = '') -> str:
+        """
+        A known API key decides the priority; otherwise the X-CTAS-Priority
+        header does, unless CTAS_PRIORITY_HEADER=false (keys only). Without
+        either, background paths are low priority and everything else gets
+        the default.
+        """
+        api_key = headers.get(API_KEY_HEADER)
+        if api_key in self.api_key_priorities:
+            return self.api_key_priorities[api_key]
+
+        requested = headers.get(PRIORITY_HEADER, '').strip().lower()
+        if self.allow_header and requested in PRIORITIES:
+            return requested
+        if path.startswith(self.background_paths):
+            return PRIORITIES[-1]
+        return self.default_priority
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware setting the request's priority (and HTTP deadline) for the model calls it makes"""
+
+    def __init__(self, app, resolver: Optional[PriorityResolver] = None):
+        self.app = app
+        self.resolver = resolver or PriorityResolver()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket'):
+            return await self.app(scope, receive, send)
+
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope.get('headers', [])}
+        token = request_priority.set(self.resolver.resolve(headers, scope.get('path', '')))
+        # A stream session has no single deadline; its readings are scored as they arrive
+        deadline_token = request_deadline.set(parse_deadline(headers.get(DEADLINE_HEADER)) if scope['type'] == 'http' else None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(deadline_token)
+            request_priority.reset(token)
@@ -0,0 +1,308 @@
+"""
+CTAS Batch Inference Helpers
+Block validation and vectorized model calls for the /predict/*/batch endpoints
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class StageTimer:
+    """Accumulates wall time per prediction stage between successive mark() calls"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+def field_bounds(input_model) -> Dict[str, Tuple[Any, Any, bool]]:
+    """Collect (ge, le, is_int) constraints for every numeric field of a Pydantic model"""
+    fields = getattr(input_model, 'model_fields', None) or input_model.__fields__
+    bounds = {}
+
+    for name, field in fields.items():
+        annotation = getattr(field, 'annotation', None) or getattr(field, 'outer_type_', None)
+        if annotation not in (int, float):
+            continue
+
+        info = getattr(field, 'field_info', field)
+        ge = getattr(info, 'ge', None)
+        le = getattr(info, 'le', None)
+        for constraint in getattr(info, 'metadata', []):
+            ge = getattr(constraint, 'ge', ge)
+            le = getattr(constraint, 'le', le)
+
+        bounds[name] = (ge, le, annotation is int)
+
+    return bounds
+
+
+def _check_column(row_errors: Dict[int, List[str]], name: str, column: np.ndarray, bounds: Tuple[Any, Any, bool],
+                  missing: np.ndarray, not_numeric: Optional[np.ndarray] = None):
+    """Append per-row messages for one column that fails its required/numeric/range/integer constraints"""
+    ge, le, is_int = bounds
+    checks = [(missing, f"{name}: field required")]
+    if not_numeric is not None:
+        checks.append((not_numeric, f"{name}: must be a number"))
+
+    with np.errstate(invalid='ignore'):
+        if ge is not None:
+            checks.append((column < ge, f"{name}: must be >= {ge}"))
+        if le is not None:
+            checks.append((column > le, f"{name}: must be <= {le}"))
+        if is_int:
+            checks.append((np.isfinite(column) & (column != np.floor(column)), f"{name}: must be an integer"))
+
+    for mask, message in checks:
+        for i in np.flatnonzero(mask):
+            row_errors.setdefault(int(i), []).append(message)
+
+
+def validate_rows(input_model, rows: List[Any]) -> Tuple[List[int], List[str], np.ndarray, Dict[int, str]]:
+    """
+    Validate a block of raw rows column by column against a Pydantic input model
+
+    Returns the indices of valid rows, the column names, the float matrix of
+    valid rows (columns in field order) and a dict of per-row error messages.
+    """
+    bounds = field_bounds(input_model)
+    names = list(bounds)
+    n_rows = len(rows)
+
+    X = np.zeros((n_rows, len(names)), dtype=np.float64)
+    row_errors = {}
+
+    is_object = np.array([isinstance(row, dict) for row in rows], dtype=bool)
+    for i in np.flatnonzero(~is_object):
+        row_errors[int(i)] = ['row must be a JSON object']
+
+    for j, name in enumerate(names):
+        raw = pd.Series([row.get(name) if isinstance(row, dict) else None for row in rows], dtype=object)
+        missing = raw.isna().to_numpy() & is_object
+        column = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64)
+        not_numeric = np.isnan(column) & ~missing & is_object
+
+        _check_column(row_errors, name, column, bounds[name], missing, not_numeric)
+        X[:, j] = column
+
+    errors = {i: '; '.join(messages) for i, messages in row_errors.items()}
+    valid = [i for i in range(n_rows) if i not in errors]
+
+    return valid, names, X[valid], errors
+
+
+def validate_matrix(input_model, names: List[str], X: np.ndarray) -> Tuple[List[int], Dict[int, str]]:
+    """
+    Validate an already-numeric block (columnar request bodies) against a Pydantic input model
+
+    Columns stay where they are; NaN counts as a missing value. Returns the
+    indices of valid rows and a dict of per-row error messages. Raises
+    ValueError when a required column is absent altogether.
+    """
+    bounds = field_bounds(input_model)
+    absent = [name for name in bounds if name not in names]
+    if absent:
+        raise ValueError(f"Missing required columns: {', '.join(absent)}")
+
+    row_errors = {}
+    for name, field in bounds.items():
+        column = X[:, names.index(name)]
+        _check_column(row_errors, name, column, field, np.isnan(column))
+
+    errors = {i: '; '.join(messages) for i, messages in row_errors.items()}
+    valid = [i for i in range(len(X)) if i not in errors]
+
+    return valid, errors
+
+
+def _assembler(model):
+    # Imported on first use: feature_assembly sits beside the model classes, whose directory is on sys.path by then
+    from feature_assembly import feature_assembler
+    return feature_assembler(model.feature_names)
+
+
+def assemble_matrix(model, names: List[str], X: np.ndarray) -> np.ndarray:
+    """Reorder validated columns into the model's feature_names order (no copy when already in order)"""
+    return _assembler(model).matrix(X, names)
+
+
+def rows_to_matrix(model, rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[int]]:
+    """
+    Stack feature dicts into one matrix, as preprocess_data does for a single dict
+
+    Rows whose values cannot be converted to float (or that lack features,
+    with CTAS_MISSING_FEATURES=error) are left out; the positions of the rows
+    that made it into the matrix are returned alongside it.
+    """
+    X, positions, _ = _assembler(model).rows(rows)
+    return X, positions
+
+
+def _postprocess_rows(n_rows, build_row):
+    """Run per-row post-processing, keeping an exception in place of any row that fails"""
+    results = []
+    for i in range(n_rows):
+        try:
+            results.append(build_row(i))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def predict_threat_batch(model, X: np.ndarray, rows: List[Dict[str, Any]],
+                         timer: Optional[StageTimer] = None, profile: str = 'full') -> List[Any]:
+    """Vectorized CoastalThreatModel.predict_threat over a feature matrix"""
+    if not model.is_trained:
+        raise ValueError("Model must be trained before making predictions")
+
+    timer = timer or StageTimer()
+    X_scaled = model.scaler.transform(X)
+    timer.mark('scaling')
+    threat_proba = model.threat_classifier.predict_proba(X_scaled)
+    severity_scores = np.clip(model.severity_regressor.predict(X_scaled), 0, 100)
+    threat_classes = model.label_encoder.classes_
+    timer.mark('model_call')
+
+    if profile == 'minimal':
+        # Labels and scores only: no probability dicts, timestamps or warnings
+        primary_threats = threat_classes.take(np.argmax(threat_proba, axis=1)).tolist()
+        confidences = (threat_proba.max(axis=1) * 100).tolist()
+        results = _postprocess_rows(len(X), lambda i: {
+            'primary_threat': primary_threats[i],
+            'threat_confidence': confidences[i],
+            'severity_score': severity_scores[i],
+            'risk_level': model.calculate_risk_level(severity_scores[i], confidences[i])
+        })
+        timer.mark('postprocessing')
+        return results
+
+    def build_row(i):
+        threat_predictions = dict(zip(threat_classes, threat_proba[i]))
+        most_likely_threat = max(threat_predictions, key=threat_predictions.get)
+        threat_confidence = max(threat_proba[i]) * 100
+        severity_score = severity_scores[i]
+
+        return {
+            'primary_threat': most_likely_threat,
+            'threat_confidence': threat_confidence,
+            'severity_score': severity_score,
+            'risk_level': model.calculate_risk_level(severity_score, threat_confidence),
+            'all_threat_probabilities': threat_predictions,
+            'timestamp': datetime.now().isoformat(),
+            'warnings': model.generate_warnings(most_likely_threat, severity_score)
+        }
+
+    results = _postprocess_rows(len(X), build_row)
+    timer.mark('postprocessing')
+    return results
+
+
+def predict_health_batch(model, X: np.ndarray, rows: List[Dict[str, Any]],
+                         timer: Optional[StageTimer] = None, profile: str = 'full') -> List[Any]:
+    """Vectorized MangroveHealthModel.predict_health over a feature matrix"""
+    if not model.is_trained:
+        raise ValueError("Model must be trained before making predictions")
+
+    timer = timer or StageTimer()
+    X_scaled = model.scaler.transform(X)
+    timer.mark('scaling')
+    health_scores = model.health_model.predict(X_scaled)
+    anomalies = model.anomaly_detector.predict(X_scaled) == -1
+    timer.mark('model_call')
+
+    if profile == 'minimal':
+        results = _postprocess_rows(len(X), lambda i: {
+            'health_score': max(0, min(100, health_scores[i])),
+            'health_category': model.categorize_health(health_scores[i]),
+            'is_anomaly': bool(anomalies[i])
+        })
+        timer.mark('postprocessing')
+        return results
+
+    def build_row(i):
+        health_score = health_scores[i]
+        return {
+            'health_score': max(0, min(100, health_score)),
+            'health_category': model.categorize_health(health_score),
+            'is_anomaly': bool(anomalies[i]),
+            'confidence': model.calculate_confidence(rows[i]),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    results = _postprocess_rows(len(X), build_row)
+    timer.mark('postprocessing')
+    return results
+
+
+def predict_bloom_batch(model, X: np.ndarray, rows: List[Dict[str, Any]],
+                        timer: Optional[StageTimer] = None, profile: str = 'full') -> List[Any]:
+    """AlgalBloomPredictor.predict_bloom_batch over a feature matrix, materialized as response rows"""
+    timer = timer or StageTimer()
+    result = model.predict_bloom_batch(X, profile=profile, features=rows)
+    timer.mark('model_call')
+    results = _postprocess_rows(len(result), result.row)
+    timer.mark('postprocessing')
+    return results
+
+
+def predict_rows_batch(model, X: np.ndarray, rows: List[Dict[str, Any]], method_name: str,
+                       profile: str = 'full') -> List[Any]:
+    """Fallback for models without a vectorized path: call the single-row method per row in one task"""
+    predict = getattr(model, method_name)
+    return _postprocess_rows(len(rows), lambda i: predict(rows[i], profile=profile))
+
+
+def predict_single(model, method_name: str, features: Dict[str, Any], profile: str = 'full') -> Any:
+    """Single-row prediction with a response profile (executor tasks take positional arguments only)"""
+    return getattr(model, method_name)(features, profile=profile)
+
+
+def predict_matrix(model, X: np.ndarray, rows: List[Dict[str, Any]], batch_fn,
+                   profile: str = 'full') -> Tuple[List[Any], Dict[str, float]]:
+    """Run a vectorized predictor, returning its per-row results and per-stage timings"""
+    timer = StageTimer()
+    predictions = batch_fn(model, X, rows, timer, profile)
+    return predictions, timer.timings
+
+
+def predict_feature_rows(model, rows: List[Dict[str, Any]], batch_fn,
+                         profile: str = 'full') -> Tuple[List[Any], Dict[str, float]]:
+    """
+    Stack single-request feature dicts and run one vectorized prediction
+
+    Returns results in row order (an exception for rows that could not be
+    converted) and per-stage timings.
+    """
+    timer = StageTimer()
+    X, positions = rows_to_matrix(model, rows)
+    timer.mark('preprocessing')
+    results = [ValueError("Features could not be converted to numbers") for _ in rows]
+
+    if positions:
+        predictions = batch_fn(model, X, [rows[p] for p in positions], timer, profile)
+        for p, prediction in zip(positions, predictions):
+            results[p] = prediction
+
+    return results, timer.timings
+
+
+def to_builtin(value: Any) -> Any:
+    """Convert numpy scalars and arrays inside nested prediction dicts to plain Python types"""
+    if isinstance(value, dict):
+        return {(key.item() if isinstance(key, np.generic) else key): to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_builtin(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
@@ -0,0 +1,526 @@
+"""
+CTAS Bulk Scoring Jobs
+Scores whole datasets (CSV or Parquet) in the background: the input is split
+into chunks scored on a dedicated low-priority process pool, each chunk's
+results are written to its own part file as soon as it finishes, and jobs
+pick up where they left off after a restart
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from batch_inference import predict_feature_rows, predict_rows_batch, to_builtin
+from columnar_io import results_to_columns
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMATS = ('csv', 'parquet')
+FINISHED = ('completed', 'failed', 'cancelled')
+
+# Job IDs are hex (uuid4 prefixes); anything else, such as '..', never names a job directory
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]+$')
+
+
+class JobError(ValueError):
+    """Raised for a job request that cannot be accepted (unknown format, unreadable input, ...)"""
+
+
+class UploadTooLargeError(JobError):
+    """Raised when an uploaded dataset exceeds CTAS_BULK_MAX_UPLOAD_MB"""
+
+    status_code = 413
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the maximum of {max_bytes // (1024 * 1024)} MB")
+        self.max_bytes = max_bytes
+
+
+def parquet_supported() -> bool:
+    return pq is not None
+
+
+def detect_format(path: str, content_type: Optional[str] = None) -> str:
+    """Input format from the content type or file extension"""
+    if (content_type and 'parquet' in content_type) or path.endswith('.parquet'):
+        return 'parquet'
+    if (content_type and 'csv' in content_type) or path.endswith('.csv'):
+        return 'csv'
+    raise JobError("Input must be CSV or Parquet (by content type or .csv/.parquet extension)")
+
+
+def index_csv(path: str, chunk_rows: int) -> Tuple[List[str], List[int], int]:
+    """
+    Column names, the byte offset of every chunk's first row and the row count
+    of a CSV file, so each chunk can be read by seeking straight to it (rows
+    must not contain quoted line breaks)
+    """
+    offsets = []
+    rows = 0
+    with open(path, 'rb') as f:
+        header = f.readline().decode('utf-8-sig').strip()
+        offset = f.tell()
+        for line in f:
+            if line.strip():
+                if rows % chunk_rows == 0:
+                    offsets.append(offset)
+                rows += 1
+            offset += len(line)
+    if not header:
+        raise JobError("CSV input has no header row")
+    columns = [name.strip().strip('"') for name in header.split(',')]
+    return columns, offsets, rows
+
+
+def flatten_prediction(prediction: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """Nested dicts become dotted columns (bloom_probabilities.diatom_bloom); lists become JSON strings"""
+    flat = {}
+    for name, value in prediction.items():
+        key = f'{prefix}{name}'
+        if isinstance(value, dict):
+            flat.update(flatten_prediction(value, f'{key}.'))
+        elif isinstance(value, (list, tuple)):
+            flat[key] = json.dumps(to_builtin(value), default=str)
+        else:
+            flat[key] = value
+    return flat
+
+
+# Models loaded by this pool worker, keyed by artifact
+_worker_models: Dict[str, Any] = {}
+
+
+def _init_worker(nice: int):
+    """Bulk workers run at a lower CPU priority than the serving process"""
+    if nice:
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+
+
+def _worker_model(model_name: str, artifact: str):
+    if artifact not in _worker_models:
+        if MODELS_DIR not in sys.path:
+            sys.path.append(MODELS_DIR)
+        from export_model_artifacts import load_model_class
+
+        model = load_model_class(model_name)()
+        model.load_model(artifact, 'r')
+        _worker_models[artifact] = model
+    return _worker_models[artifact]
+
+
+def _read_chunk(job: Dict[str, Any], chunk: int) -> pd.DataFrame:
+    source = job['input']
+    start = chunk * job['chunk_rows']
+    rows = min(job['chunk_rows'], job['total_rows'] - start)
+    if source['format'] == 'csv':
+        with open(source['path'], 'rb') as f:
+            f.seek(source['offsets'][chunk])
+            return pd.read_csv(f, header=None, names=source['columns'], nrows=rows)
+    return pq.read_table(source['path'], memory_map=True).slice(start, rows).to_pandas()
+
+
+def score_chunk(job: Dict[str, Any], chunk: int, batch_fn: Optional[Callable]) -> Dict[str, Any]:
+    """
+    Pool worker entry point: score one chunk of a job's input and write its part file
+
+    Rows with a missing or non-numeric model feature are reported as failed;
+    the remaining rows go through the model's vectorized predictor (or its
+    single-row method when it has none). The part file is written under a
+    temporary name and renamed, so a part that exists is always complete.
+    """
+    started = time.perf_counter()
+    model = _worker_model(job['model'], job['artifact'])
+    frame = _read_chunk(job, chunk)
+    first_row = chunk * job['chunk_rows']
+
+    features = frame.reindex(columns=model.feature_names).apply(pd.to_numeric, errors='coerce')
+    complete = np.isfinite(features.to_numpy(dtype=np.float64)).all(axis=1)
+
+    rows = features[complete].to_dict(orient='records')
+    if batch_fn is not None:
+        predictions, _ = predict_feature_rows(model, rows, batch_fn, job['profile'])
+    else:
+        predictions = predict_rows_batch(model, None, rows, job['method'], job['profile'])
+
+    results = []
+    predicted = iter(predictions)
+    keep = frame.reindex(columns=job['keep_columns']).to_dict(orient='records') if job['keep_columns'] else None
+    for i, ok in enumerate(complete):
+        result = {'row': first_row + i, **(keep[i] if keep else {})}
+        prediction = next(predicted) if ok else ValueError("Missing or non-numeric feature values")
+        if isinstance(prediction, Exception):
+            result.update(success=False, error=str(prediction))
+        else:
+            result.update(success=True, error=None, **flatten_prediction(to_builtin(prediction)))
+        results.append(result)
+
+    output = pd.DataFrame(results_to_columns(results))
+    path = part_path(job, chunk)
+    tmp_path = f'{path}.tmp'
+    if job['output_format'] == 'parquet':
+        output.to_parquet(tmp_path, index=False)
+    else:
+        output.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    return {
+        'chunk': chunk,
+        'rows': len(results),
+        'failed': int((~complete).sum()) + sum(isinstance(p, Exception) for p in predictions),
+        'time_s': round(time.perf_counter() - started, 3)
+    }
+
+
+def part_path(job: Dict[str, Any], chunk: int) -> str:
+    return os.path.join(job['dir'], 'parts', f"part-{chunk:06d}.{job['output_format']}")
+
+
+def result_path(job: Dict[str, Any]) -> str:
+    return os.path.join(job['dir'], f"result.{job['output_format']}")
+
+
+class BulkJobManager:
+    def __init__(self, jobs_dir: Optional[str] = None, workers: Optional[int] = None,
+                 chunk_rows: Optional[int] = None, nice: Optional[int] = None,
+                 should_yield: Optional[Callable[[], bool]] = None):
+        self.jobs_dir = jobs_dir or os.getenv('CTAS_BULK_JOBS_DIR', os.path.join(MODELS_DIR, 'bulk_jobs'))
+        self.workers = int(workers or os.getenv('CTAS_BULK_WORKERS', '1'))
+        self.chunk_rows = int(chunk_rows or os.getenv('CTAS_BULK_CHUNK_ROWS', '5000'))
+        self.nice = int(nice if nice is not None else os.getenv('CTAS_BULK_NICE', '10'))
+        # Local input paths must lie under one of these directories (none: uploads only)
+        self.input_dirs = [os.path.realpath(path) for path in os.getenv('CTAS_BULK_INPUT_DIRS', '').split(',') if path]
+        self.rescan_s = float(os.getenv('CTAS_BULK_RESCAN_S', '30'))
+        # Largest dataset accepted as a request body (0 = no limit)
+        self.max_upload_bytes = int(float(os.getenv('CTAS_BULK_MAX_UPLOAD_MB', '1024')) * 1024 * 1024)
+        # Interactive work waiting for the inference executor holds back the next chunk
+        self.should_yield = should_yield or (lambda: False)
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, int] = {}
+        self._batch_functions: Dict[str, Optional[Callable]] = {}
+        self._scanner: Optional[asyncio.Task] = None
+
+    # Job records
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id, 'job.json')
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's record, None for unknown (or malformed) job IDs"""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(self._job_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, job: Dict[str, Any]):
+        job['updated_at'] = datetime.now().isoformat()
+        path = self._job_path(job['id'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(job, f, indent=2, default=str)
+        os.replace(path + '.tmp', path)
+
+    def _cancelled(self, job_id: str) -> bool:
+        return os.path.exists(os.path.join(self.jobs_dir, job_id, 'cancelled'))
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.jobs_dir):
+            return []
+        jobs = (self.load(job_id) for job_id in sorted(os.listdir(self.jobs_dir)))
+        return [self.progress(job) for job in jobs if job]
+
+    def progress(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Public view of a job: status, chunk and row counts, throughput and estimated time left"""
+        done = job['chunks_done']
+        rows_done = sum(stats['rows'] for stats in done.values())
+        view = {name: job[name] for name in ('id', 'model', 'status', 'output_format', 'total_rows', 'chunks',
+                                             'created_at', 'started_at', 'finished_at', 'error')}
+        view.update({
+            'chunks_done': len(done),
+            'rows_done': rows_done,
+            'rows_failed': sum(stats['failed'] for stats in done.values()),
+            'percent': round(100 * rows_done / job['total_rows'], 1) if job['total_rows'] else 100.0,
+            'eta_s': None
+        })
+        if job['status'] == 'running' and done and job.get('run_time_s'):
+            rate = rows_done / job['run_time_s']
+            view['eta_s'] = round((job['total_rows'] - rows_done) / rate, 1) if rate else None
+        if job['status'] == 'completed':
+            view['result'] = f"/jobs/{job['id']}/result"
+        return view
+
+    # Submission
+
+    def check_input_path(self, path: str) -> str:
+        """Resolve a local input path, which must lie under CTAS_BULK_INPUT_DIRS"""
+        resolved = os.path.realpath(path)
+        if not any(resolved == root or resolved.startswith(root + os.sep) for root in self.input_dirs):
+            raise PermissionError("Local input paths are limited to CTAS_BULK_INPUT_DIRS")
+        if not os.path.isfile(resolved):
+            raise JobError(f"Input file not found: {path}")
+        return resolved
+
+    def new_job_dir(self) -> Tuple[str, str]:
+        job_id = uuid.uuid4().hex[:12]
+        directory = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(os.path.join(directory, 'parts'))
+        return job_id, directory
+
+    async def save_upload(self, blocks, path: str, declared_bytes: Optional[int] = None):
+        """Write a request body to path, refusing bodies above max_upload_bytes (by declared length first)"""
+        limit = self.max_upload_bytes
+        if limit and declared_bytes is not None and declared_bytes > limit:
+            raise UploadTooLargeError(limit)
+        written = 0
+        with open(path, 'wb') as f:
+            async for block in blocks:
+                written += len(block)
+                if limit and written > limit:
+                    raise UploadTooLargeError(limit)
+                f.write(block)
+
+    def create(self, job_id: str, model_name: str, method: str, artifact: str, input_path: str,
+               input_format: str, output_format: str, profile: str = 'full',
+               keep_columns: Optional[List[str]] = None, uploaded: bool = False) -> Dict[str, Any]:
+        """Index the input and record a queued job (runs in a thread: indexing reads the whole file)"""
+        if output_format not in FORMATS:
+            raise JobError(f"Unknown output format '{output_format}' (expected csv or parquet)")
+        if 'parquet' in (input_format, output_format) and not parquet_supported():
+            raise JobError("Parquet input and output need pyarrow")
+
+        source = {'path': input_path, 'format': input_format, 'uploaded': uploaded}
+        if input_format == 'csv':
+            source['columns'], source['offsets'], total_rows = index_csv(input_path, self.chunk_rows)
+        else:
+            total_rows = pq.ParquetFile(input_path).metadata.num_rows
+            source['columns'] = pq.ParquetFile(input_path).schema_arrow.names
+
+        missing = [name for name in keep_columns or [] if name not in source['columns']]
+        if missing:
+            raise JobError(f"keep_columns not in the input: {', '.join(missing)}")
+
+        job = {
+            'id': job_id,
+            'dir': os.path.join(self.jobs_dir, job_id),
+            'model': model_name,
+            'method': method,
+            'artifact': artifact,
+            'profile': profile,
+            'input': source,
+            'output_format': output_format,
+            'keep_columns': keep_columns or [],
+            'chunk_rows': self.chunk_rows,
+            'total_rows': total_rows,
+            'chunks': math.ceil(total_rows / self.chunk_rows),
+            'chunks_done': {},
+            'status': 'queued',
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'run_time_s': 0.0,
+            'error': None
+        }
+        self._save(job)
+        return job
+
+    # Execution
+
+    def start(self, batch_functions: Dict[str, Optional[Callable]]):
+        """Resume unfinished jobs and keep looking for jobs another serving process left behind"""
+        self._batch_functions = batch_functions
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._scanner = asyncio.ensure_future(self._scan_forever())
+
+    def _claim(self, job_id: str) -> bool:
+        """Lock a job for this process (serve.py workers share the jobs directory); the lock dies with the process"""
+        if job_id in self._locks:
+            return True
+        fd = os.open(os.path.join(self.jobs_dir, job_id, 'lock'), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._locks[job_id] = fd
+        return True
+
+    def _release(self, job_id: str):
+        fd = self._locks.pop(job_id, None)
+        if fd is not None:
+            os.close(fd)
+
+    def schedule(self, job_id: str) -> bool:
+        if job_id in self._running or not self._claim(job_id):
+            return False
+        task = asyncio.ensure_future(self._run(job_id))
+        self._running[job_id] = task
+        task.add_done_callback(lambda _: self._running.pop(job_id, None))
+        return True
+
+    async def _scan_forever(self):
+        while True:
+            try:
+                for job_id in os.listdir(self.jobs_dir):
+                    job = self.load(job_id)
+                    if job and job['status'] not in FINISHED and self.schedule(job_id):
+                        logger.info(f"Bulk job {job_id} resumed at chunk {len(job['chunks_done'])}/{job['chunks']}")
+            except Exception as e:
+                logger.warning(f"Bulk job scan failed: {e}")
+            await asyncio.sleep(self.rescan_s)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_worker, initargs=(self.nice,))
+        return self._pool
+
+    async def _run(self, job_id: str):
+        job = self.load(job_id)
+        try:
+            # Parts written before a restart count as done, even when the record missed them
+            for chunk in range(job['chunks']):
+                if str(chunk) not in job['chunks_done'] and os.path.exists(part_path(job, chunk)):
+                    job['chunks_done'][str(chunk)] = await asyncio.to_thread(self._part_stats, job, chunk)
+
+            job['status'] = 'running'
+            job['started_at'] = job['started_at'] or datetime.now().isoformat()
+            self._save(job)
+
+            pending = [chunk for chunk in range(job['chunks']) if str(chunk) not in job['chunks_done']]
+            in_flight = set()
+            loop = asyncio.get_running_loop()
+            batch_fn = self._batch_functions.get(job['model'])
+
+            while pending or in_flight:
+                while pending and len(in_flight) < self.workers and not self._cancelled(job_id):
+                    if self.should_yield():
+                        break
+                    started = time.perf_counter()
+                    future = loop.run_in_executor(self._get_pool(), score_chunk, job, pending.pop(0), batch_fn)
+                    in_flight.add(asyncio.ensure_future(self._timed(future, started)))
+
+                if not in_flight:
+                    if self._cancelled(job_id):
+                        break
+                    await asyncio.sleep(0.1)
+                    continue
+
+                done, in_flight = await asyncio.wait(in_flight, timeout=0.5, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stats, elapsed = task.result()
+                    job['chunks_done'][str(stats['chunk'])] = stats
+                    job['run_time_s'] += elapsed
+                if done:
+                    self._save(job)
+
+            if self._cancelled(job_id):
+                job['status'] = 'cancelled'
+            else:
+                await asyncio.to_thread(self._merge, job)
+                job['status'] = 'completed'
+                logger.info(f"Bulk job {job_id}: {job['total_rows']} rows scored in {job['run_time_s']:.1f} s of worker time")
+        except Exception as e:
+            logger.error(f"Bulk job {job_id} failed: {e}")
+            job['status'] = 'failed'
+            job['error'] = str(e)
+        finally:
+            job['finished_at'] = datetime.now().isoformat() if job['status'] in FINISHED else None
+            self._save(job)
+            self._release(job_id)
+
+    @staticmethod
+    async def _timed(future, started: float):
+        stats = await future
+        return stats, time.perf_counter() - started
+
+    @staticmethod
+    def _part_stats(job: Dict[str, Any], chunk: int) -> Dict[str, Any]:
+        path = part_path(job, chunk)
+        frame = pd.read_parquet(path) if job['output_format'] == 'parquet' else pd.read_csv(path)
+        return {'chunk': chunk, 'rows': len(frame), 'failed': int((~frame['success'].astype(bool)).sum()), 'time_s': None}
+
+    @staticmethod
+    def _merge(job: Dict[str, Any]):
+        """Combine the part files into one result file (columns are aligned across parts) and drop the parts"""
+        paths = [part_path(job, chunk) for chunk in range(job['chunks'])]
+        read = pd.read_parquet if job['output_format'] == 'parquet' else pd.read_csv
+        result = pd.concat([read(path) for path in paths], ignore_index=True) if paths else pd.DataFrame()
+
+        output = result_path(job)
+        if job['output_format'] == 'parquet':
+            result.to_parquet(output + '.tmp', index=False)
+        else:
+            result.to_csv(output + '.tmp', index=False)
+        os.replace(output + '.tmp', output)
+        shutil.rmtree(os.path.join(job['dir'], 'parts'), ignore_errors=True)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Stop scheduling a job's chunks; a job that is not running here is marked cancelled directly"""
+        job = self.load(job_id)
+        if job is None:
+            return None
+        if job['status'] not in FINISHED:
+            open(os.path.join(self.jobs_dir, job_id, 'cancelled'), 'w').close()
+            if job_id not in self._running and self._claim(job_id):
+                job['status'] = 'cancelled'
+                job['finished_at'] = datetime.now().isoformat()
+                self._save(job)
+                self._release(job_id)
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """Remove a finished job and its files"""
+        job = self.load(job_id)
+        if job is None or job['status'] not in FINISHED:
+            return False
+        shutil.rmtree(os.path.join(self.jobs_dir, job_id), ignore_errors=True)
+        return True
+
+    def shutdown(self):
+        """Stop scheduling chunks; unfinished jobs resume from their part files at the next start"""
+        if self._scanner is not None:
+            self._scanner.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        for job_id in list(self._locks):
+            self._release(job_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'jobs_dir': self.jobs_dir,
+            'workers': self.workers,
+            'chunk_rows': self.chunk_rows,
+            'nice': self.nice,
+            'running': sorted(self._running)
+        }
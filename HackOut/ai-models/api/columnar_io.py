@@ -0,0 +1,192 @@
+"""
+CTAS Columnar I/O
+Decoding and encoding of columnar request/response bodies (Arrow IPC streams,
+NumPy .npy matrices and msgpack) for bulk scoring without per-row JSON parsing
+"""
+
+import io
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Optional codecs: formats whose library is missing are reported as unsupported
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+NPY = 'application/x-npy'
+MSGPACK = 'application/msgpack'
+JSON = 'application/json'
+
+MEDIA_TYPE_ALIASES = {
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+    'application/x-numpy': NPY
+}
+
+COLUMNAR_MEDIA_TYPES = (ARROW_STREAM, NPY, MSGPACK)
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised for a media type that is unknown or whose codec is not installed"""
+
+
+def normalize_media_type(content_type: Optional[str]) -> str:
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(media_type, media_type)
+
+
+def _require_codec(media_type: str):
+    if media_type == ARROW_STREAM and pa is None:
+        raise UnsupportedFormatError("Arrow IPC bodies require pyarrow, which is not installed")
+    if media_type == MSGPACK and msgpack is None:
+        raise UnsupportedFormatError("msgpack bodies require msgpack, which is not installed")
+    if media_type not in COLUMNAR_MEDIA_TYPES:
+        raise UnsupportedFormatError(f"Unsupported media type '{media_type}'")
+
+
+def _as_float_matrix(array: np.ndarray) -> np.ndarray:
+    """Float64 view when the dtype already matches, otherwise one converting copy"""
+    if array.ndim == 1:
+        array = array.reshape(1, -1)
+    if array.ndim != 2:
+        raise ValueError(f"Expected a 2-D matrix, got {array.ndim} dimensions")
+    return array if array.dtype == np.float64 else array.astype(np.float64)
+
+
+def _decode_npy(body: bytes) -> np.ndarray:
+    """Wrap the .npy payload in place instead of copying it through np.load"""
+    stream = io.BytesIO(body)
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    if dtype.hasobject:
+        raise ValueError(".npy bodies must hold a numeric matrix")
+
+    count = int(np.prod(shape))
+    array = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def _decode_arrow(body: bytes) -> Tuple[List[str], np.ndarray]:
+    table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    names = table.column_names
+    X = np.empty((table.num_rows, len(names)), dtype=np.float64, order='F')
+    for j, name in enumerate(names):
+        # Float64 columns are read without conversion; nulls become NaN and are reported as missing values
+        X[:, j] = table.column(name).cast(pa.float64()).to_numpy()
+    return names, X
+
+
+def _decode_msgpack(body: bytes) -> Tuple[List[str], np.ndarray]:
+    """
+    Either {"columns": [...], "shape": [n, k], "dtype": "<f8", "data": <bin>}
+    (a row-major matrix wrapped in place) or a map of column name -> values
+    """
+    payload = msgpack.unpackb(body, raw=False)
+    if not isinstance(payload, dict):
+        raise ValueError("msgpack body must be a map")
+
+    if 'data' in payload:
+        names = list(payload['columns'])
+        dtype = np.dtype(payload.get('dtype', '<f8'))
+        X = np.frombuffer(payload['data'], dtype=dtype).reshape(payload.get('shape', (-1, len(names))))
+        return names, _as_float_matrix(X)
+
+    names = list(payload)
+    columns = [np.asarray([np.nan if value is None else value for value in payload[name]], dtype=np.float64)
+               for name in names]
+    if len({len(column) for column in columns}) > 1:
+        raise ValueError("All msgpack columns must have the same length")
+    return names, np.column_stack(columns) if columns else np.empty((0, 0))
+
+
+def decode_columnar(content_type: str, body: bytes, feature_names: List[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Decode a columnar body into (column names, float64 matrix)
+
+    .npy matrices carry no names, so their columns are taken in the model's
+    feature_names order.
+    """
+    media_type = normalize_media_type(content_type)
+    _require_codec(media_type)
+
+    if media_type == NPY:
+        X = _as_float_matrix(_decode_npy(body))
+        if X.shape[1] != len(feature_names):
+            raise ValueError(f".npy matrix has {X.shape[1]} columns, expected {len(feature_names)} (feature_names order)")
+        return list(feature_names), X
+    if media_type == ARROW_STREAM:
+        return _decode_arrow(body)
+    return _decode_msgpack(body)
+
+
+def negotiate_response_type(accept: Optional[str], default: str = JSON) -> str:
+    """First supported media type from an Accept header whose codec is installed"""
+    for part in (accept or '').split(','):
+        media_type = normalize_media_type(part)
+        if media_type == JSON:
+            return JSON
+        if media_type in COLUMNAR_MEDIA_TYPES:
+            try:
+                _require_codec(media_type)
+                return media_type
+            except UnsupportedFormatError:
+                continue
+    return default
+
+
+def results_to_columns(results: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Flatten per-row results into columns
+
+    Scalar fields become columns (missing values are None, timestamps are ISO
+    strings); nested fields such as recommendation lists are left out of
+    columnar responses.
+    """
+    names = []
+    for result in results:
+        for name, value in result.items():
+            if name not in names and (value is None or isinstance(value, (bool, int, float, str, np.generic, datetime))):
+                names.append(name)
+
+    return {
+        name: [value.isoformat() if isinstance(value, datetime) else value
+               for value in (result.get(name) for result in results)]
+        for name in names
+    }
+
+
+def encode_columnar(media_type: str, columns: Dict[str, List[Any]]) -> Tuple[bytes, Dict[str, str]]:
+    """Encode result columns; returns the body and any extra response headers"""
+    _require_codec(media_type)
+
+    if media_type == ARROW_STREAM:
+        table = pa.table({name: pa.array(values) for name, values in columns.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), {}
+
+    if media_type == MSGPACK:
+        return msgpack.packb(columns, use_bin_type=True), {}
+
+    # .npy holds one numeric matrix: only numeric columns, NaN where a row has no value
+    numeric = [name for name, values in columns.items()
+               if all(value is None or isinstance(value, (int, float, np.number)) for value in values)]
+    X = np.array([[np.nan if value is None else float(value) for value in columns[name]] for name in numeric],
+                 dtype=np.float64).T.reshape(-1, len(numeric))
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(X), allow_pickle=False)
+    return buffer.getvalue(), {'X-CTAS-Columns': ','.join(numeric)}
@@ -0,0 +1,69 @@
+"""
+CTAS Request Deadlines
+Callers send how long they are still willing to wait (X-CTAS-Deadline-Ms);
+the server checks the deadline before each stage and stops work that can no
+longer finish in time, returning what is already computed instead
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+DEADLINE_HEADER = 'x-ctas-deadline-ms'
+
+# Deadline applied when a request sends none (0 = no deadline)
+DEFAULT_DEADLINE_MS = float(os.getenv('CTAS_DEFAULT_DEADLINE_MS', '0'))
+
+# Absolute deadline of the request being served, on the time.perf_counter() clock (None = no deadline)
+request_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when a request's deadline passes (or cannot be met) before a stage starts"""
+
+    status_code = 504
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded before {stage}")
+        self.stage = stage
+
+
+def parse_deadline(value: Optional[str]) -> Optional[float]:
+    """Absolute deadline for a header value in milliseconds from now; missing or invalid values use the default"""
+    try:
+        budget_ms = float(value) if value else DEFAULT_DEADLINE_MS
+    except ValueError:
+        budget_ms = DEFAULT_DEADLINE_MS
+    if budget_ms <= 0:
+        return None
+    return time.perf_counter() + budget_ms / 1000
+
+
+def remaining_s(deadline: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the (current request's) deadline, None without one"""
+    deadline = deadline if deadline is not None else request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.perf_counter()
+
+
+def expired() -> bool:
+    remaining = remaining_s()
+    return remaining is not None and remaining <= 0
+
+
+def check_deadline(stage: str, needed_ms: float = 0.0):
+    """Raise DeadlineExceededError unless at least needed_ms remain for the stage"""
+    remaining = remaining_s()
+    if remaining is not None and remaining * 1000 <= needed_ms:
+        raise DeadlineExceededError(stage)
+
+
+def bounded_timeout(timeout_s: Optional[float]) -> Optional[float]:
+    """A stage timeout shortened to the time left before the request's deadline"""
+    remaining = remaining_s()
+    if remaining is None:
+        return timeout_s
+    remaining = max(0.0, remaining)
+    return remaining if timeout_s is None else min(timeout_s, remaining)
@@ -0,0 +1,206 @@
+"""
+CTAS Grid Scoring
+Builds the cells of a bounding box as arrays, assembles each model's feature
+matrix column by column from uniform and per-cell environmental fields, and
+encodes the scored grid as a binary .npy raster or streamed GeoJSON
+"""
+
+import io
+import json
+import math
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Value no environmental field takes, used to find which feature a field feeds
+_PROBE = -8.675309e17
+
+
+class GridError(ValueError):
+    """Raised for a grid request that cannot be scored (bad bounding box, too many cells, mismatched fields, ...)"""
+
+
+def grid_shape(bbox: Tuple[float, float, float, float], resolution: float, max_cells: int) -> Tuple[int, int]:
+    """(rows, cols) of square cells of `resolution` degrees covering bbox = (min_lon, min_lat, max_lon, max_lat)"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if not (min_lon < max_lon and min_lat < max_lat):
+        raise GridError("Bounding box must have min_lon < max_lon and min_lat < max_lat")
+    if resolution <= 0:
+        raise GridError("Resolution must be positive")
+
+    rows = math.ceil(round((max_lat - min_lat) / resolution, 9))
+    cols = math.ceil(round((max_lon - min_lon) / resolution, 9))
+    if rows * cols > max_cells:
+        raise GridError(f"Grid of {rows}x{cols} cells exceeds the maximum of {max_cells} cells")
+    return rows, cols
+
+
+def cell_centers(bbox: Tuple[float, float, float, float], resolution: float,
+                 shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Latitude and longitude of every cell center, flattened row-major with the
+    northernmost row first (raster order, as map overlays draw it)
+    """
+    min_lon, _, _, max_lat = bbox
+    rows, cols = shape
+    lats = max_lat - (np.arange(rows) + 0.5) * resolution
+    lons = min_lon + (np.arange(cols) + 0.5) * resolution
+    return np.repeat(lats, cols), np.tile(lons, rows)
+
+
+def cell_columns(cell_data: Dict[str, Any], n_cells: int) -> Dict[str, np.ndarray]:
+    """Per-cell fields as float64 arrays of n_cells (given flat row-major or as rows of cells)"""
+    columns = {}
+    for name, values in cell_data.items():
+        try:
+            column = np.asarray(values, dtype=np.float64).reshape(-1)
+        except (TypeError, ValueError):
+            raise GridError(f"Per-cell field '{name}' must hold numbers")
+        if column.size != n_cells:
+            raise GridError(f"Per-cell field '{name}' has {column.size} values, expected {n_cells}")
+        columns[name] = column
+    return columns
+
+
+def feature_matrix(extract: Callable[[Dict[str, Any]], Optional[Dict[str, float]]], feature_names: List[str],
+                   context: Dict[str, Any], columns: Dict[str, np.ndarray], n_cells: int) -> Optional[np.ndarray]:
+    """
+    A model's feature matrix for every cell, in feature_names order
+
+    The extractor runs once on the uniform context; each per-cell field is
+    then probed to find the feature it is copied into, and that column is
+    filled from the array. Fields the extractor transforms instead of copying
+    fall back to one extraction per cell. Returns None when the extractor
+    skips the context (the model does not apply).
+    """
+    base = extract(context)
+    if base is None:
+        return None
+
+    targets = {}
+    for name in columns:
+        probed = extract({**context, name: _PROBE})
+        changed = [feature for feature in feature_names if probed.get(feature) != base.get(feature)]
+        if any(probed[feature] != _PROBE for feature in changed):
+            return _extract_per_cell(extract, feature_names, context, columns, n_cells)
+        targets[name] = changed
+
+    X = np.empty((n_cells, len(feature_names)), dtype=np.float64)
+    X[:] = [float(base.get(feature, 0)) for feature in feature_names]
+    for name, features in targets.items():
+        for feature in features:
+            X[:, feature_names.index(feature)] = columns[name]
+    return X
+
+
+def _extract_per_cell(extract, feature_names, context, columns, n_cells) -> np.ndarray:
+    X = np.empty((n_cells, len(feature_names)), dtype=np.float64)
+    names = list(columns)
+    for i, values in enumerate(zip(*(columns[name].tolist() for name in names))):
+        features = extract({**context, **dict(zip(names, values))})
+        X[i] = [float(features.get(feature, 0)) for feature in feature_names]
+    return X
+
+
+def unique_rows(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Distinct feature rows, the index of each scored cell's row, and the mask
+    of scored cells: cells sharing their inputs (all of them, for uniform
+    fields) are scored once, cells with a non-finite input are not scored
+    """
+    scored = np.isfinite(X).all(axis=1)
+    X = X[scored]
+    if len(X) == 0:
+        return X, np.empty(0, dtype=np.intp), scored
+
+    # Only the columns that vary are compared, each row as one opaque byte key
+    # (much faster than np.unique(axis=0), which sorts column by column)
+    varying = (X != X[0]).any(axis=0)
+    if not varying.any():
+        return X[:1], np.zeros(len(X), dtype=np.intp), scored
+    V = np.ascontiguousarray(X[:, varying])
+    keys = V.view(np.dtype((np.void, V.dtype.itemsize * V.shape[1]))).reshape(-1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return X[first], inverse.reshape(-1), scored
+
+
+def expand_predictions(predictions: List[Any], inverse: np.ndarray, valid: np.ndarray,
+                       prefix: str) -> Dict[str, np.ndarray]:
+    """
+    Per-cell arrays of every scalar prediction field, named "<prefix>.<field>";
+    numeric fields are float64 with NaN for cells that were not scored, labels
+    are object arrays with None
+    """
+    rows = [prediction if isinstance(prediction, dict) else {} for prediction in predictions]
+    names = []
+    for row in rows:
+        names.extend(name for name in row if name not in names)
+
+    fields = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        if all(value is None or isinstance(value, (bool, int, float, np.number)) for value in values):
+            unique_values = np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+            column = np.full(len(valid), np.nan)
+        elif all(value is None or isinstance(value, (str, np.str_)) for value in values):
+            unique_values = np.array([None if value is None else str(value) for value in values], dtype=object)
+            column = np.full(len(valid), None, dtype=object)
+        else:
+            continue
+        column[valid] = unique_values[inverse]
+        fields[f'{prefix}.{name}'] = column
+    return fields
+
+
+def encode_grid(fields: Dict[str, np.ndarray], shape: Tuple[int, int]) -> Tuple[bytes, Dict[str, str]]:
+    """
+    One float32 .npy array of shape (fields, rows, cols); labels are stored as
+    integer codes (-1 for none), listed in the X-CTAS-Categories header
+    """
+    rows, cols = shape
+    grid = np.empty((len(fields), rows, cols), dtype=np.float32)
+    categories = {}
+    for k, (name, column) in enumerate(fields.items()):
+        if column.dtype == object:
+            labels = sorted({value for value in column if value is not None})
+            codes = {label: code for code, label in enumerate(labels)}
+            column = np.array([-1 if value is None else codes[value] for value in column], dtype=np.float32)
+            categories[name] = labels
+        grid[k] = column.reshape(rows, cols)
+
+    buffer = io.BytesIO()
+    np.save(buffer, grid, allow_pickle=False)
+    headers = {'X-CTAS-Fields': ','.join(fields), 'X-CTAS-Grid-Shape': f'{rows},{cols}'}
+    if categories:
+        headers['X-CTAS-Categories'] = json.dumps(categories, separators=(',', ':'))
+    return buffer.getvalue(), headers
+
+
+def geojson_chunks(fields: Dict[str, np.ndarray], lats: np.ndarray, lons: np.ndarray, resolution: float,
+                   bbox: Tuple[float, float, float, float], dumps: Callable[[Any], bytes],
+                   chunk_cells: int = 1000) -> Iterator[bytes]:
+    """A FeatureCollection of one square Polygon per cell, yielded a chunk of cells at a time"""
+    half = resolution / 2
+    names = list(fields)
+    columns = [
+        [None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+         for value in column.tolist()]
+        for column in fields.values()
+    ]
+
+    yield b'{"type":"FeatureCollection","bbox":' + dumps(list(bbox)) + b',"features":['
+    for start in range(0, len(lats), chunk_cells):
+        features = []
+        for i in range(start, min(start + chunk_cells, len(lats))):
+            lat, lon = float(lats[i]), float(lons[i])
+            features.append(dumps({
+                'type': 'Feature',
+                'id': i,
+                'geometry': {'type': 'Polygon', 'coordinates': [[
+                    [lon - half, lat - half], [lon + half, lat - half], [lon + half, lat + half],
+                    [lon - half, lat + half], [lon - half, lat - half]
+                ]]},
+                'properties': {name: column[i] for name, column in zip(names, columns)}
+            }))
+        yield (b',' if start else b'') + b','.join(features)
+    yield b']}'
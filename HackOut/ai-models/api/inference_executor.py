@@ -0,0 +1,390 @@
+"""
+CTAS Inference Executor
+Runs CPU-bound model calls off the asyncio event loop on a thread or process pool,
+with per-priority wait queues and budgets, request deadlines and a per-model
+concurrency limit
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Optional, Union
+
+import metrics
+from deadlines import DeadlineExceededError, request_deadline
+
+logger = logging.getLogger(__name__)
+
+# Models available inside process-pool workers (populated by the pool initializer)
+_worker_models: Dict[str, Any] = {}
+
+
+# Priority classes, highest first; waiting work is always admitted from the highest class
+PRIORITIES = ('high', 'low')
+
+# Priority of the request being served (set by the admission middleware from its API key or header)
+request_priority: ContextVar[str] = ContextVar('request_priority', default=PRIORITIES[-1])
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """
+    Raised when a request cannot be admitted: its priority's queue is full or
+    its wait would exceed the queue-wait budget
+
+    Low-priority requests are shed with 429 so well-behaved clients back off;
+    a high-priority rejection means the service itself is overloaded (503).
+    """
+
+    def __init__(self, message: str, priority: str = PRIORITIES[0], retry_after_s: int = 1):
+        super().__init__(message)
+        self.priority = priority
+        self.retry_after_s = retry_after_s
+
+    @property
+    def status_code(self) -> int:
+        return 503 if self.priority == PRIORITIES[0] else 429
+
+
+class PriorityGate:
+    """Counting semaphore that hands free slots to waiters by priority, FIFO within a priority"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+
+    def waiting(self, priority: str = PRIORITIES[-1]) -> int:
+        """Waiters that would be admitted before a new request of the given priority"""
+        return sum(len(self._waiters[p]) for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+
+    @property
+    def full(self) -> bool:
+        return self.in_use >= self.limit or self.waiting() > 0
+
+    async def acquire(self, priority: str):
+        if not self.full:
+            self.in_use += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait was abandoned
+                self.release()
+            else:
+                self._waiters[priority].remove(waiter)
+            raise
+
+    def release(self):
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    # Hand the slot over directly, so in_use stays the same
+                    waiter.set_result(None)
+                    return
+        self.in_use -= 1
+
+
+def _run_task(model, task: Union[str, Callable], args: tuple):
+    """Call a model method by name, or a module-level function taking the model as first argument"""
+    if isinstance(task, str):
+        return getattr(model, task)(*args)
+    return task(model, *args)
+
+
+def _init_worker(models: Dict[str, Any]):
+    """Process-pool initializer: keep a private copy of the model objects in each worker"""
+    _worker_models.clear()
+    _worker_models.update(models)
+
+
+def _run_in_worker(model_name: str, task: Union[str, Callable], args: tuple):
+    """Process-pool entry point: resolve the model inside the worker process"""
+    return _run_task(_worker_models[model_name], task, args)
+
+
+def parse_model_settings(spec: str, cast: Callable = int) -> Dict[str, Any]:
+    """Parse per-model settings such as 'algal_bloom=2,cyclone=1'"""
+    settings = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        settings[name.strip()] = cast(value)
+    return settings
+
+
+class InferenceExecutor:
+    def __init__(self, kind: Optional[str] = None, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, model_concurrency: Optional[int] = None,
+                 model_limits: Optional[Dict[str, int]] = None,
+                 queue_limits: Optional[Dict[str, int]] = None,
+                 wait_budgets_ms: Optional[Dict[str, float]] = None):
+        self.kind = kind or os.getenv('CTAS_EXECUTOR_KIND', 'thread')
+        if self.kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind '{self.kind}' (expected 'thread' or 'process')")
+
+        self.max_workers = int(max_workers or os.getenv('CTAS_EXECUTOR_WORKERS', os.cpu_count() or 2))
+        self.max_queue = int(max_queue or os.getenv('CTAS_EXECUTOR_QUEUE_SIZE', 256))
+        self.model_concurrency = int(model_concurrency or os.getenv('CTAS_MODEL_CONCURRENCY', self.max_workers))
+        self.model_limits = model_limits if model_limits is not None else parse_model_settings(
+            os.getenv('CTAS_MODEL_CONCURRENCY_LIMITS', '')
+        )
+        # Waiting requests allowed per priority, and how long each may wait for a slot (0 = no budget)
+        self.queue_limits = {
+            priority: self.max_queue for priority in PRIORITIES
+        }
+        self.queue_limits.update(queue_limits if queue_limits is not None else parse_model_settings(
+            os.getenv('CTAS_PRIORITY_QUEUE_LIMITS', '')
+        ))
+        self.wait_budgets_ms = {'high': 5000.0, 'low': 500.0}
+        self.wait_budgets_ms.update(wait_budgets_ms if wait_budgets_ms is not None else parse_model_settings(
+            os.getenv('CTAS_QUEUE_WAIT_BUDGET_MS', ''), float
+        ))
+
+        self._models: Dict[str, Any] = {}
+        self._pool = None
+        self._worker_slots: Optional[PriorityGate] = None
+        self._model_slots: Dict[str, PriorityGate] = {}
+
+        self._queued = 0
+        self._queued_by_priority = {priority: 0 for priority in PRIORITIES}
+        self._running = 0
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'rejected_by_priority': {priority: 0 for priority in PRIORITIES},
+            'deadline_expired': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+            'run_time_total_ms': 0.0,
+            'per_model': {}
+        }
+
+    def start(self, models: Dict[str, Any]):
+        """Create the worker pool; process workers receive a copy of the models"""
+        self._models = models
+        if self.kind == 'process':
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(dict(models),)
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ctas-inference')
+
+        self._worker_slots = PriorityGate(self.max_workers)
+        self._model_slots = {}
+        logger.info(f"Inference executor started ({self.kind} pool, {self.max_workers} workers, queue {self.max_queue})")
+
+    def refresh(self):
+        """Restart process workers so they pick up reloaded or retrained models"""
+        if self.kind == 'process' and self._pool is not None:
+            old_pool = self._pool
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(dict(self._models),)
+            )
+            old_pool.shutdown(wait=False)
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _model_slot(self, model_name: str) -> PriorityGate:
+        if model_name not in self._model_slots:
+            limit = self.model_limits.get(model_name, self.model_concurrency)
+            self._model_slots[model_name] = PriorityGate(limit)
+        return self._model_slots[model_name]
+
+    def _model_stats(self, model_name: str) -> Dict[str, Any]:
+        if model_name not in self.stats['per_model']:
+            self.stats['per_model'][model_name] = {
+                'queued': 0, 'running': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+                'wait_time_total_ms': 0.0, 'wait_time_max_ms': 0.0, 'run_time_ewma_ms': 0.0
+            }
+        return self.stats['per_model'][model_name]
+
+    def predicted_wait_ms(self, model_name: str, priority: str) -> float:
+        """Expected wait for a slot: work admitted ahead of this priority times the model's recent run time"""
+        run_time_ms = self._model_stats(model_name)['run_time_ewma_ms']
+        return max(
+            ((gate.waiting(priority) + 1) * run_time_ms / gate.limit
+             for gate in (self._model_slot(model_name), self._worker_slots) if gate.full),
+            default=0.0
+        )
+
+    def _reject(self, model_name: str, priority: str, reason: str, message: str, retry_after_ms: float):
+        self.stats['rejected'] += 1
+        self.stats['rejected_by_priority'][priority] += 1
+        self._model_stats(model_name)['rejected'] += 1
+        metrics.admission_rejections.inc(model_name, priority, reason)
+        raise ExecutorSaturatedError(message, priority, max(1, math.ceil(retry_after_ms / 1000)))
+
+    def _expire(self, model_name: str, priority: str, stage: str):
+        self.stats['deadline_expired'] += 1
+        metrics.admission_rejections.inc(model_name, priority, 'deadline')
+        raise DeadlineExceededError(stage)
+
+    async def _acquire_slots(self, model_name: str, priority: str):
+        await self._model_slot(model_name).acquire(priority)
+        try:
+            await self._worker_slots.acquire(priority)
+        except BaseException:
+            self._model_slot(model_name).release()
+            raise
+
+    async def run(self, model_name: str, task: Union[str, Callable], *args, priority: Optional[str] = None):
+        """
+        Run a model call on the pool and await its result
+
+        `task` is either a method name on the model or a module-level function
+        called as task(model, *args). `priority` defaults to the current
+        request's. Raises ExecutorSaturatedError, without waiting, when the
+        priority's queue is full or the predicted wait exceeds its budget, and
+        after the budget when the wait turns out longer. Raises
+        DeadlineExceededError instead of queueing work the request's deadline
+        leaves no time to finish (predicted wait plus the model's recent run
+        time), and when the deadline passes while the call is still waiting.
+        """
+        if self._pool is None:
+            raise RuntimeError("Inference executor has not been started")
+
+        priority = priority or request_priority.get()
+        model_stats = self._model_stats(model_name)
+        budget_ms = self.wait_budgets_ms.get(priority, 0)
+        predicted_ms = self.predicted_wait_ms(model_name, priority)
+
+        if self._queued_by_priority[priority] >= self.queue_limits[priority]:
+            self._reject(model_name, priority, 'queue_full',
+                         f"Inference queue for {priority}-priority requests is full "
+                         f"({self.queue_limits[priority]} requests waiting)", predicted_ms)
+        if budget_ms and predicted_ms > budget_ms:
+            self._reject(model_name, priority, 'predicted_wait',
+                         f"Predicted {model_name} queue wait of {predicted_ms:.0f} ms exceeds the "
+                         f"{budget_ms:.0f} ms budget for {priority}-priority requests", predicted_ms)
+
+        # The wait for a slot ends at the budget or the request's deadline, whichever comes first
+        deadline = request_deadline.get()
+        wait_s = budget_ms / 1000 if budget_ms else None
+        waits_for_deadline = False
+        if deadline is not None:
+            remaining_s = deadline - time.perf_counter()
+            if remaining_s * 1000 <= predicted_ms + model_stats['run_time_ewma_ms']:
+                self._expire(model_name, priority, f'{model_name} inference')
+            waits_for_deadline = wait_s is None or remaining_s < wait_s
+            if waits_for_deadline:
+                wait_s = remaining_s
+
+        self.stats['submitted'] += 1
+        self._queued += 1
+        self._queued_by_priority[priority] += 1
+        model_stats['queued'] += 1
+        enqueued_at = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(self._acquire_slots(model_name, priority), wait_s)
+        except asyncio.TimeoutError:
+            if waits_for_deadline:
+                self._expire(model_name, priority, f'{model_name} inference')
+            self._reject(model_name, priority, 'wait_budget',
+                         f"{model_name} queue wait exceeded the {budget_ms:.0f} ms budget for "
+                         f"{priority}-priority requests", self.predicted_wait_ms(model_name, priority))
+        finally:
+            self._queued -= 1
+            self._queued_by_priority[priority] -= 1
+            model_stats['queued'] -= 1
+
+        wait_ms = (time.perf_counter() - enqueued_at) * 1000
+        self.stats['wait_time_total_ms'] += wait_ms
+        self.stats['wait_time_max_ms'] = max(self.stats['wait_time_max_ms'], wait_ms)
+        model_stats['wait_time_total_ms'] += wait_ms
+        model_stats['wait_time_max_ms'] = max(model_stats['wait_time_max_ms'], wait_ms)
+        metrics.queue_wait.observe(wait_ms / 1000, model_name, priority)
+
+        self._running += 1
+        model_stats['running'] += 1
+        started_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+
+        try:
+            if self.kind == 'process':
+                future = loop.run_in_executor(self._pool, _run_in_worker, model_name, task, args)
+            else:
+                future = loop.run_in_executor(self._pool, _run_task, self._models[model_name], task, args)
+        except BaseException:
+            self._finish(model_name, started_at, None)
+            raise
+
+        # Slots are released when the work actually finishes, even if the caller
+        # stops waiting (e.g. a deadline expires) while a worker is still busy
+        future.add_done_callback(lambda done: self._finish(model_name, started_at, done))
+        return await asyncio.shield(future)
+
+    def _finish(self, model_name: str, started_at: float, future):
+        """Record the outcome of a pool task and release its slots"""
+        model_stats = self._model_stats(model_name)
+        failed = future is None or future.cancelled() or future.exception() is not None
+        outcome = 'failed' if failed else 'completed'
+        self.stats[outcome] += 1
+        model_stats[outcome] += 1
+        metrics.inference_tasks.inc(model_name, outcome)
+
+        run_time = time.perf_counter() - started_at
+        self.stats['run_time_total_ms'] += run_time * 1000
+        ewma = model_stats['run_time_ewma_ms']
+        model_stats['run_time_ewma_ms'] = run_time * 1000 if not ewma else 0.8 * ewma + 0.2 * run_time * 1000
+        metrics.inference_latency.observe(run_time, model_name)
+        self._running -= 1
+        model_stats['running'] -= 1
+        self._worker_slots.release()
+        self._model_slot(model_name).release()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current queue depth, running tasks and wait-time statistics"""
+        started = self.stats['completed'] + self.stats['failed'] + self._running
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'model_concurrency': self.model_concurrency,
+            'model_limits': self.model_limits,
+            'queue_limits': self.queue_limits,
+            'wait_budgets_ms': self.wait_budgets_ms,
+            'queue_depth': self._queued,
+            'queue_depth_by_priority': dict(self._queued_by_priority),
+            'running': self._running,
+            'submitted': self.stats['submitted'],
+            'completed': self.stats['completed'],
+            'failed': self.stats['failed'],
+            'rejected': self.stats['rejected'],
+            'rejected_by_priority': dict(self.stats['rejected_by_priority']),
+            'deadline_expired': self.stats['deadline_expired'],
+            'avg_wait_time_ms': self.stats['wait_time_total_ms'] / started if started else 0.0,
+            'max_wait_time_ms': self.stats['wait_time_max_ms'],
+            'avg_run_time_ms': self.stats['run_time_total_ms'] / max(1, self.stats['completed'] + self.stats['failed']),
+            'per_model': {
+                name: {
+                    **stats,
+                    'avg_wait_time_ms': stats['wait_time_total_ms'] / max(1, stats['completed'] + stats['failed'] + stats['running'])
+                }
+                for name, stats in self.stats['per_model'].items()
+            }
+        }
@@ -0,0 +1,404 @@
+"""
+CTAS Load Test
+Starts the API locally (or targets a running instance) and replays a mix of
+single-model, ensemble and batch requests built from each model's synthetic
+data, reporting throughput, latency percentiles and error rates as JSON
+
+    python load_test.py --mode closed --concurrency 32 --duration 60
+    python load_test.py --mode open --rate 200 --mix single=70,ensemble=20,batch=10 --output baseline.json
+
+Closed loop: a fixed number of clients, each sending its next request when the
+previous one returns; throughput is what the server sustains. Open loop:
+requests arrive at a fixed rate whether or not earlier ones returned, and
+latency is measured from each request's scheduled start, so queueing in the
+server (or a client backlog) shows up in the percentiles instead of lowering
+the offered load.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from export_model_artifacts import load_model_class
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Endpoint name -> model whose synthetic data fills its payloads (single and batch requests)
+SINGLE_ENDPOINTS = {
+    'coastal-threat': 'coastal_threat',
+    'mangrove-health': 'mangrove_health',
+    'algal-bloom': 'algal_bloom'
+}
+
+# Models whose synthetic readings are merged into one ensemble environmental_data record
+ENSEMBLE_SOURCES = ['coastal_threat', 'mangrove_health', 'algal_bloom', 'sea_level', 'pollution', 'blue_carbon']
+
+DEFAULT_MIX = 'single=70,ensemble=20,batch=10'
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'single=70,ensemble=20,batch=10' -> request kind -> share of requests"""
+    mix = {}
+    for part in spec.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in ('single', 'ensemble', 'batch'):
+            raise ValueError(f"Unknown request kind '{kind}' (expected single, ensemble or batch)")
+        mix[kind] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("Request mix weights must add up to more than 0")
+    return {kind: weight / total for kind, weight in mix.items()}
+
+
+def percentiles(latencies_ms: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies_ms:
+        return {'p50': None, 'p95': None, 'p99': None, 'mean': None, 'max': None}
+    values = np.asarray(latencies_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50': round(float(p50), 2), 'p95': round(float(p95), 2), 'p99': round(float(p99), 2),
+            'mean': round(float(values.mean()), 2), 'max': round(float(values.max()), 2)}
+
+
+def _records(frame) -> List[Dict[str, Any]]:
+    """DataFrame rows as JSON-ready dicts (timestamps as ISO strings, numpy scalars as Python numbers)"""
+    records = []
+    for row in frame.to_dict(orient='records'):
+        records.append({
+            name: value.isoformat() if hasattr(value, 'isoformat') else value.item() if hasattr(value, 'item') else value
+            for name, value in row.items()
+        })
+    return records
+
+
+class PayloadPool:
+    """
+    Request bodies drawn from each model's generate_synthetic_data
+
+    Single-model rows keep only the fields of the endpoint's input schema (read
+    from the server's OpenAPI document) and are clipped to its bounds, so every
+    request is valid and the test measures scoring rather than 422s.
+    """
+
+    def __init__(self, openapi: Dict[str, Any], rows: int = 500, seed: int = 0):
+        self.random = random.Random(seed)
+        self.single: Dict[str, List[Dict[str, Any]]] = {}
+        synthetic = {}
+
+        for model_name in sorted(set(SINGLE_ENDPOINTS.values()) | set(ENSEMBLE_SOURCES)):
+            try:
+                synthetic[model_name] = _records(load_model_class(model_name)().generate_synthetic_data(rows))
+            except Exception as e:
+                logger.warning(f"No synthetic data for {model_name}: {e}")
+
+        for endpoint, model_name in SINGLE_ENDPOINTS.items():
+            if model_name not in synthetic:
+                continue
+            fields = self._schema_fields(openapi, f'/predict/{endpoint}')
+            self.single[endpoint] = [self._fit(record, fields) for record in synthetic[model_name]]
+
+        # Each ensemble record merges one reading from every source (later sources win shared names)
+        self.ensemble = []
+        sources = [synthetic[name] for name in ENSEMBLE_SOURCES if name in synthetic]
+        for i in range(rows):
+            environmental_data = {}
+            for records in sources:
+                environmental_data.update(records[i % len(records)])
+            self.ensemble.append({
+                'location': {'latitude': self.random.uniform(-40, 40), 'longitude': self.random.uniform(-180, 180)},
+                'environmental_data': environmental_data
+            })
+
+        if not self.single:
+            raise RuntimeError("No single-model payloads could be generated")
+
+    @staticmethod
+    def _schema_fields(openapi: Dict[str, Any], path: str) -> Dict[str, Dict[str, Any]]:
+        body = openapi['paths'][path]['post']['requestBody']['content']['application/json']['schema']
+        schema = openapi['components']['schemas'][body['$ref'].rsplit('/', 1)[-1]]
+        return schema['properties']
+
+    @staticmethod
+    def _fit(record: Dict[str, Any], fields: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        row = {}
+        for name, spec in fields.items():
+            value = record.get(name)
+            if isinstance(value, (int, float)):
+                value = max(spec.get('minimum', value), min(spec.get('maximum', value), value))
+                value = int(value) if spec.get('type') == 'integer' else value
+            row[name] = value
+        return row
+
+    def request(self, kind: str, batch_size: int):
+        """(label, path, body) for one request of the given kind"""
+        if kind == 'ensemble':
+            return 'ensemble', '/predict/ensemble', self.random.choice(self.ensemble)
+
+        endpoint = self.random.choice(list(self.single))
+        rows = self.single[endpoint]
+        if kind == 'batch':
+            return f'{endpoint}/batch', f'/predict/{endpoint}/batch', {'items': self.random.sample(rows, min(batch_size, len(rows)))}
+        return endpoint, f'/predict/{endpoint}', self.random.choice(rows)
+
+
+class LoadTest:
+    def __init__(self, base_url: str, pool: PayloadPool, mix: Dict[str, float], batch_size: int = 100,
+                 profile: str = 'full', timeout_s: float = 30.0, headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url
+        self.pool = pool
+        self.mix = mix
+        self.batch_size = batch_size
+        self.profile = profile
+        self.timeout_s = timeout_s
+        self.headers = headers or {}
+
+        self._kinds = list(mix)
+        self._weights = [mix[kind] for kind in self._kinds]
+        self._samples: List[Dict[str, Any]] = []
+        self._recording_from = 0.0
+
+    async def _send(self, client, scheduled: float):
+        kind = self.pool.random.choices(self._kinds, self._weights)[0]
+        label, path, body = self.pool.request(kind, self.batch_size)
+        status, error = None, None
+        try:
+            response = await client.post(path, json=body, params={'profile': self.profile})
+            status = response.status_code
+            if status >= 400:
+                error = f'http_{status}'
+        except Exception as e:
+            error = type(e).__name__
+
+        finished = time.perf_counter()
+        if scheduled >= self._recording_from:
+            self._samples.append({'kind': kind, 'endpoint': label, 'status': status, 'error': error,
+                                  'latency_ms': (finished - scheduled) * 1000})
+
+    def _client(self, connections: int):
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        return httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout_s, limits=limits, headers=self.headers)
+
+    async def closed_loop(self, concurrency: int, duration_s: float, warmup_s: float = 0.0):
+        """`concurrency` clients, each sending its next request as soon as the previous one returns"""
+        started = time.perf_counter()
+        self._recording_from = started + warmup_s
+        deadline = self._recording_from + duration_s
+
+        async with self._client(concurrency) as client:
+            async def user():
+                while time.perf_counter() < deadline:
+                    await self._send(client, time.perf_counter())
+
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+        return {'mode': 'closed', 'concurrency': concurrency}
+
+    async def open_loop(self, rate: float, duration_s: float, warmup_s: float = 0.0,
+                        max_in_flight: int = 1000, poisson: bool = False):
+        """
+        Requests start at `rate` per second on a fixed (or Poisson) schedule
+        regardless of completions. Arrivals finding max_in_flight requests
+        outstanding are dropped and counted as client_overflow errors.
+        """
+        started = time.perf_counter()
+        self._recording_from = started + warmup_s
+        deadline = self._recording_from + duration_s
+        in_flight = set()
+        dropped = 0
+        scheduled = started
+
+        async with self._client(max_in_flight) as client:
+            while scheduled < deadline:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                if len(in_flight) >= max_in_flight:
+                    if scheduled >= self._recording_from:
+                        dropped += 1
+                        self._samples.append({'kind': None, 'endpoint': None, 'status': None,
+                                              'error': 'client_overflow', 'latency_ms': None})
+                else:
+                    task = asyncio.ensure_future(self._send(client, scheduled))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+
+                scheduled += self.pool.random.expovariate(rate) if poisson else 1.0 / rate
+
+            if in_flight:
+                await asyncio.wait(in_flight)
+        return {'mode': 'open', 'offered_rate_rps': rate, 'arrivals': 'poisson' if poisson else 'uniform',
+                'max_in_flight': max_in_flight, 'dropped': dropped}
+
+    def report(self, duration_s: float) -> Dict[str, Any]:
+        """Throughput, latency percentiles and error rates overall and per request kind and endpoint"""
+        def summarize(samples):
+            ok = [s['latency_ms'] for s in samples if s['error'] is None]
+            errors: Dict[str, int] = {}
+            for sample in samples:
+                if sample['error'] is not None:
+                    errors[sample['error']] = errors.get(sample['error'], 0) + 1
+            return {
+                'requests': len(samples),
+                'throughput_rps': round(len(ok) / duration_s, 2),
+                'latency_ms': percentiles(ok),
+                'errors': errors,
+                'error_rate': round(sum(errors.values()) / len(samples), 4) if samples else 0.0
+            }
+
+        by_kind: Dict[str, List[Dict[str, Any]]] = {}
+        by_endpoint: Dict[str, List[Dict[str, Any]]] = {}
+        for sample in self._samples:
+            if sample['kind'] is not None:
+                by_kind.setdefault(sample['kind'], []).append(sample)
+                by_endpoint.setdefault(sample['endpoint'], []).append(sample)
+
+        return {
+            **summarize(self._samples),
+            'by_kind': {kind: summarize(samples) for kind, samples in sorted(by_kind.items())},
+            'by_endpoint': {endpoint: summarize(samples) for endpoint, samples in sorted(by_endpoint.items())}
+        }
+
+
+class LocalServer:
+    """The API under serve.py on a local port, started for the test and stopped afterwards"""
+
+    def __init__(self, port: int, workers: int = 1, env: Optional[Dict[str, str]] = None):
+        self.port = port
+        self.workers = workers
+        self.env = {**os.environ, **(env or {})}
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self, ready_timeout_s: float = 300.0):
+        self.process = subprocess.Popen(
+            [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(self.port),
+             '--workers', str(self.workers), '--memory-report-interval', '0', '--log-level', 'warning'],
+            cwd=API_DIR, env=self.env
+        )
+
+        deadline = time.monotonic() + ready_timeout_s
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"API server exited with status {self.process.returncode}")
+            try:
+                health = httpx.get(f'{self.url}/health', timeout=2.0).json()
+                if health.get('ready'):
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError(f"API server not ready after {ready_timeout_s:.0f} s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+async def run_load_test(base_url: str, args) -> Dict[str, Any]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=10.0) as client:
+        openapi = (await client.get('/openapi.json')).json()
+        health = (await client.get('/health')).json()
+
+    pool = PayloadPool(openapi, rows=args.payload_rows, seed=args.seed)
+    mix = parse_mix(args.mix)
+    headers = {}
+    if args.priority:
+        headers['x-ctas-priority'] = args.priority
+    if args.deadline_ms:
+        headers['x-ctas-deadline-ms'] = str(args.deadline_ms)
+    test = LoadTest(base_url, pool, mix, batch_size=args.batch_size, profile=args.profile, headers=headers)
+
+    if args.mode == 'closed':
+        settings = await test.closed_loop(args.concurrency, args.duration, args.warmup)
+    else:
+        settings = await test.open_loop(args.rate, args.duration, args.warmup, args.max_in_flight, args.poisson)
+
+    return {
+        'config': {
+            **settings,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'mix': mix,
+            'batch_size': args.batch_size,
+            'profile': args.profile,
+            'priority': args.priority,
+            'deadline_ms': args.deadline_ms,
+            'target': base_url,
+            'workers': None if args.url else args.workers,
+            'models_ready': health.get('models_ready')
+        },
+        'results': test.report(args.duration),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the CTAS API with a mix of single, ensemble and batch requests")
+    parser.add_argument('--url', help="Test a running instance instead of starting one locally")
+    parser.add_argument('--port', type=int, default=int(os.getenv('CTAS_LOAD_TEST_PORT', '8765')))
+    parser.add_argument('--workers', type=int, default=1, help="Workers of the locally started server")
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--concurrency', type=int, default=16, help="Clients in closed-loop mode")
+    parser.add_argument('--rate', type=float, default=100.0, help="Requests per second in open-loop mode")
+    parser.add_argument('--poisson', action='store_true', help="Poisson instead of evenly spaced open-loop arrivals")
+    parser.add_argument('--max-in-flight', type=int, default=1000, help="Open-loop requests outstanding before arrivals are dropped")
+    parser.add_argument('--duration', type=float, default=30.0, help="Measured seconds")
+    parser.add_argument('--warmup', type=float, default=5.0, help="Seconds of load before measuring starts")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Request mix as kind=weight (kinds: single, ensemble, batch)")
+    parser.add_argument('--batch-size', type=int, default=100, help="Rows per batch request")
+    parser.add_argument('--profile', choices=['full', 'minimal'], default='full')
+    parser.add_argument('--priority', choices=['high', 'low'], help="X-CTAS-Priority sent with every request")
+    parser.add_argument('--deadline-ms', type=float, help="X-CTAS-Deadline-Ms sent with every request")
+    parser.add_argument('--payload-rows', type=int, default=500, help="Synthetic rows generated per model")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report to this file (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    if httpx is None:
+        sys.exit("load_test.py needs httpx (pip install httpx)")
+
+    server = None if args.url else LocalServer(args.port, args.workers)
+    try:
+        if server:
+            logger.info(f"Starting the API on port {args.port} with {args.workers} workers")
+            server.start()
+        result = asyncio.run(run_load_test(args.url or server.url, args))
+    finally:
+        if server:
+            server.stop()
+
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+        logger.info(f"Report written to {args.output}")
+    else:
+        print(report)
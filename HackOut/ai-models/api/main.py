@@ -3,10 +3,11 @@ CTAS AI Model API Server
 FastAPI server providing real-time AI predictions for coastal threat assessment
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Literal
 import uvicorn
 import sys
 import os
@@ -14,38 +15,44 @@ import logging
 from datetime import datetime, timedelta
 import asyncio
 import json
+import math
+import shutil
+import time
 
-# Add the parent directory to Python path for model imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-# Import all AI models (try importing and handle missing models gracefully)
-try:
-    from algal_bloom_predictor import AlgalBloomPredictor
-except ImportError:
-    AlgalBloomPredictor = None
-    
-try:
-    from blue_carbon_health_monitor import BlueCarbonHealthMonitor
-except ImportError:
-    BlueCarbonHealthMonitor = None
-    
-try:
-    from cyclone_trajectory_model import CycloneTrajectoryModel
-except ImportError:
-    CycloneTrajectoryModel = None
-    
-try:
-    from pollution_event_classifier import PollutionEventClassifier
-except ImportError:
-    PollutionEventClassifier = None
-    
+# Optional fast JSON encoder for minimal-profile responses
 try:
-    from sea_level_anomaly_detector import SeaLevelAnomalyDetector
+    import orjson
 except ImportError:
-    SeaLevelAnomalyDetector = None
+    orjson = None
 
-# Note: coastal-threat-model.py and mangrove-health-model.py have hyphens in names
-# These need to be imported differently or renamed
+# Add the parent directory to Python path for model imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_inference import (
+    validate_rows, validate_matrix, assemble_matrix, rows_to_matrix,
+    predict_threat_batch, predict_health_batch, predict_bloom_batch,
+    predict_rows_batch, predict_single, predict_matrix, to_builtin
+)
+import metrics
+from inference_executor import InferenceExecutor, ExecutorSaturatedError, parse_model_settings, request_priority
+from admission import AdmissionMiddleware
+from deadlines import DeadlineExceededError, bounded_timeout, check_deadline, expired, request_deadline
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from single_flight import SingleFlight, deadline_window, request_key
+from model_versions import ModelVersionStore
+from model_registry import ModelRegistry
+from process_memory import process_memory, workers_memory
+from bulk_jobs import BulkJobManager, JobError, detect_format, part_path, result_path
+from station_snapshots import StationSnapshots
+from grid_scoring import (
+    GridError, cell_centers, cell_columns, encode_grid, expand_predictions, feature_matrix, geojson_chunks,
+    grid_shape, unique_rows
+)
+from columnar_io import (
+    decode_columnar, encode_columnar, negotiate_response_type, results_to_columns,
+    UnsupportedFormatError, JSON, NPY
+)
 
 # Configure logging
 logging.basicConfig(
@@ -72,6 +79,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts and latency per endpoint (pure ASGI, so it adds no per-request task)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Priority class per request (API key or X-CTAS-Priority header, else high; grid scoring low); low priority is shed first under overload
+app.add_middleware(AdmissionMiddleware)
+
 # Pydantic models for API requests/responses
 class CoastalThreatInput(BaseModel):
     wave_height: float = Field(..., ge=0, le=20, description="Wave height in meters")
@@ -133,6 +146,40 @@ class EnsemblePredictionInput(BaseModel):
     environmental_data: Dict[str, Any] = Field(..., description="Environmental sensor data")
     timestamp: datetime = Field(default_factory=datetime.now, description="Prediction timestamp")
 
+# Maximum rows accepted by a single /predict/*/batch request
+MAX_BATCH_SIZE = int(os.getenv('CTAS_MAX_BATCH_SIZE', '10000'))
+
+# Per-member latency budget for /predict/ensemble; slow members are reported as timed out
+ENSEMBLE_MEMBER_TIMEOUT_MS = float(os.getenv('CTAS_ENSEMBLE_MEMBER_TIMEOUT_MS', '2000'))
+ENSEMBLE_MEMBER_TIMEOUTS = {
+    'cyclone': 5000.0,
+    **parse_model_settings(os.getenv('CTAS_ENSEMBLE_MEMBER_TIMEOUTS', ''), float)
+}
+
+# Readings a streaming session may have awaiting prediction before the server stops reading its socket
+STREAM_MAX_PENDING = int(os.getenv('CTAS_STREAM_MAX_PENDING', '16'))
+
+# Maximum cells in one /predict/grid request
+GRID_MAX_CELLS = int(os.getenv('CTAS_GRID_MAX_CELLS', '250000'))
+
+class GridBoundingBox(BaseModel):
+    min_lon: float = Field(..., ge=-180, le=180, description="Western edge in degrees")
+    min_lat: float = Field(..., ge=-90, le=90, description="Southern edge in degrees")
+    max_lon: float = Field(..., ge=-180, le=180, description="Eastern edge in degrees")
+    max_lat: float = Field(..., ge=-90, le=90, description="Northern edge in degrees")
+
+class GridScoringInput(BaseModel):
+    bbox: GridBoundingBox
+    resolution: float = Field(..., gt=0, description="Cell size in degrees")
+    environmental_data: Dict[str, Any] = Field(default_factory=dict, description="Fields uniform across the grid")
+    cell_data: Dict[str, List[Any]] = Field(
+        default_factory=dict, description="Per-cell fields, row-major from the north-west cell (flat or as rows)"
+    )
+    models: Optional[List[str]] = Field(None, description="Models to score (default: every ready model with a vectorized path)")
+
+class BatchPredictionInput(BaseModel):
+    items: List[Any] = Field(..., description="Input rows, validated as a block; invalid rows are reported individually")
+
 # Response models
 class ThreatPredictionResponse(BaseModel):
     threat_type: str
@@ -165,94 +212,295 @@ class EnsembleResponse(BaseModel):
     combined_severity: float
     priority_threats: List[str]
     recommendations: List[str]
+    member_status: Dict[str, str] = {}
+    partial: bool = False
+    deadline_exceeded: bool = False
+    timestamp: datetime
+
+# 'full' keeps the complete response; 'minimal' returns only the model's scores and labels
+ResponseProfile = Literal['full', 'minimal']
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when installed (numpy values and datetimes are encoded natively)"""
+    
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(to_builtin(content), default=str, separators=(',', ':')).encode('utf-8')
+
+class BatchItemResult(BaseModel):
+    index: int
+    success: bool
+    prediction: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    results: List[BatchItemResult]
+    total: int
+    succeeded: int
+    failed: int
+    deadline_exceeded: bool = False
     timestamp: datetime
 
 # Global model instances
 models = {}
 model_status = {}
 
+# Open streaming sessions and reading counters
+stream_stats = {'sessions': 0, 'readings': 0, 'predictions': 0, 'errors': 0}
+
+# CPU-bound model calls run here instead of on the event loop
+inference_executor = InferenceExecutor()
+
+# Concurrent single-row requests are grouped into one vectorized call per model
+micro_batcher = MicroBatcher(inference_executor, {
+    'coastal_threat': predict_threat_batch,
+    'mangrove_health': predict_health_batch,
+    'algal_bloom': predict_bloom_batch
+})
+
+# Repeated polls of the same station are answered from here instead of the models
+prediction_cache = PredictionCache()
+
+# Concurrent identical requests share one in-flight computation
+single_flight = SingleFlight()
+
+# Servable models; each module (and sklearn with it) is imported when its artifact is first loaded
+model_registry = ModelRegistry()
+
+# Dataset scoring jobs run chunk by chunk on their own low-priority process pool, yielding to queued interactive work
+bulk_jobs = BulkJobManager(should_yield=lambda: inference_executor.queue_depth > 0)
+
+# Latest ensemble assessment per monitored station, refreshed in the background
+station_snapshots = StationSnapshots()
+
+# Pre-trained artifacts, one <model_name>.pkl per model written by save_model
+MODEL_DIR = os.getenv('CTAS_MODEL_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models'))
+
+# Retrained versions are written under MODEL_DIR/versions/<model_name>/ by a separate process
+model_versions = ModelVersionStore(MODEL_DIR)
+
+# joblib mmap mode for artifact arrays ('r' shares read-only pages between workers; empty disables)
+MODEL_MMAP_MODE = os.getenv('CTAS_MODEL_MMAP_MODE', 'r') or None
+
+# Compile the models' tree ensembles at load time with tree_inference (0 keeps sklearn)
+NATIVE_TREES = os.getenv('CTAS_NATIVE_TREES', '1') != '0'
+
+# Startup timing report, filled in while artifacts load and warm up
+startup_report = {
+    'started_at': None,
+    'completed_at': None,
+    'completed': False,
+    'total_time_ms': None,
+    'models': {}
+}
+
+def model_artifact_path(model_name: str) -> str:
+    """Location of the artifact to serve: the active version, or the exported <model_name>.pkl"""
+    active = model_versions.active_version(model_name)
+    return active['artifact'] if active else model_versions.initial_artifact(model_name)
+
+def model_ready(model_name: str) -> bool:
+    """True when a model is loaded, trained and warmed up"""
+    return model_name in models and getattr(models[model_name], 'is_trained', False)
+
+def warm_up_model(model_name: str, model) -> None:
+    """Run one inference with default features so first requests don't pay lazy-initialization costs"""
+    member = ENSEMBLE_MEMBERS[model_name]
+    features = member['extract']({'max_wind_speed': 120.0})
+    getattr(model, member['method'])(features)
+
 async def initialize_models():
     """Initialize all AI models on startup"""
     try:
         logger.info("Initializing AI models...")
+        startup_report['started_at'] = datetime.now()
         
-        # Initialize available models with graceful error handling
-        
-        # Initialize Algal Bloom Predictor
-        if AlgalBloomPredictor:
-            try:
-                models['algal_bloom'] = AlgalBloomPredictor()
-                # Skip training for now to get the service up quickly
-                model_status['algal_bloom'] = {'status': 'ready', 'last_trained': datetime.now()}
-                logger.info("✓ Algal Bloom Predictor initialized")
-            except Exception as e:
-                logger.warning(f"Algal Bloom model initialization failed: {e}")
-                model_status['algal_bloom'] = {'status': 'error', 'error': str(e)}
-        else:
-            logger.warning("Algal Bloom Predictor not available")
-            model_status['algal_bloom'] = {'status': 'unavailable', 'error': 'Module not found'}
-        
-        # Initialize other available models
-        if SeaLevelAnomalyDetector:
-            try:
-                models['sea_level'] = SeaLevelAnomalyDetector()
-                model_status['sea_level'] = {'status': 'ready', 'last_trained': datetime.now()}
-                logger.info("✓ Sea Level Anomaly Detector initialized")
-            except Exception as e:
-                logger.warning(f"Sea Level model initialization failed: {e}")
-                model_status['sea_level'] = {'status': 'error', 'error': str(e)}
-        else:
-            model_status['sea_level'] = {'status': 'unavailable', 'error': 'Module not found'}
-        
-        if CycloneTrajectoryModel:
-            try:
-                models['cyclone'] = CycloneTrajectoryModel()
-                model_status['cyclone'] = {'status': 'ready', 'last_trained': datetime.now()}
-                logger.info("✓ Cyclone Trajectory Model initialized")
-            except Exception as e:
-                logger.warning(f"Cyclone model initialization failed: {e}")
-                model_status['cyclone'] = {'status': 'error', 'error': str(e)}
-        else:
-            model_status['cyclone'] = {'status': 'unavailable', 'error': 'Module not found'}
-        
-        if PollutionEventClassifier:
-            try:
-                models['pollution'] = PollutionEventClassifier()
-                model_status['pollution'] = {'status': 'ready', 'last_trained': datetime.now()}
-                logger.info("✓ Pollution Event Classifier initialized")
-            except Exception as e:
-                logger.warning(f"Pollution model initialization failed: {e}")
-                model_status['pollution'] = {'status': 'error', 'error': str(e)}
-        else:
-            model_status['pollution'] = {'status': 'unavailable', 'error': 'Module not found'}
-        
-        if BlueCarbonHealthMonitor:
-            try:
-                models['blue_carbon'] = BlueCarbonHealthMonitor()
-                model_status['blue_carbon'] = {'status': 'ready', 'last_trained': datetime.now()}
-                logger.info("✓ Blue Carbon Health Monitor initialized")
-            except Exception as e:
-                logger.warning(f"Blue Carbon model initialization failed: {e}")
-                model_status['blue_carbon'] = {'status': 'error', 'error': str(e)}
-        else:
-            model_status['blue_carbon'] = {'status': 'unavailable', 'error': 'Module not found'}
-        
-        # Add basic status for missing models
-        if 'coastal_threat' not in model_status:
-            model_status['coastal_threat'] = {'status': 'unavailable', 'error': 'Model file with hyphens - needs manual loading'}
-        if 'mangrove_health' not in model_status:
-            model_status['mangrove_health'] = {'status': 'unavailable', 'error': 'Model file with hyphens - needs manual loading'}
-        
-        logger.info("🌊 AI models initialization completed!")
-        
+        # Register available models with graceful error handling; modules import as their artifacts load
+        for model_name in model_registry.names():
+            display_name = model_registry.display_name(model_name)
+            if not model_registry.available(model_name):
+                logger.warning(f"{display_name} not available")
+                model_status[model_name] = {'status': 'unavailable', 'error': 'Module not found'}
+                continue
+            
+            artifact = model_artifact_path(model_name)
+            if os.path.exists(artifact):
+                model_status[model_name] = {'status': 'loading', 'artifact': artifact}
+            else:
+                logger.warning(f"{display_name} has no artifact at {artifact}")
+                model_status[model_name] = {'status': 'untrained', 'error': f'No artifact at {artifact}'}
+    
     except Exception as e:
         logger.error(f"Failed to initialize models: {e}")
         # Don't raise - let the service start even with failed models
 
+async def load_model_version(model_name: str, artifact: str):
+    """Load an artifact (memory-mapped) into a new model object and warm it up, off the event loop"""
+    report = {'artifact': artifact}
+    
+    def import_model_code():
+        # The model class and tree_inference both import sklearn, which is slow: keep it off the event loop
+        model_class = model_registry.model_class(model_name)
+        if not NATIVE_TREES:
+            return model_class, None
+        from tree_inference import compile_model
+        return model_class, compile_model
+    
+    t0 = time.perf_counter()
+    model_class, compile_model = await asyncio.to_thread(import_model_code)
+    model = model_class()
+    report['import_time_ms'] = (time.perf_counter() - t0) * 1000
+    
+    t0 = time.perf_counter()
+    await asyncio.to_thread(model.load_model, artifact, MODEL_MMAP_MODE)
+    report['load_time_ms'] = (time.perf_counter() - t0) * 1000
+    
+    if NATIVE_TREES:
+        # Forests, boosted trees and isolation forests run on flat NumPy node arrays with the scaler folded
+        # into their thresholds, checked bit-exact against the sklearn pipeline first
+        t0 = time.perf_counter()
+        report['native_trees'] = await asyncio.to_thread(compile_model, model)
+        report['compile_time_ms'] = (time.perf_counter() - t0) * 1000
+    
+    t0 = time.perf_counter()
+    await asyncio.to_thread(warm_up_model, model_name, model)
+    report['warmup_time_ms'] = (time.perf_counter() - t0) * 1000
+    
+    return model, report
+
+def swap_model(model_name: str, model, version: Optional[Dict[str, Any]]):
+    """
+    Atomically replace the serving model object
+    
+    The old object is never mutated: requests already running keep their
+    reference to it and finish on the old version.
+    """
+    previous = model_versions.previous_version(model_name)
+    models[model_name] = model
+    prediction_cache.invalidate(model_name)
+    
+    model_status[model_name] = {
+        'status': 'ready',
+        'version': version['version'] if version else None,
+        'previous_version': previous['version'] if previous else None,
+        'artifact': version['artifact'] if version else None,
+        'last_trained': version.get('trained_at') if version else None,
+        'training_time_s': version.get('training_time_s') if version else None
+    }
+
+async def load_model_artifacts():
+    """Load the active artifact of every model and warm it up before serving it"""
+    started = time.perf_counter()
+    
+    for model_name in model_registry.names():
+        if model_status.get(model_name, {}).get('status') != 'loading':
+            continue
+        display_name = model_registry.display_name(model_name)
+        
+        artifact = model_status[model_name]['artifact']
+        try:
+            model_status[model_name]['status'] = 'warming_up'
+            model, report = await load_model_version(model_name, artifact)
+            
+            # Swap in only once warmed up, so requests never see a half-loaded model
+            swap_model(model_name, model, model_versions.active_version(model_name))
+            logger.info(f"✓ {display_name} loaded in {report['load_time_ms']:.0f} ms, warmed up in {report['warmup_time_ms']:.0f} ms")
+        except Exception as e:
+            logger.warning(f"{display_name} artifact loading failed: {e}")
+            model_status[model_name] = {'status': 'error', 'artifact': artifact, 'error': str(e)}
+            report = {'artifact': artifact, 'error': str(e)}
+        
+        startup_report['models'][model_name] = report
+    
+    # Process workers hold their own copy of the models
+    inference_executor.refresh()
+    
+    startup_report['total_time_ms'] = (time.perf_counter() - started) * 1000
+    startup_report['completed_at'] = datetime.now()
+    startup_report['completed'] = True
+    logger.info(f"🌊 AI models initialization completed in {startup_report['total_time_ms']:.0f} ms!")
+
+def preload_models():
+    """
+    Load and warm every model synchronously, before the app starts serving
+    
+    serve.py calls this in the launcher process before forking workers, which
+    then share the loaded models instead of loading their own copies.
+    """
+    async def load():
+        await initialize_models()
+        # Import every model module before the fork, so workers don't each import their own
+        await asyncio.to_thread(model_registry.warm_up)
+        await load_model_artifacts()
+    
+    asyncio.run(load())
+
+def collect_runtime_metrics():
+    """Scrape-time gauges read from the executor, micro-batcher, cache and model registry"""
+    executor = inference_executor.snapshot()
+    batching = micro_batcher.snapshot()['per_model']
+    cache = prediction_cache.snapshot()['per_model']
+    coalescing = single_flight.snapshot()
+    memory = process_memory()
+    
+    return [
+        ('ctas_executor_queue_depth', 'gauge', 'Model tasks waiting for an executor slot',
+         [({}, executor['queue_depth'])] + [({'model': name}, stats['queued']) for name, stats in executor['per_model'].items()]
+         + [({'priority': priority}, queued) for priority, queued in executor['queue_depth_by_priority'].items()]),
+        ('ctas_executor_running', 'gauge', 'Model tasks running on executor workers',
+         [({}, executor['running'])]),
+        ('ctas_executor_rejected_total', 'counter', 'Model tasks rejected because the queue was full',
+         [({}, executor['rejected'])]),
+        ('ctas_micro_batch_pending', 'gauge', 'Rows waiting for their micro-batch window',
+         [({'model': name}, stats['pending']) for name, stats in batching.items()]),
+        ('ctas_cache_hits_total', 'counter', 'Prediction cache hits',
+         [({'model': name}, stats['hits']) for name, stats in cache.items()]),
+        ('ctas_cache_misses_total', 'counter', 'Prediction cache misses',
+         [({'model': name}, stats['misses']) for name, stats in cache.items()]),
+        ('ctas_cache_hit_ratio', 'gauge', 'Prediction cache hit ratio since startup',
+         [({'model': name}, stats['hit_rate']) for name, stats in cache.items()]),
+        ('ctas_coalesced_requests_total', 'counter', 'Requests that shared an identical in-flight computation',
+         [({}, coalescing['coalesced'])]),
+        ('ctas_model_ready', 'gauge', 'Whether a model is loaded and serving',
+         [({'model': name}, int(status.get('status') == 'ready')) for name, status in model_status.items()]),
+        ('ctas_stream_sessions', 'gauge', 'Open streaming sessions',
+         [({}, stream_stats['sessions'])]),
+        ('ctas_stream_readings_total', 'counter', 'Readings received over streaming sessions by outcome',
+         [({'outcome': 'received'}, stream_stats['readings']), ({'outcome': 'predicted'}, stream_stats['predictions']),
+          ({'outcome': 'error'}, stream_stats['errors'])]),
+        ('ctas_process_memory_bytes', 'gauge', 'Memory of this serving process (shared: pages also mapped by the launcher or other workers)',
+         [({'pid': str(memory['pid']), 'kind': kind}, memory[f'{kind}_bytes'])
+          for kind in ('rss', 'pss', 'shared', 'private') if memory.get(f'{kind}_bytes') is not None])
+    ]
+
+metrics.registry.register_collector(collect_runtime_metrics)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize models on startup"""
+    # Workers forked by serve.py inherit models the launcher already loaded and warmed
+    if startup_report['completed']:
+        inference_executor.start(models)
+        start_bulk_jobs()
+        start_station_snapshots()
+        return
+    
     await initialize_models()
+    inference_executor.start(models)
+    start_bulk_jobs()
+    start_station_snapshots()
+    # Artifacts load in the background so /health answers while models warm up
+    asyncio.create_task(load_model_artifacts())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop inference and retraining workers on shutdown"""
+    micro_batcher.shutdown()
+    bulk_jobs.shutdown()
+    station_snapshots.shutdown()
+    inference_executor.shutdown()
+    model_versions.shutdown()
 
 @app.get("/")
 async def root():
@@ -268,7 +516,16 @@ async def root():
             "mangrove_health": "/predict/mangrove-health",
             "algal_bloom": "/predict/algal-bloom",
             "ensemble": "/predict/ensemble",
-            "model_status": "/models/status"
+            "batch": "/predict/{model}/batch",
+            "columnar": "/predict/{model}/columnar",
+            "grid": "/predict/grid",
+            "model_status": "/models/status",
+            "metrics": "/metrics",
+            "worker_memory": "/workers/memory",
+            "stream": "ws /stream/{model}/{station_id}",
+            "bulk_jobs": "/jobs/{model_name}",
+            "stations": "/stations/{station_id}",
+            "cache_stats": "/cache/stats"
         }
     }
 
@@ -278,11 +535,60 @@ async def health_check():
     healthy_models = sum(1 for status in model_status.values() if status['status'] == 'ready')
     total_models = len(model_status)
     
+    if not startup_report['completed']:
+        status = "starting"
+    else:
+        status = "healthy" if healthy_models == total_models else "degraded"
+    
     return {
-        "status": "healthy" if healthy_models == total_models else "degraded",
+        "status": status,
+        "ready": startup_report['completed'] and healthy_models > 0,
         "models_ready": f"{healthy_models}/{total_models}",
         "timestamp": datetime.now(),
-        "uptime": "up"
+        "uptime": "up",
+        "executor": {
+            "queue_depth": inference_executor.queue_depth,
+            "running": inference_executor.snapshot()['running']
+        }
+    }
+
+@app.get("/executor/stats")
+async def get_executor_stats():
+    """Inference executor queue depth, wait times and per-model counters for worker sizing"""
+    return {
+        "executor": inference_executor.snapshot(),
+        "micro_batching": micro_batcher.snapshot(),
+        "coalescing": single_flight.snapshot(),
+        "timestamp": datetime.now()
+    }
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Prediction cache hit/miss counters per model"""
+    return {
+        "cache": prediction_cache.snapshot(),
+        "timestamp": datetime.now()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text-format metrics: request counts, stage latency histograms, batch sizes, queue depth, cache hit rates"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/workers/memory")
+async def get_worker_memory():
+    """Resident (RSS), proportional (PSS) and shared memory of this worker, and of every worker when run under serve.py"""
+    launcher_pid = os.getenv('CTAS_LAUNCHER_PID')
+    if launcher_pid and int(launcher_pid) == os.getppid():
+        report = workers_memory(int(launcher_pid))
+    else:
+        report = {'launcher': None, 'workers': [process_memory()]}
+    
+    return {
+        "worker_id": os.getenv('CTAS_WORKER_ID'),
+        "pid": os.getpid(),
+        **report,
+        "timestamp": datetime.now()
     }
 
 @app.get("/models/status")
@@ -290,169 +596,895 @@ async def get_model_status():
     """Get detailed status of all AI models"""
     return {
         "models": model_status,
+        "versions": {name: model_versions.manifest(name) for name in model_registry.names() if model_registry.available(name)},
+        "imports": model_registry.snapshot(),
+        "startup": startup_report,
         "timestamp": datetime.now()
     }
 
 @app.post("/predict/coastal-threat", response_model=ThreatPredictionResponse)
-async def predict_coastal_threat(input_data: CoastalThreatInput):
+async def predict_coastal_threat(input_data: CoastalThreatInput, profile: ResponseProfile = 'full'):
     """Predict coastal threats based on environmental conditions"""
+    metrics.observe_validation('coastal_threat')
     try:
-        if 'coastal_threat' not in models:
+        if not model_ready('coastal_threat'):
             raise HTTPException(status_code=503, detail="Coastal threat model not available")
         
         # Convert input to dict
-        features = input_data.dict()
+        features = model_dict(input_data)
         
         # Get prediction
-        prediction = models['coastal_threat'].predict_threat(features)
-        
-        # Generate recommendations based on threat type
-        recommendations = generate_threat_recommendations(prediction['threat_type'], prediction['severity_score'])
+        prediction = await predict_features('coastal_threat', 'predict_threat', features, profile)
         
-        return ThreatPredictionResponse(
-            threat_type=prediction['threat_type'],
-            severity_score=prediction['severity_score'],
-            confidence=prediction.get('confidence', 85.0),
-            recommendations=recommendations,
-            timestamp=datetime.now()
-        )
+        if profile == 'minimal':
+            return FastJSONResponse(build_minimal_response(prediction))
+        if expired():
+            return FastJSONResponse(build_deadline_response(prediction))
+        return build_threat_response(features, prediction)
         
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
     except Exception as e:
         logger.error(f"Coastal threat prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/coastal-threat/batch", response_model=BatchPredictionResponse)
+async def predict_coastal_threat_batch(input_data: BatchPredictionInput, profile: ResponseProfile = 'full'):
+    """Predict coastal threats for a batch of readings with one vectorized model call"""
+    try:
+        if not model_ready('coastal_threat'):
+            raise HTTPException(status_code=503, detail="Coastal threat model not available")
+        
+        return await run_batch_prediction('coastal_threat', CoastalThreatInput, input_data.items,
+                                    predict_threat_batch, build_threat_response, profile)
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
+    except Exception as e:
+        logger.error(f"Coastal threat batch prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
 @app.post("/predict/mangrove-health", response_model=HealthAssessmentResponse)
-async def predict_mangrove_health(input_data: MangroveHealthInput):
+async def predict_mangrove_health(input_data: MangroveHealthInput, profile: ResponseProfile = 'full'):
     """Assess mangrove ecosystem health"""
+    metrics.observe_validation('mangrove_health')
     try:
-        if 'mangrove_health' not in models:
+        if not model_ready('mangrove_health'):
             raise HTTPException(status_code=503, detail="Mangrove health model not available")
         
         # Convert input to dict
-        features = input_data.dict()
+        features = model_dict(input_data)
         
         # Get health prediction
-        prediction = models['mangrove_health'].predict_health(features)
-        
-        # Get threats assessment
-        threats = models['mangrove_health'].assess_threats(features, prediction['health_score'])
-        
-        return HealthAssessmentResponse(
-            health_score=prediction['health_score'],
-            health_category=prediction['health_category'],
-            is_anomaly=prediction['is_anomaly'],
-            confidence=prediction['confidence'],
-            threats=threats if isinstance(threats, list) else [],
-            timestamp=datetime.now()
-        )
+        prediction = await predict_features('mangrove_health', 'predict_health', features, profile)
         
+        if profile == 'minimal':
+            return FastJSONResponse(build_minimal_response(prediction))
+        if expired():
+            return FastJSONResponse(build_deadline_response(prediction))
+        return build_health_response(features, prediction)
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
     except Exception as e:
         logger.error(f"Mangrove health prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/mangrove-health/batch", response_model=BatchPredictionResponse)
+async def predict_mangrove_health_batch(input_data: BatchPredictionInput, profile: ResponseProfile = 'full'):
+    """Assess mangrove ecosystem health for a batch of readings with one vectorized model call"""
+    try:
+        if not model_ready('mangrove_health'):
+            raise HTTPException(status_code=503, detail="Mangrove health model not available")
+        
+        return await run_batch_prediction('mangrove_health', MangroveHealthInput, input_data.items,
+                                    predict_health_batch, build_health_response, profile)
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
+    except Exception as e:
+        logger.error(f"Mangrove health batch prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
 @app.post("/predict/algal-bloom", response_model=BloomPredictionResponse)
-async def predict_algal_bloom(input_data: AlgalBloomInput):
+async def predict_algal_bloom(input_data: AlgalBloomInput, profile: ResponseProfile = 'full'):
     """Predict algal bloom occurrence and severity"""
+    metrics.observe_validation('algal_bloom')
     try:
-        if 'algal_bloom' not in models:
+        if not model_ready('algal_bloom'):
             raise HTTPException(status_code=503, detail="Algal bloom model not available")
         
         # Convert input to dict
-        features = input_data.dict()
+        features = model_dict(input_data)
         
         # Get bloom prediction
-        prediction = models['algal_bloom'].predict_bloom(features)
-        
-        # Determine risk level
-        risk_level = determine_bloom_risk_level(prediction.get('bloom_probability', 0))
-        
-        # Analyze environmental factors
-        env_factors = analyze_bloom_factors(features)
-        
-        return BloomPredictionResponse(
-            bloom_type=prediction.get('bloom_type', 'unknown'),
-            bloom_probability=prediction.get('bloom_probability', 0.0),
-            severity_score=prediction.get('severity_score', 0.0),
-            risk_level=risk_level,
-            confidence=prediction.get('confidence', 75.0),
-            environmental_factors=env_factors,
-            timestamp=datetime.now()
-        )
+        prediction = await predict_features('algal_bloom', 'predict_bloom', features, profile)
         
+        if profile == 'minimal':
+            return FastJSONResponse(build_minimal_response(prediction))
+        if expired():
+            return FastJSONResponse(build_deadline_response(prediction))
+        return build_bloom_response(features, prediction)
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
     except Exception as e:
         logger.error(f"Algal bloom prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/algal-bloom/batch", response_model=BatchPredictionResponse)
+async def predict_algal_bloom_batch(input_data: BatchPredictionInput, profile: ResponseProfile = 'full'):
+    """Predict algal blooms for a batch of readings with one vectorized model call"""
+    try:
+        if not model_ready('algal_bloom'):
+            raise HTTPException(status_code=503, detail="Algal bloom model not available")
+        
+        return await run_batch_prediction('algal_bloom', AlgalBloomInput, input_data.items,
+                                    predict_bloom_batch, build_bloom_response, profile)
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
+    except Exception as e:
+        logger.error(f"Algal bloom batch prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+@app.post("/predict/{model}/columnar", response_model=BatchPredictionResponse)
+async def predict_columnar(model: str, request: Request, profile: ResponseProfile = 'full'):
+    """
+    Score a columnar body without per-row JSON parsing
+    
+    The body is an Arrow IPC stream, a .npy matrix in the model's feature_names
+    order, or msgpack, decoded in place where the dtype allows. The response is
+    JSON, or the columnar format named in the Accept header.
+    """
+    if model not in PREDICTION_ENDPOINTS:
+        raise HTTPException(status_code=404, detail=f"Model '{model}' not found")
+    model_name, input_model, method, batch_fn, build_response = PREDICTION_ENDPOINTS[model]
+    
+    try:
+        if not model_ready(model_name):
+            raise HTTPException(status_code=503, detail=f"{model_name} model not available")
+        
+        body = await request.body()
+        check_deadline('validation')
+        started = time.perf_counter()
+        try:
+            names, X = decode_columnar(request.headers.get('content-type'), body, models[model_name].feature_names)
+            if len(X) > MAX_BATCH_SIZE:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds maximum size of {MAX_BATCH_SIZE} rows")
+            valid, errors = validate_matrix(input_model, names, X)
+        except UnsupportedFormatError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid columnar body: {str(e)}")
+        metrics.stage_latency.observe(time.perf_counter() - started, model_name, 'validation')
+        
+        response = await predict_validated_rows(model_name, len(X), valid, names, X if len(valid) == len(X) else X[valid],
+                                                errors, batch_fn, build_response, profile)
+        
+        media_type = negotiate_response_type(request.headers.get('accept'))
+        if media_type == JSON:
+            return response
+        
+        columns = results_to_columns([
+            {'index': result.index, 'success': result.success, 'error': result.error, **(result.prediction or {})}
+            for result in response.results
+        ])
+        content, headers = encode_columnar(media_type, columns)
+        return Response(content=content, media_type=media_type, headers=headers)
+    
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
+    except Exception as e:
+        logger.error(f"Columnar prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"Columnar prediction failed: {str(e)}")
+
 @app.post("/predict/ensemble", response_model=EnsembleResponse)
-async def predict_ensemble(input_data: EnsemblePredictionInput):
-    """Run ensemble prediction using multiple models"""
+async def predict_ensemble(input_data: EnsemblePredictionInput, profile: ResponseProfile = 'full'):
+    """Run ensemble prediction using all available models concurrently, each within its own latency budget"""
+    metrics.observe_validation('ensemble')
     try:
-        individual_predictions = {}
-        severity_scores = []
-        threats = []
+        context = build_ensemble_context(input_data)
+        window = deadline_window(request_deadline.get())
         
-        # Extract environmental data
-        env_data = input_data.environmental_data
+        async def compute():
+            # Members are cut off at the window's start, so every caller sharing it gets the (partial) results in time
+            request_deadline.set(window[0] if window else None)
+            return await run_ensemble_members(context, profile)
         
-        # Run coastal threat prediction if model available
-        if 'coastal_threat' in models and models['coastal_threat'].is_trained:
-            try:
-                coastal_input = extract_coastal_features(env_data)
-                coastal_pred = models['coastal_threat'].predict_threat(coastal_input)
-                individual_predictions['coastal_threat'] = coastal_pred
-                severity_scores.append(coastal_pred['severity_score'])
-                if coastal_pred['threat_type'] != 'none':
-                    threats.append(coastal_pred['threat_type'])
-            except Exception as e:
-                logger.warning(f"Coastal threat ensemble prediction failed: {e}")
+        call = single_flight.do(request_key('ensemble', profile, request_priority.get(), window, context), compute)
+        timeout = bounded_timeout(None)
+        try:
+            individual_predictions, member_status = await (call if timeout is None else asyncio.wait_for(call, timeout))
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError('ensemble members')
         
-        # Run mangrove health assessment if model available
-        if 'mangrove_health' in models and models['mangrove_health'].is_trained:
+        response = build_ensemble_response(individual_predictions, member_status, profile)
+        if isinstance(response, dict):
+            return FastJSONResponse(response)
+        return response
+        
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
+    except Exception as e:
+        logger.error(f"Ensemble prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"Ensemble prediction failed: {str(e)}")
+
+@app.post("/predict/ensemble/batch", response_model=BatchPredictionResponse)
+async def predict_ensemble_batch(input_data: BatchPredictionInput, profile: ResponseProfile = 'full'):
+    """Run ensemble predictions for a batch of inputs with one concurrent vectorized call per member model"""
+    try:
+        items = input_data.items
+        if len(items) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds maximum size of {MAX_BATCH_SIZE} rows")
+        
+        results = [None] * len(items)
+        contexts = {}
+        for i, item in enumerate(items):
             try:
-                mangrove_input = extract_mangrove_features(env_data)
-                mangrove_pred = models['mangrove_health'].predict_health(mangrove_input)
-                individual_predictions['mangrove_health'] = mangrove_pred
-                # Convert health score to severity (inverse relationship)
-                severity_scores.append(100 - mangrove_pred['health_score'])
-                if mangrove_pred['health_category'] in ['poor', 'critical']:
-                    threats.append('ecosystem_degradation')
+                contexts[i] = build_ensemble_context(EnsemblePredictionInput(**item))
             except Exception as e:
-                logger.warning(f"Mangrove ensemble prediction failed: {e}")
+                results[i] = BatchItemResult(index=i, success=False, error=str(e))
+        
+        member_predictions = {i: {} for i in contexts}
+        member_status = {i: {} for i in contexts}
         
-        # Run algal bloom prediction if model available
-        if 'algal_bloom' in models and models['algal_bloom'].is_trained:
+        async def run_member_batch(model_name, member):
+            model = models[model_name]
+            rows, row_indices = [], []
+            for i, context in contexts.items():
+                features = member['extract'](context)
+                if features is None:
+                    member_status[i][model_name] = 'skipped'
+                else:
+                    rows.append(features)
+                    row_indices.append(i)
+            
+            X, positions = rows_to_matrix(model, rows)
+            for p in set(range(len(rows))) - set(positions):
+                member_status[row_indices[p]][model_name] = 'error'
+            if not positions:
+                return
+            
+            valid_rows = [rows[p] for p in positions]
+            if member['batch'] is not None:
+                predictions = await inference_executor.run(model_name, member['batch'], X, valid_rows, None, profile)
+            else:
+                predictions = await inference_executor.run(model_name, predict_rows_batch, X, valid_rows, member['method'], profile)
+            
+            for p, prediction in zip(positions, predictions):
+                i = row_indices[p]
+                if isinstance(prediction, Exception):
+                    member_status[i][model_name] = 'error'
+                else:
+                    member_predictions[i][model_name] = prediction
+                    member_status[i][model_name] = 'ok'
+        
+        member_names = []
+        for model_name, member in ENSEMBLE_MEMBERS.items():
+            if model_ready(model_name):
+                member_names.append(model_name)
+            else:
+                for i in contexts:
+                    member_status[i][model_name] = 'unavailable'
+        
+        if contexts:
+            check_deadline('ensemble members')
+            timeout = bounded_timeout(None)
+            outcomes = await asyncio.gather(
+                *(asyncio.wait_for(run_member_batch(name, ENSEMBLE_MEMBERS[name]), timeout) for name in member_names),
+                return_exceptions=True
+            )
+            for model_name, outcome in zip(member_names, outcomes):
+                if isinstance(outcome, (DeadlineExceededError, asyncio.TimeoutError)):
+                    # Rows already skipped or rejected keep their status
+                    for i in contexts:
+                        member_status[i].setdefault(model_name, 'deadline')
+                elif isinstance(outcome, BaseException):
+                    logger.warning(f"{model_name} ensemble batch prediction failed: {outcome}")
+                    for i in contexts:
+                        member_status[i][model_name] = 'shed' if isinstance(outcome, ExecutorSaturatedError) else 'error'
+        
+        for i in contexts:
             try:
-                bloom_input = extract_bloom_features(env_data)
-                bloom_pred = models['algal_bloom'].predict_bloom(bloom_input)
-                individual_predictions['algal_bloom'] = bloom_pred
-                severity_scores.append(bloom_pred.get('severity_score', 0))
-                if bloom_pred.get('bloom_type', 'no_bloom') != 'no_bloom':
-                    threats.append('algal_bloom')
+                response = build_ensemble_response(member_predictions[i], member_status[i], profile)
+                results[i] = BatchItemResult(index=i, success=True,
+                                             prediction=response if isinstance(response, dict) else model_dict(response))
             except Exception as e:
-                logger.warning(f"Algal bloom ensemble prediction failed: {e}")
-        
-        # Calculate combined metrics
-        combined_severity = sum(severity_scores) / len(severity_scores) if severity_scores else 0
-        overall_risk = determine_overall_risk_level(combined_severity)
-        priority_threats = list(set(threats))[:3]  # Top 3 unique threats
-        
-        # Generate ensemble recommendations
-        recommendations = generate_ensemble_recommendations(priority_threats, combined_severity)
-        
-        return EnsembleResponse(
-            overall_risk_level=overall_risk,
-            individual_predictions=individual_predictions,
-            combined_severity=combined_severity,
-            priority_threats=priority_threats,
-            recommendations=recommendations,
-            timestamp=datetime.now()
-        )
+                results[i] = BatchItemResult(index=i, success=False, error=str(e))
+        
+        deadline_exceeded = any(result.prediction.get('deadline_exceeded') for result in results if result.success)
+        return build_batch_response(results, deadline_exceeded)
         
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
     except Exception as e:
-        logger.error(f"Ensemble prediction error: {e}")
-        raise HTTPException(status_code=500, detail=f"Ensemble prediction failed: {str(e)}")
+        logger.error(f"Ensemble batch prediction error: {e}")
+        raise HTTPException(status_code=500, detail=f"Ensemble batch prediction failed: {str(e)}")
+
+@app.post("/predict/grid")
+async def predict_grid(input_data: GridScoringInput, format: Literal['grid', 'geojson'] = 'grid'):
+    """
+    Score every cell of a bounding box for map overlays
+    
+    Cells are built as arrays and each model scores them in one vectorized
+    call (cells with identical inputs are scored once). The response is a
+    float32 .npy raster of shape (fields, rows, cols), north row first, with
+    the field names in X-CTAS-Fields, or a streamed GeoJSON FeatureCollection.
+    """
+    vectorized = [name for name, member in ENSEMBLE_MEMBERS.items() if member['batch'] is not None]
+    model_names = input_data.models or [name for name in vectorized if model_ready(name)]
+    unsupported = [name for name in model_names if name not in vectorized]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Grid scoring needs a vectorized model: {', '.join(unsupported)}")
+    unavailable = [name for name in model_names if not model_ready(name)]
+    if unavailable or not model_names:
+        raise HTTPException(status_code=503, detail=f"Models not available: {', '.join(unavailable or vectorized)}")
+    
+    bbox = (input_data.bbox.min_lon, input_data.bbox.min_lat, input_data.bbox.max_lon, input_data.bbox.max_lat)
+    try:
+        started = time.perf_counter()
+        try:
+            shape = grid_shape(bbox, input_data.resolution, GRID_MAX_CELLS)
+            n_cells = shape[0] * shape[1]
+            lats, lons = cell_centers(bbox, input_data.resolution, shape)
+            columns = {'latitude': lats, 'longitude': lons, **cell_columns(input_data.cell_data, n_cells)}
+            context = {**input_data.environmental_data, 'latitude': float(lats.mean()), 'longitude': float(lons.mean())}
+            matrices = {
+                name: feature_matrix(ENSEMBLE_MEMBERS[name]['extract'], models[name].feature_names, context, columns, n_cells)
+                for name in model_names
+            }
+        except GridError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid environmental data: {str(e)}")
+        metrics.stage_latency.observe(time.perf_counter() - started, 'grid', 'preprocessing')
+        check_deadline('grid scoring')
+        
+        async def score(model_name: str, X):
+            uniques, inverse, scored = unique_rows(X)
+            predictions = []
+            if len(uniques):
+                metrics.batch_size.observe(len(uniques), model_name, 'grid')
+                predictions, timings = await inference_executor.run(
+                    model_name, predict_matrix, uniques, [], ENSEMBLE_MEMBERS[model_name]['batch'], 'minimal'
+                )
+                metrics.observe_stages(model_name, timings)
+            return expand_predictions(predictions, inverse, scored, model_name)
+        
+        applicable = {name: X for name, X in matrices.items() if X is not None}
+        fields = {}
+        for model_fields in await asyncio.gather(*(score(name, X) for name, X in applicable.items())):
+            fields.update(model_fields)
+        
+        if format == 'geojson':
+            dumps = (lambda value: orjson.dumps(value)) if orjson is not None else \
+                (lambda value: json.dumps(value, separators=(',', ':')).encode('utf-8'))
+            return StreamingResponse(geojson_chunks(fields, lats, lons, input_data.resolution, bbox, dumps),
+                                     media_type='application/geo+json')
+        
+        content, headers = encode_grid(fields, shape)
+        headers['X-CTAS-BBox'] = ','.join(str(edge) for edge in bbox)
+        return Response(content=content, media_type=NPY, headers=headers)
+    
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise overload_error(e)
+    except DeadlineExceededError as e:
+        raise deadline_error(e)
+    except Exception as e:
+        logger.error(f"Grid scoring error: {e}")
+        raise HTTPException(status_code=500, detail=f"Grid scoring failed: {str(e)}")
+
+@app.post("/jobs/{model_name}", status_code=202)
+async def submit_bulk_job(model_name: str, request: Request, path: Optional[str] = None,
+                          output_format: Literal['csv', 'parquet'] = 'csv', keep_columns: Optional[str] = None,
+                          profile: ResponseProfile = 'full'):
+    """
+    Submit a dataset for background scoring and get a job ID to poll
+    
+    The dataset is the request body (text/csv or application/vnd.apache.parquet)
+    or, with `path`, a file under CTAS_BULK_INPUT_DIRS. Each row must carry the
+    model's feature columns; `keep_columns` (comma-separated) are copied into
+    the results so they can be joined back, e.g. station_id,timestamp.
+    Request bodies are limited to CTAS_BULK_MAX_UPLOAD_MB.
+    """
+    if model_name not in ENSEMBLE_MEMBERS:
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
+    if not model_ready(model_name):
+        raise HTTPException(status_code=503, detail=f"{model_name} model not available")
+    
+    job_id, directory = bulk_jobs.new_job_dir()
+    try:
+        if path:
+            input_path = bulk_jobs.check_input_path(path)
+            input_format = detect_format(input_path)
+        else:
+            input_format = detect_format('', request.headers.get('content-type'))
+            input_path = os.path.join(directory, f'input.{input_format}')
+            declared = request.headers.get('content-length')
+            await bulk_jobs.save_upload(request.stream(), input_path, int(declared) if declared and declared.isdigit() else None)
+        
+        job = await asyncio.to_thread(
+            bulk_jobs.create, job_id, model_name, ENSEMBLE_MEMBERS[model_name]['method'],
+            model_status[model_name].get('artifact') or model_artifact_path(model_name),
+            input_path, input_format, output_format, profile,
+            [name.strip() for name in keep_columns.split(',')] if keep_columns else None, not path
+        )
+    except PermissionError as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        status_code = getattr(e, 'status_code', 400) if isinstance(e, (JobError, ValueError)) else 500
+        raise HTTPException(status_code=status_code, detail=f"Job not accepted: {str(e)}")
+    
+    bulk_jobs.schedule(job_id)
+    logger.info(f"Bulk job {job_id}: {job['total_rows']} rows of {model_name} in {job['chunks']} chunks")
+    return {**bulk_jobs.progress(job), 'status_url': f'/jobs/{job_id}'}
+
+@app.get("/jobs")
+async def list_bulk_jobs():
+    """Every bulk-scoring job with its progress"""
+    return {"jobs": await asyncio.to_thread(bulk_jobs.list_jobs), "manager": bulk_jobs.snapshot()}
+
+@app.get("/jobs/{job_id}")
+async def get_bulk_job(job_id: str):
+    """Progress of a bulk-scoring job"""
+    job = bulk_jobs.load(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return bulk_jobs.progress(job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_bulk_job_result(job_id: str):
+    """Download the results of a completed job (one file, rows in input order)"""
+    job = bulk_jobs.load(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if job['status'] != 'completed':
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}; finished chunks are at /jobs/{job_id}/parts/{{chunk}}")
+    return FileResponse(result_path(job), filename=f"{job_id}-{job['model']}.{job['output_format']}",
+                        media_type=BULK_MEDIA_TYPES[job['output_format']])
+
+@app.get("/jobs/{job_id}/parts/{chunk}")
+async def get_bulk_job_part(job_id: str, chunk: int):
+    """Download one finished chunk of a job that is still running"""
+    job = bulk_jobs.load(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    path = part_path(job, chunk)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Chunk {chunk} of job '{job_id}' is not available")
+    return FileResponse(path, media_type=BULK_MEDIA_TYPES[job['output_format']])
+
+@app.delete("/jobs/{job_id}")
+async def cancel_bulk_job(job_id: str):
+    """Cancel a queued or running job (chunks already running finish), or delete a finished one and its files"""
+    job = bulk_jobs.load(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if job['status'] in ('completed', 'failed', 'cancelled'):
+        bulk_jobs.delete(job_id)
+        return {"message": f"Deleted job {job_id}", "timestamp": datetime.now()}
+    bulk_jobs.cancel(job_id)
+    return {"message": f"Cancelling job {job_id}", "timestamp": datetime.now()}
+
+@app.get("/stations")
+async def list_station_snapshots():
+    """Latest assessment of every monitored station"""
+    return FastJSONResponse({
+        "stations": station_snapshots.all(),
+        "scheduler": station_snapshots.snapshot(),
+        "timestamp": datetime.now()
+    })
+
+@app.get("/stations/{station_id}")
+async def get_station_snapshot(station_id: str):
+    """Latest background-computed assessment of a station, with its age and a staleness flag"""
+    snapshot = station_snapshots.get(station_id)
+    if snapshot is None:
+        if station_id in station_snapshots.stations:
+            raise HTTPException(status_code=404, detail=f"Station '{station_id}' has not been assessed yet")
+        raise HTTPException(status_code=404, detail=f"Station '{station_id}' is not monitored")
+    return FastJSONResponse(snapshot)
+
+@app.post("/stations/{station_id}/readings", status_code=202)
+async def record_station_readings(station_id: str, environmental_data: Dict[str, Any]):
+    """Update a station's sensor readings; its assessment is refreshed in the background"""
+    try:
+        station_snapshots.record_reading(station_id, environmental_data)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Station '{station_id}' is not monitored")
+    return {"message": f"Readings recorded for station {station_id}", "timestamp": datetime.now()}
+
+@app.websocket("/stream/{model}/{station_id}")
+async def stream_predictions(websocket: WebSocket, model: str, station_id: str, profile: ResponseProfile = 'full'):
+    """
+    Streaming predictions for one station over a WebSocket
+    
+    The client pushes readings (a JSON object, or an array of objects) and
+    receives one message per reading, in order. Readings from all sessions
+    share the per-model micro-batches. When a client stops consuming
+    predictions, the server stops reading its socket once
+    CTAS_STREAM_MAX_PENDING readings are outstanding.
+    """
+    if model not in PREDICTION_ENDPOINTS:
+        await websocket.close(code=1008, reason=f"Unknown model '{model}'")
+        return
+    
+    model_name, input_model, method, batch_fn, build_response = PREDICTION_ENDPOINTS[model]
+    await websocket.accept()
+    stream_stats['sessions'] += 1
+    outbox = asyncio.Queue(maxsize=STREAM_MAX_PENDING)
+    
+    async def predict_reading(reading):
+        if not isinstance(reading, dict):
+            raise ValueError("reading must be a JSON object")
+        features = model_dict(input_model(**reading))
+        if station_id in station_snapshots.stations:
+            station_snapshots.record_reading(station_id, ensemble_context_fields(model_name, features))
+        if not model_ready(model_name):
+            raise RuntimeError(f"{model_name} model not available")
+        prediction = await predict_features(model_name, method, features, profile)
+        if profile == 'minimal':
+            return to_builtin(build_minimal_response(prediction))
+        return model_dict(build_response(features, prediction))
+    
+    async def send_results():
+        while True:
+            sequence, pending = await outbox.get()
+            message = {'station_id': station_id, 'sequence': sequence}
+            try:
+                message['prediction'] = await pending
+                stream_stats['predictions'] += 1
+            except Exception as e:
+                message['error'] = str(e)
+                stream_stats['errors'] += 1
+            await websocket.send_text(json.dumps(message, default=str))
+    
+    sender = asyncio.ensure_future(send_results())
+    sequence = 0
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                payload = json.loads(text)
+            except ValueError:
+                payload = [None]
+            for reading in payload if isinstance(payload, list) else [payload]:
+                stream_stats['readings'] += 1
+                # Blocks while the client is behind, which stops reads from its socket
+                await outbox.put((sequence, asyncio.ensure_future(predict_reading(reading))))
+                sequence += 1
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        while not outbox.empty():
+            outbox.get_nowait()[1].cancel()
+        stream_stats['sessions'] -= 1
 
 # Helper functions
+def model_dict(model: BaseModel) -> Dict[str, Any]:
+    """A request or response model as a dict (model_dump on Pydantic 2, dict on 1)"""
+    return model.model_dump() if hasattr(model, 'model_dump') else model.dict()
+
+async def predict_features(model_name: str, method: str, features: Dict[str, Any],
+                           profile: str = 'full') -> Dict[str, Any]:
+    """Single-row prediction through the prediction cache, then a coalesced micro-batched (or direct) model call"""
+    cache_key = None
+    if prediction_cache.enabled:
+        cache_key = prediction_cache.key(models[model_name].feature_names, features)
+        if cache_key is not None:
+            cache_key = (profile,) + cache_key
+    
+    if cache_key is not None:
+        cached = prediction_cache.get(model_name, cache_key)
+        if cached is not None:
+            return cached
+        generation = prediction_cache.generation(model_name)
+    
+    window = deadline_window(request_deadline.get())
+    
+    async def compute():
+        # The shared call may run to the window's end; each caller stops waiting at its own deadline
+        request_deadline.set(window[1] if window else None)
+        if micro_batcher.supports(model_name):
+            prediction = await micro_batcher.submit(model_name, features, profile)
+        else:
+            prediction = await inference_executor.run(model_name, predict_single, method, features, profile)
+        
+        if cache_key is not None:
+            prediction_cache.put(model_name, cache_key, prediction, generation)
+        return prediction
+    
+    # Callers of different priorities or deadline windows don't share a computation (a shed low-priority
+    # leader would fail the others, and one caller's deadline must not cut short another's call)
+    call = single_flight.do(request_key('predict', model_name, profile, request_priority.get(), window, features), compute)
+    timeout = bounded_timeout(None)
+    if timeout is None:
+        return await call
+    try:
+        return await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceededError(f'{model_name} inference')
+
+def overload_error(error: ExecutorSaturatedError) -> HTTPException:
+    """429 (low priority shed) or 503 (overloaded) with a Retry-After hint for a request admission control rejected"""
+    return HTTPException(status_code=error.status_code, detail=str(error),
+                         headers={'Retry-After': str(error.retry_after_s)})
+
+def deadline_error(error: DeadlineExceededError) -> HTTPException:
+    """504 for a request whose deadline passed before any result was ready"""
+    return HTTPException(status_code=error.status_code, detail=str(error))
+
+def build_deadline_response(prediction: Dict[str, Any]) -> Dict[str, Any]:
+    """The model's answer as returned, flagged as partial, once the deadline leaves no time for post-processing"""
+    return {**build_minimal_response(prediction), 'partial': True, 'deadline_exceeded': True}
+
+def build_minimal_response(prediction: Dict[str, Any]) -> Dict[str, Any]:
+    """Minimal-profile response: the model's scores and labels as returned, plus a timestamp"""
+    return {**prediction, 'timestamp': datetime.now()}
+
+def build_threat_response(features: Dict[str, Any], prediction: Dict[str, Any]) -> ThreatPredictionResponse:
+    """Build the coastal threat API response from a model prediction"""
+    # Generate recommendations based on threat type
+    recommendations = generate_threat_recommendations(prediction['primary_threat'], prediction['severity_score'])
+    
+    return ThreatPredictionResponse(
+        threat_type=prediction['primary_threat'],
+        severity_score=prediction['severity_score'],
+        confidence=prediction.get('threat_confidence', 85.0),
+        recommendations=recommendations,
+        timestamp=datetime.now()
+    )
+
+def build_health_response(features: Dict[str, Any], prediction: Dict[str, Any]) -> HealthAssessmentResponse:
+    """Build the mangrove health API response from a model prediction"""
+    # Get threats assessment
+    threats = models['mangrove_health'].assess_threats(features, prediction['health_score'])
+    
+    return HealthAssessmentResponse(
+        health_score=prediction['health_score'],
+        health_category=prediction['health_category'],
+        is_anomaly=prediction['is_anomaly'],
+        confidence=prediction['confidence'],
+        threats=threats if isinstance(threats, list) else [],
+        timestamp=datetime.now()
+    )
+
+def build_bloom_response(features: Dict[str, Any], prediction: Dict[str, Any]) -> BloomPredictionResponse:
+    """Build the algal bloom API response from a model prediction"""
+    bloom_probabilities = prediction['bloom_probabilities']
+    
+    # Analyze environmental factors
+    env_factors = analyze_bloom_factors(features)
+    
+    return BloomPredictionResponse(
+        bloom_type=prediction['bloom_type'],
+        bloom_probability=1 - bloom_probabilities.get('no_bloom', 0.0),
+        severity_score=prediction['bloom_severity'],
+        risk_level=prediction['risk_level'],
+        confidence=bloom_probabilities[prediction['bloom_type']] * 100,
+        environmental_factors=env_factors,
+        timestamp=datetime.now()
+    )
+
+def build_ensemble_context(input_data: EnsemblePredictionInput) -> Dict[str, Any]:
+    """Merge the request location into the environmental data seen by the member extractors"""
+    return {
+        'latitude': input_data.location.latitude,
+        'longitude': input_data.location.longitude,
+        **input_data.environmental_data
+    }
+
+async def run_ensemble_members(context: Dict[str, Any], profile: str = 'full'):
+    """
+    Fan out to every available ensemble member concurrently, each bounded by
+    its own latency budget and by the request's deadline; members the deadline
+    cuts off are reported as 'deadline'
+    """
+    member_status = {}
+    pending = {}
+    cut_by_deadline = set()
+    
+    for model_name, member in ENSEMBLE_MEMBERS.items():
+        if not model_ready(model_name):
+            member_status[model_name] = 'unavailable'
+            continue
+        
+        features = member['extract'](context)
+        if features is None:
+            member_status[model_name] = 'skipped'
+            continue
+        
+        budget = ENSEMBLE_MEMBER_TIMEOUTS.get(model_name, ENSEMBLE_MEMBER_TIMEOUT_MS) / 1000
+        timeout = bounded_timeout(budget)
+        if timeout < budget:
+            cut_by_deadline.add(model_name)
+        pending[model_name] = asyncio.wait_for(predict_features(model_name, member['method'], features, profile), timeout)
+    
+    results = await asyncio.gather(*pending.values(), return_exceptions=True)
+    
+    individual_predictions = {}
+    shed = []
+    missed_deadline = []
+    for model_name, result in zip(pending, results):
+        if isinstance(result, DeadlineExceededError) or (isinstance(result, asyncio.TimeoutError) and model_name in cut_by_deadline):
+            member_status[model_name] = 'deadline'
+            missed_deadline.append(model_name)
+        elif isinstance(result, asyncio.TimeoutError):
+            member_status[model_name] = 'timeout'
+            logger.warning(f"{model_name} ensemble member exceeded its latency budget")
+        elif isinstance(result, ExecutorSaturatedError):
+            member_status[model_name] = 'shed'
+            shed.append(result)
+        elif isinstance(result, BaseException):
+            member_status[model_name] = 'error'
+            logger.warning(f"{model_name} ensemble prediction failed: {result}")
+        else:
+            member_status[model_name] = 'ok'
+            individual_predictions[model_name] = result
+    
+    # Overloaded for every member: answer with the admission error instead of an empty ensemble
+    if shed and not individual_predictions:
+        raise shed[0]
+    # Nothing finished before the deadline: there is no partial result to return
+    if missed_deadline and not individual_predictions:
+        raise DeadlineExceededError('ensemble members')
+    
+    member_status = {name: member_status[name] for name in ENSEMBLE_MEMBERS}
+    return individual_predictions, member_status
+
+def build_ensemble_response(individual_predictions: Dict[str, Any], member_status: Optional[Dict[str, str]] = None,
+                            profile: str = 'full'):
+    """
+    Combine individual model predictions into an ensemble response (a plain
+    dict without recommendations for the minimal profile, or once the request's
+    deadline has passed)
+    """
+    member_status = member_status or {name: 'ok' for name in individual_predictions}
+    severity_scores = []
+    threats = []
+    
+    for model_name, member in ENSEMBLE_MEMBERS.items():
+        if model_name in individual_predictions:
+            severity, member_threats = member['contribution'](individual_predictions[model_name])
+            severity_scores.append(severity)
+            threats.extend(member_threats)
+    
+    # Calculate combined metrics
+    combined_severity = sum(severity_scores) / len(severity_scores) if severity_scores else 0
+    overall_risk = determine_overall_risk_level(combined_severity)
+    priority_threats = list(set(threats))[:3]  # Top 3 unique threats
+    
+    response = {
+        'overall_risk_level': overall_risk,
+        'individual_predictions': to_builtin(individual_predictions),
+        'combined_severity': combined_severity,
+        'priority_threats': priority_threats,
+        'member_status': member_status,
+        'partial': any(status in ('timeout', 'error', 'shed', 'deadline') for status in member_status.values()),
+        'deadline_exceeded': 'deadline' in member_status.values(),
+        'timestamp': datetime.now()
+    }
+    if profile == 'minimal':
+        return response
+    if expired():
+        response.update(partial=True, deadline_exceeded=True)
+        return response
+    
+    # Generate ensemble recommendations
+    recommendations = generate_ensemble_recommendations(priority_threats, combined_severity)
+    
+    return EnsembleResponse(recommendations=recommendations, **response)
+
+async def run_batch_prediction(model_name: str, input_model, items: List[Any], batch_fn, build_response,
+                               profile: str = 'full') -> BatchPredictionResponse:
+    """Validate a batch as a block, run one vectorized model call and build per-row results in input order"""
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds maximum size of {MAX_BATCH_SIZE} rows")
+    
+    check_deadline('validation')
+    started = time.perf_counter()
+    valid, names, X, errors = validate_rows(input_model, items)
+    metrics.stage_latency.observe(time.perf_counter() - started, model_name, 'validation')
+    
+    return await predict_validated_rows(model_name, len(items), valid, names, X, errors, batch_fn, build_response, profile)
+
+async def predict_validated_rows(model_name: str, n_rows: int, valid: List[int], names: List[str], X,
+                                 errors: Dict[int, str], batch_fn, build_response,
+                                 profile: str = 'full') -> BatchPredictionResponse:
+    """
+    Run one vectorized model call over validated rows (X holds only the valid
+    rows) and merge in per-row errors. When the deadline passes during the
+    model call, rows are returned as the model answered them, flagged as partial.
+    """
+    model = models[model_name]
+    results = [None] * n_rows
+    deadline_exceeded = False
+    for i, error in errors.items():
+        results[i] = BatchItemResult(index=i, success=False, error=error)
+    metrics.prediction_rows.inc(model_name, 'invalid', amount=len(errors))
+    
+    if valid:
+        started = time.perf_counter()
+        rows = [dict(zip(names, row)) for row in X.tolist()]
+        X = assemble_matrix(model, names, X)
+        metrics.stage_latency.observe(time.perf_counter() - started, model_name, 'preprocessing')
+        
+        metrics.batch_size.observe(len(rows), model_name, 'batch_endpoint')
+        predictions, timings = await inference_executor.run(model_name, predict_matrix, X, rows, batch_fn, profile)
+        metrics.observe_stages(model_name, timings)
+        deadline_exceeded = profile != 'minimal' and expired()
+        
+        for i, features, prediction in zip(valid, rows, predictions):
+            try:
+                if isinstance(prediction, Exception):
+                    raise prediction
+                if profile == 'minimal' or deadline_exceeded:
+                    prediction = to_builtin(prediction)
+                else:
+                    prediction = model_dict(build_response(features, prediction))
+                results[i] = BatchItemResult(index=i, success=True, prediction=prediction)
+                metrics.prediction_rows.inc(model_name, 'ok')
+            except Exception as e:
+                results[i] = BatchItemResult(index=i, success=False, error=str(e))
+                metrics.prediction_rows.inc(model_name, 'error')
+    
+    return build_batch_response(results, deadline_exceeded)
+
+def build_batch_response(results: List[BatchItemResult], deadline_exceeded: bool = False) -> BatchPredictionResponse:
+    """Summarize per-row batch results"""
+    succeeded = sum(1 for result in results if result.success)
+    
+    return BatchPredictionResponse(
+        results=results,
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        deadline_exceeded=deadline_exceeded,
+        timestamp=datetime.now()
+    )
+
 def generate_threat_recommendations(threat_type: str, severity: float) -> List[str]:
     """Generate recommendations based on threat type and severity"""
     recommendations = []
@@ -499,19 +1531,6 @@ def generate_threat_recommendations(threat_type: str, severity: float) -> List[s
     
     return recommendations
 
-def determine_bloom_risk_level(probability: float) -> str:
-    """Determine risk level based on bloom probability"""
-    if probability > 0.8:
-        return "very_high"
-    elif probability > 0.6:
-        return "high"
-    elif probability > 0.4:
-        return "moderate"
-    elif probability > 0.2:
-        return "low"
-    else:
-        return "very_low"
-
 def analyze_bloom_factors(features: Dict[str, float]) -> Dict[str, str]:
     """Analyze environmental factors contributing to bloom risk"""
     factors = {}
@@ -589,6 +1608,239 @@ def extract_bloom_features(env_data: Dict[str, Any]) -> Dict[str, float]:
         'human_activity_index': env_data.get('human_activity_index', 30.0)
     }
 
+def extract_sea_level_features(env_data: Dict[str, Any]) -> Dict[str, float]:
+    """Extract sea level anomaly features from environmental data"""
+    return {
+        'sea_level_height': env_data.get('sea_level_height', 50.0),
+        'atmospheric_pressure': env_data.get('atmospheric_pressure', 1013.0),
+        'wind_speed': env_data.get('wind_speed', 8.0),
+        'wind_direction': env_data.get('wind_direction', 180.0),
+        'air_temperature': env_data.get('air_temperature', 25.0),
+        'water_temperature': env_data.get('water_temperature', 24.0),
+        'tidal_residual': env_data.get('tidal_residual', 10.0),
+        'significant_wave_height': env_data.get('significant_wave_height', env_data.get('wave_height', 1.2)),
+        'storm_surge_component': env_data.get('storm_surge_component', 5.0),
+        'rainfall_24h': env_data.get('rainfall_24h', 2.0),
+        'moon_phase': env_data.get('moon_phase', 0.5),
+        'seasonal_component': env_data.get('seasonal_component', env_data.get('season', 1)),
+        'el_nino_index': env_data.get('el_nino_index', 0.0),
+        'pressure_trend_3h': env_data.get('pressure_trend_3h', 0.0),
+        'temperature_gradient': env_data.get('temperature_gradient', 1.0)
+    }
+
+def extract_pollution_features(env_data: Dict[str, Any]) -> Dict[str, float]:
+    """Extract pollution event features from environmental data"""
+    return {
+        'water_temperature': env_data.get('water_temperature', 24.0),
+        'dissolved_oxygen': env_data.get('dissolved_oxygen', 7.5),
+        'ph_level': env_data.get('ph_level', 8.0),
+        'turbidity': env_data.get('turbidity', 3.0),
+        'conductivity': env_data.get('conductivity', 50000.0),
+        'oil_film_thickness': env_data.get('oil_film_thickness', 0.0),
+        'plastic_debris_count': env_data.get('plastic_debris_count', 1.0),
+        'chemical_oxygen_demand': env_data.get('chemical_oxygen_demand', 3.0),
+        'ammonia_nitrogen': env_data.get('ammonia_nitrogen', 0.3),
+        'phosphate_phosphorus': env_data.get('phosphate_phosphorus', 0.2),
+        'heavy_metals_index': env_data.get('heavy_metals_index', 5.0),
+        'bacterial_count': env_data.get('bacterial_count', 2.0),
+        'foam_presence': env_data.get('foam_presence', 0.0),
+        'odor_intensity': env_data.get('odor_intensity', 0.0),
+        'water_color_anomaly': env_data.get('water_color_anomaly', 0.0),
+        'vessel_traffic_density': env_data.get('vessel_traffic_density', 2.0),
+        'industrial_discharge': env_data.get('industrial_discharge', 0.0),
+        'rainfall_24h': env_data.get('rainfall_24h', 5.0),
+        'wind_speed': env_data.get('wind_speed', 8.0),
+        'current_velocity': env_data.get('current_velocity', 0.5),
+        'distance_to_shore': env_data.get('distance_to_shore', 10.0),
+        'population_density': env_data.get('population_density', 1000.0)
+    }
+
+def extract_blue_carbon_features(env_data: Dict[str, Any]) -> Dict[str, float]:
+    """Extract blue carbon ecosystem features from environmental data"""
+    return {
+        'ndvi': env_data.get('ndvi', 0.8),
+        'evi': env_data.get('evi', 0.7),
+        'lai': env_data.get('lai', 5.0),
+        'canopy_cover_percent': env_data.get('canopy_cover_percent', 90.0),
+        'water_temperature': env_data.get('water_temperature', 27.0),
+        'salinity': env_data.get('salinity', 25.0),
+        'dissolved_oxygen': env_data.get('dissolved_oxygen', 7.5),
+        'ph_level': env_data.get('ph_level', 7.8),
+        'turbidity': env_data.get('turbidity', 5.0),
+        'nutrient_nitrogen': env_data.get('nutrient_nitrogen', 1.0),
+        'nutrient_phosphorus': env_data.get('nutrient_phosphorus', 0.2),
+        'tidal_range': env_data.get('tidal_range', 2.0),
+        'wave_energy': env_data.get('wave_energy', 10.0),
+        'sediment_accretion_rate': env_data.get('sediment_accretion_rate', 10.0),
+        'water_depth_mean': env_data.get('water_depth_mean', 2.5),
+        'current_velocity': env_data.get('current_velocity', 0.3),
+        'air_temperature': env_data.get('air_temperature', 28.0),
+        'rainfall_annual': env_data.get('rainfall_annual', 1500.0),
+        'humidity': env_data.get('humidity', 80.0),
+        'solar_radiation': env_data.get('solar_radiation', 350.0),
+        'wind_speed': env_data.get('wind_speed', 10.0),
+        'coastal_development_index': env_data.get('coastal_development_index', 20.0),
+        'boat_traffic_density': env_data.get('boat_traffic_density', 2.0),
+        'pollution_index': env_data.get('pollution_index', 15.0),
+        'fishing_pressure': env_data.get('fishing_pressure', 25.0),
+        'tourism_pressure': env_data.get('tourism_pressure', 500.0),
+        'species_diversity_index': env_data.get('species_diversity_index', 2.8),
+        'biomass_density': env_data.get('biomass_density', 30.0),
+        'root_depth_average': env_data.get('root_depth_average', 160.0),
+        'pneumatophore_density': env_data.get('pneumatophore_density', 220.0),
+        'epiphyte_coverage': env_data.get('epiphyte_coverage', 12.0),
+        'storm_frequency': env_data.get('storm_frequency', 0.5),
+        'disease_incidence': env_data.get('disease_incidence', 0.1),
+        'herbivory_pressure': env_data.get('herbivory_pressure', 15.0),
+        'invasive_species_presence': env_data.get('invasive_species_presence', 0.0)
+    }
+
+def extract_cyclone_features(env_data: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    """Extract cyclone trajectory features; returns None when no storm system is described"""
+    if 'max_wind_speed' not in env_data and 'central_pressure' not in env_data:
+        return None
+    
+    current_lat = env_data.get('current_lat', env_data.get('latitude', 18.5))
+    current_lon = env_data.get('current_lon', env_data.get('longitude', -65.0))
+    coriolis = 2 * 7.272e-5 * math.sin(math.radians(current_lat))
+    
+    return {
+        'current_lat': current_lat,
+        'current_lon': current_lon,
+        'previous_lat_24h': env_data.get('previous_lat_24h', current_lat),
+        'previous_lon_24h': env_data.get('previous_lon_24h', current_lon),
+        'max_wind_speed': env_data.get('max_wind_speed', 120.0),
+        'central_pressure': env_data.get('central_pressure', 980.0),
+        'pressure_gradient': env_data.get('pressure_gradient', 8.0),
+        'sea_surface_temp': env_data.get('sea_surface_temp', env_data.get('water_temperature', 28.5)),
+        'upper_level_divergence': env_data.get('upper_level_divergence', 2.0),
+        'wind_shear': env_data.get('wind_shear', 6.0),
+        'relative_humidity': env_data.get('relative_humidity', 80.0),
+        'coriolis_parameter': env_data.get('coriolis_parameter', coriolis),
+        'steering_flow_u': env_data.get('steering_flow_u', -8.0),
+        'steering_flow_v': env_data.get('steering_flow_v', 3.0),
+        'atmospheric_instability': env_data.get('atmospheric_instability', 2500.0),
+        'season_factor': env_data.get('season_factor', 0.9),
+        'ocean_heat_content': env_data.get('ocean_heat_content', 75.0),
+        'land_distance': env_data.get('land_distance', 150.0),
+        'beta_drift': env_data.get('beta_drift', coriolis * 0.1),
+        'time_of_day': env_data.get('time_of_day', 12)
+    }
+
+# Severity contributed by each sea level anomaly grade
+SEA_LEVEL_SEVERITY = {'normal': 0, 'minor': 25, 'moderate': 50, 'severe': 75, 'extreme': 95}
+
+# Severity contributed by each forecast cyclone intensity category
+CYCLONE_INTENSITY_SEVERITY = {
+    'tropical_depression': 20, 'tropical_storm': 40, 'category_1': 55, 'category_2': 65,
+    'category_3': 75, 'category_4': 85, 'category_5': 95
+}
+
+def coastal_threat_contribution(prediction: Dict[str, Any]):
+    """Severity and threats contributed by a coastal threat prediction"""
+    threats = [prediction['primary_threat']] if prediction['primary_threat'] != 'none' else []
+    return prediction['severity_score'], threats
+
+def mangrove_health_contribution(prediction: Dict[str, Any]):
+    """Severity and threats contributed by a mangrove health prediction"""
+    # Convert health score to severity (inverse relationship)
+    threats = ['ecosystem_degradation'] if prediction['health_category'] in ['poor', 'critical'] else []
+    return 100 - prediction['health_score'], threats
+
+def algal_bloom_contribution(prediction: Dict[str, Any]):
+    """Severity and threats contributed by an algal bloom prediction (low-risk blooms are not a threat)"""
+    blooming = prediction['bloom_type'] != 'no_bloom'
+    threats = ['algal_bloom'] if blooming and prediction['risk_level'] != 'low' else []
+    return prediction['bloom_severity'], threats
+
+def sea_level_contribution(prediction: Dict[str, Any]):
+    """Severity and threats contributed by a sea level anomaly detection"""
+    threats = ['sea_level_anomaly'] if prediction['is_anomaly'] else []
+    return SEA_LEVEL_SEVERITY.get(prediction['severity'], 0), threats
+
+def pollution_contribution(prediction: Dict[str, Any]):
+    """Severity and threats contributed by a pollution event classification"""
+    threats = ['pollution_event'] if prediction['pollution_type'] != 'no_pollution' else []
+    return prediction['pollution_severity'], threats
+
+def blue_carbon_contribution(prediction: Dict[str, Any]):
+    """Severity and threats contributed by a blue carbon ecosystem assessment"""
+    threats = ['ecosystem_degradation'] if prediction['health_category'] in ['poor', 'critical'] else []
+    return max(0, min(100, 100 - prediction['health_score'])), threats
+
+def cyclone_contribution(prediction: Dict[str, Any]):
+    """Severity and threats contributed by a cyclone trajectory forecast"""
+    severity = max(
+        (CYCLONE_INTENSITY_SEVERITY.get(step['intensity_category'], 0) for step in prediction['predictions']),
+        default=0
+    )
+    threats = ['cyclone'] if severity >= CYCLONE_INTENSITY_SEVERITY['tropical_storm'] else []
+    return severity, threats
+
+# Ensemble members: feature extractor, single-row method, vectorized batch predictor
+# (None falls back to per-row calls) and severity/threat contribution
+ENSEMBLE_MEMBERS = {
+    'coastal_threat': {
+        'extract': extract_coastal_features, 'method': 'predict_threat',
+        'batch': predict_threat_batch, 'contribution': coastal_threat_contribution
+    },
+    'mangrove_health': {
+        'extract': extract_mangrove_features, 'method': 'predict_health',
+        'batch': predict_health_batch, 'contribution': mangrove_health_contribution,
+        # Features extract_mangrove_features reads from differently named context fields
+        'context_fields': {'water_temp': 'water_temperature', 'rainfall': 'monthly_rainfall'}
+    },
+    'algal_bloom': {
+        'extract': extract_bloom_features, 'method': 'predict_bloom',
+        'batch': predict_bloom_batch, 'contribution': algal_bloom_contribution
+    },
+    'sea_level': {
+        'extract': extract_sea_level_features, 'method': 'detect_anomaly',
+        'batch': None, 'contribution': sea_level_contribution
+    },
+    'pollution': {
+        'extract': extract_pollution_features, 'method': 'classify_pollution',
+        'batch': None, 'contribution': pollution_contribution
+    },
+    'blue_carbon': {
+        'extract': extract_blue_carbon_features, 'method': 'assess_ecosystem_health',
+        'batch': None, 'contribution': blue_carbon_contribution
+    },
+    'cyclone': {
+        'extract': extract_cyclone_features, 'method': 'predict_trajectory',
+        'batch': None, 'contribution': cyclone_contribution
+    }
+}
+
+BULK_MEDIA_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+def ensemble_context_fields(model_name: str, features: Dict[str, Any]) -> Dict[str, Any]:
+    """A model's features keyed by the ensemble context fields its extract function reads them from"""
+    renamed = ENSEMBLE_MEMBERS[model_name].get('context_fields', {})
+    return {renamed.get(name, name): value for name, value in features.items()}
+
+def start_bulk_jobs():
+    """Start the bulk-job manager, resuming jobs left unfinished by a restart"""
+    bulk_jobs.start({name: member['batch'] for name, member in ENSEMBLE_MEMBERS.items()})
+
+async def assess_station(context: Dict[str, Any]) -> Dict[str, Any]:
+    """Full ensemble assessment of a station's context for the snapshot table"""
+    individual_predictions, member_status = await run_ensemble_members(context)
+    if not individual_predictions:
+        raise RuntimeError(f"No ensemble member produced a prediction ({member_status})")
+    return model_dict(build_ensemble_response(individual_predictions, member_status))
+
+def start_station_snapshots():
+    """Start refreshing station assessments once every model has loaded"""
+    station_snapshots.start(assess_station, ready=lambda: startup_report['completed'])
+
+# Endpoint name -> (model name, input schema, single-row method, vectorized predictor, response builder)
+PREDICTION_ENDPOINTS = {
+    'coastal-threat': ('coastal_threat', CoastalThreatInput, 'predict_threat', predict_threat_batch, build_threat_response),
+    'mangrove-health': ('mangrove_health', MangroveHealthInput, 'predict_health', predict_health_batch, build_health_response),
+    'algal-bloom': ('algal_bloom', AlgalBloomInput, 'predict_bloom', predict_bloom_batch, build_bloom_response)
+}
+
 def determine_overall_risk_level(combined_severity: float) -> str:
     """Determine overall risk level from combined severity score"""
     if combined_severity > 80:
@@ -633,38 +1885,111 @@ def generate_ensemble_recommendations(threats: List[str], severity: float) -> Li
         recommendations.append("Implement ecosystem protection measures")
         recommendations.append("Reduce human impact in affected areas")
     
+    if 'cyclone' in threats:
+        recommendations.append("Track cyclone forecasts and prepare evacuation orders")
+    
+    if 'sea_level_anomaly' in threats:
+        recommendations.append("Verify tide gauge readings and watch for storm surge")
+    
+    if 'pollution_event' in threats:
+        recommendations.append("Investigate pollution source and deploy containment")
+    
     return recommendations
 
 @app.post("/models/retrain/{model_name}")
 async def retrain_model(model_name: str, background_tasks: BackgroundTasks):
-    """Retrain a specific model with new data"""
-    if model_name not in models:
+    """Retrain a model in a separate process and hot-swap the new version once it is warmed up"""
+    if not model_registry.available(model_name):
         raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
+    if model_status.get(model_name, {}).get('retraining'):
+        raise HTTPException(status_code=409, detail=f"Model '{model_name}' is already retraining")
     
-    def retrain_task():
+    async def retrain_task():
         try:
             logger.info(f"Starting retraining for {model_name}")
-            model_status[model_name]['status'] = 'retraining'
             
-            # Retrain the model
-            result = models[model_name].train()
+            # Train and save a new version out of process; the serving model keeps answering
+            version = await model_versions.train_version(model_name)
+            model, report = await load_model_version(model_name, version['artifact'])
             
-            model_status[model_name]['status'] = 'ready'
-            model_status[model_name]['last_trained'] = datetime.now()
-            model_status[model_name]['training_result'] = result
+            model_versions.set_active(model_name, version['version'])
+            swap_model(model_name, model, version)
+            model_status[model_name]['training_result'] = version['training_result']
+            inference_executor.refresh()
             
-            logger.info(f"Retraining completed for {model_name}")
+            logger.info(f"Retraining completed for {model_name}: version {version['version']} in {version['training_time_s']} s")
             
         except Exception as e:
-            model_status[model_name]['status'] = 'error'
-            model_status[model_name]['error'] = str(e)
+            model_status[model_name]['retraining'] = False
+            model_status[model_name]['retrain_error'] = str(e)
             logger.error(f"Retraining failed for {model_name}: {e}")
     
+    model_status.setdefault(model_name, {'status': 'untrained'})
+    model_status[model_name]['retraining'] = True
     background_tasks.add_task(retrain_task)
     
     return {
         "message": f"Retraining started for {model_name}",
         "status": "in_progress",
+        "active_version": model_status[model_name].get('version'),
+        "timestamp": datetime.now()
+    }
+
+@app.post("/models/rollback/{model_name}")
+async def rollback_model(model_name: str):
+    """Swap a model back to the version that was active before the active one"""
+    if not model_registry.available(model_name):
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
+    
+    previous = model_versions.previous_version(model_name)
+    if previous is None:
+        raise HTTPException(status_code=409, detail=f"Model '{model_name}' has no previous version to roll back to")
+    
+    try:
+        model, report = await load_model_version(model_name, previous['artifact'])
+    except Exception as e:
+        logger.error(f"Rollback failed for {model_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Rollback failed: {str(e)}")
+    
+    rolled_back_from = model_status.get(model_name, {}).get('version')
+    model_versions.rollback(model_name)
+    swap_model(model_name, model, previous)
+    inference_executor.refresh()
+    
+    logger.info(f"Rolled back {model_name} from {rolled_back_from} to {previous['version']}")
+    return {
+        "message": f"Rolled back {model_name}",
+        "active_version": previous['version'],
+        "rolled_back_from": rolled_back_from,
+        "timestamp": datetime.now()
+    }
+
+@app.post("/models/{model_name}/versions/{version}/activate")
+async def activate_model_version(model_name: str, version: str):
+    """Serve any recorded version of a model (a retrained version or a compacted variant), swapped in once warmed up"""
+    if not model_registry.available(model_name):
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found")
+    
+    entry = model_versions.get_version(model_name, version)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' has no version '{version}'")
+    
+    try:
+        model, report = await load_model_version(model_name, entry['artifact'])
+    except Exception as e:
+        logger.error(f"Activating {model_name} version {version} failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Activation failed: {str(e)}")
+    
+    replaced = model_status.get(model_name, {}).get('version')
+    model_versions.set_active(model_name, version)
+    swap_model(model_name, model, entry)
+    inference_executor.refresh()
+    
+    logger.info(f"Activated {model_name} version {version} (was {replaced})")
+    return {
+        "message": f"Activated {model_name} version {version}",
+        "active_version": version,
+        "replaced_version": replaced,
         "timestamp": datetime.now()
     }
 
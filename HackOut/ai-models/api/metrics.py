@@ -0,0 +1,205 @@
+"""
+CTAS Metrics
+Minimal in-process counters and histograms rendered in the Prometheus text
+exposition format, cheap enough to update on every request
+"""
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 10000)
+
+# Set by the ASGI middleware when a request arrives; read by handlers to time validation
+request_started_at: ContextVar[Optional[float]] = ContextVar('request_started_at', default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect: Callable):
+        """
+        Add a scrape-time callback returning (name, type, help, [(labels, value), ...])
+        tuples, for values such as queue depth that are read rather than counted
+        """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        for collect in self._collectors:
+            for name, metric_type, documentation, samples in collect():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'ctas_http_requests_total', 'HTTP requests by endpoint, method and status code',
+    ('endpoint', 'method', 'status')
+)
+http_errors = registry.counter(
+    'ctas_http_request_errors_total', 'HTTP requests answered with a 4xx/5xx status',
+    ('endpoint', 'status')
+)
+http_latency = registry.histogram(
+    'ctas_http_request_duration_seconds', 'End-to-end request latency by endpoint', ('endpoint',)
+)
+stage_latency = registry.histogram(
+    'ctas_stage_duration_seconds',
+    'Prediction latency by model and stage (validation, preprocessing, scaling, model_call, postprocessing)',
+    ('model', 'stage')
+)
+inference_latency = registry.histogram(
+    'ctas_inference_duration_seconds', 'Time a model task spent on an executor worker', ('model',)
+)
+queue_wait = registry.histogram(
+    'ctas_executor_queue_wait_seconds', 'Time a model task waited for an executor slot', ('model', 'priority')
+)
+admission_rejections = registry.counter(
+    'ctas_admission_rejections_total',
+    'Model tasks shed by admission control (queue_full, predicted_wait, wait_budget)',
+    ('model', 'priority', 'reason')
+)
+inference_tasks = registry.counter(
+    'ctas_inference_tasks_total', 'Executor model tasks by outcome', ('model', 'outcome')
+)
+batch_size = registry.histogram(
+    'ctas_batch_size_rows', 'Rows per vectorized model call', ('model', 'source'), BATCH_SIZE_BUCKETS
+)
+prediction_rows = registry.counter(
+    'ctas_prediction_rows_total', 'Rows predicted by model and outcome', ('model', 'outcome')
+)
+
+
+def observe_stages(model_name: str, timings: Dict[str, float]):
+    """Record per-stage timings returned by a vectorized prediction"""
+    for stage, seconds in timings.items():
+        stage_latency.observe(seconds, model_name, stage)
+
+
+def observe_validation(model_name: str):
+    """Record time from request arrival to the handler (body parsing and Pydantic validation)"""
+    started = request_started_at.get()
+    if started is not None:
+        stage_latency.observe(time.perf_counter() - started, model_name, 'validation')
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware counting requests and timing them per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        token = request_started_at.set(started)
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_started_at.reset(token)
+            route = scope.get('route')
+            endpoint = getattr(route, 'path', None) or 'unmatched'
+            code = status[0]
+            http_requests.inc(endpoint, scope.get('method', ''), code)
+            if code >= 400:
+                http_errors.inc(endpoint, code)
+            http_latency.observe(time.perf_counter() - started, endpoint)
@@ -0,0 +1,164 @@
+"""
+CTAS Micro-Batching Scheduler
+Groups concurrent single-row prediction requests per model into one vectorized
+model call, flushed after a short window or once enough rows have arrived
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from batch_inference import predict_feature_rows
+from deadlines import DeadlineExceededError, check_deadline, request_deadline
+from inference_executor import parse_model_settings, request_priority
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    def __init__(self, executor, batch_functions: Dict[str, Callable],
+                 max_wait_ms: Optional[float] = None, max_batch_size: Optional[int] = None,
+                 model_wait_ms: Optional[Dict[str, float]] = None,
+                 model_batch_sizes: Optional[Dict[str, int]] = None):
+        self.executor = executor
+        self.batch_functions = batch_functions
+
+        self.max_wait_ms = float(max_wait_ms if max_wait_ms is not None else os.getenv('CTAS_MICROBATCH_WAIT_MS', '2'))
+        self.max_batch_size = int(max_batch_size or os.getenv('CTAS_MICROBATCH_MAX_ROWS', '64'))
+        self.model_wait_ms = model_wait_ms if model_wait_ms is not None else parse_model_settings(
+            os.getenv('CTAS_MICROBATCH_MODEL_WAIT_MS', ''), float
+        )
+        self.model_batch_sizes = model_batch_sizes if model_batch_sizes is not None else parse_model_settings(
+            os.getenv('CTAS_MICROBATCH_MODEL_MAX_ROWS', '')
+        )
+
+        # Groups are keyed by (model, response profile, priority): one vectorized call serves one
+        # profile and is admitted at one priority, so high-priority rows never wait in a low-priority group.
+        # Each row keeps its request's deadline; rows already past it are dropped when the group flushes
+        self._pending: Dict[Tuple[str, str, str], List[Tuple[Dict[str, Any], asyncio.Future, Optional[float]]]] = {}
+        self._timers: Dict[Tuple[str, str, str], asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def supports(self, model_name: str) -> bool:
+        """True when the model has a vectorized predictor to batch into"""
+        return model_name in self.batch_functions
+
+    def settings(self, model_name: str) -> Tuple[float, int]:
+        """(window in ms, maximum rows) used for a model"""
+        return (
+            self.model_wait_ms.get(model_name, self.max_wait_ms),
+            max(1, self.model_batch_sizes.get(model_name, self.max_batch_size))
+        )
+
+    def _model_stats(self, model_name: str) -> Dict[str, Any]:
+        if model_name not in self.stats:
+            self.stats[model_name] = {'requests': 0, 'batches': 0, 'rows': 0, 'max_batch_size': 0, 'full_flushes': 0}
+        return self.stats[model_name]
+
+    async def submit(self, model_name: str, features: Dict[str, Any], profile: str = 'full'):
+        """Queue one row for the model's next group and wait for that row's prediction"""
+        if not self.supports(model_name):
+            raise ValueError(f"No vectorized predictor registered for {model_name}")
+        check_deadline(f'{model_name} inference')
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (model_name, profile, request_priority.get())
+        pending = self._pending.setdefault(key, [])
+        pending.append((features, future, request_deadline.get()))
+        self._model_stats(model_name)['requests'] += 1
+
+        wait_ms, max_rows = self.settings(model_name)
+        if len(pending) >= max_rows:
+            self._model_stats(model_name)['full_flushes'] += 1
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(wait_ms / 1000, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: Tuple[str, str, str]):
+        """Hand the rows collected so far to one vectorized model call"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        model_name, profile, priority = key
+        group = self._pending.pop(key, [])
+        # Callers that already gave up (e.g. an ensemble deadline) don't need a row
+        now = time.perf_counter()
+        live = []
+        for features, future, deadline in group:
+            if future.done():
+                continue
+            if deadline is not None and deadline <= now:
+                future.set_exception(DeadlineExceededError(f'{model_name} inference'))
+                continue
+            live.append((features, future, deadline))
+        group = live
+        if not group:
+            return
+
+        model_stats = self._model_stats(model_name)
+        model_stats['batches'] += 1
+        model_stats['rows'] += len(group)
+        model_stats['max_batch_size'] = max(model_stats['max_batch_size'], len(group))
+
+        task = asyncio.ensure_future(self._run_group(model_name, profile, priority, group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_group(self, model_name: str, profile: str, priority: str,
+                         group: List[Tuple[Dict[str, Any], asyncio.Future, Optional[float]]]):
+        rows = [features for features, _, _ in group]
+        # The group runs for as long as its most patient row is willing to wait
+        deadlines = [deadline for _, _, deadline in group]
+        request_deadline.set(None if None in deadlines else max(deadlines))
+        metrics.batch_size.observe(len(rows), model_name, 'micro_batch')
+        try:
+            predictions, timings = await self.executor.run(
+                model_name, predict_feature_rows, rows, self.batch_functions[model_name], profile, priority=priority
+            )
+            metrics.observe_stages(model_name, timings)
+        except Exception as e:
+            logger.warning(f"{model_name} micro-batch of {len(rows)} rows failed: {e}")
+            predictions = [e] * len(rows)
+
+        for (_, future, _), prediction in zip(group, predictions):
+            if future.done():
+                continue
+            if isinstance(prediction, Exception):
+                metrics.prediction_rows.inc(model_name, 'error')
+                future.set_exception(prediction)
+            else:
+                metrics.prediction_rows.inc(model_name, 'ok')
+                future.set_result(prediction)
+
+    def shutdown(self):
+        """Flush rows still waiting for their window"""
+        for key in list(self._pending):
+            self._flush(key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Batching settings and observed group sizes per model"""
+        per_model = {}
+        for model_name in self.batch_functions:
+            stats = self._model_stats(model_name)
+            wait_ms, max_rows = self.settings(model_name)
+            per_model[model_name] = {
+                **stats,
+                'window_ms': wait_ms,
+                'max_rows': max_rows,
+                'pending': sum(len(group) for key, group in self._pending.items() if key[0] == model_name),
+                'avg_batch_size': stats['rows'] / stats['batches'] if stats['batches'] else 0.0
+            }
+
+        return {
+            'window_ms': self.max_wait_ms,
+            'max_rows': self.max_batch_size,
+            'per_model': per_model
+        }
@@ -0,0 +1,389 @@
+"""
+CTAS Model Compaction
+Derives smaller variants of a model's served artifact (fewer trees, a depth
+limit, cost-complexity pruning, float32 node storage) and reports for each
+its artifact size, resident memory, single-row p50/p99 latency and agreement
+with the full model on held-out synthetic data. Variants are recorded as
+versions of the model, so the service can serve any of them
+(POST /models/{model_name}/versions/{version}/activate).
+
+    python model_compaction.py --models algal_bloom,coastal_threat,sea_level
+    python model_compaction.py --models algal_bloom --variant trees=50 --variant depth=12,float32 --output compaction.json
+
+Variant specs are comma-separated: trees=N keeps the first N trees (boosting
+stages), depth=D cuts every tree at depth D, ccp=ALPHA applies minimal
+cost-complexity pruning (forest and boosted trees; the alpha is in units of
+each tree's impurity), float32 stores compiled thresholds and leaf values
+as float32 and drops sklearn's own trees.
+"""
+
+import argparse
+import gc
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor, IsolationForest
+from sklearn.ensemble._iforest import _average_path_length
+from sklearn.tree._tree import TREE_LEAF, TREE_UNDEFINED, Tree
+
+from model_versions import MODELS_DIR, ModelVersionStore
+from process_memory import process_memory
+from tree_inference import NATIVE_TREES, CompiledEnsemble, compile_model, supported_estimators
+
+logger = logging.getLogger(__name__)
+
+# Same as the service: joblib mmap mode used to load artifacts ('r' shares read-only pages between workers)
+MODEL_MMAP_MODE = os.getenv('CTAS_MODEL_MMAP_MODE', 'r') or None
+
+DEFAULT_VARIANTS = ['trees=50', 'depth=12', 'float32', 'trees=50,depth=12,float32']
+
+
+def parse_variant(spec: str) -> Dict[str, Any]:
+    """'trees=50,depth=12,float32' -> {'trees': 50, 'depth': 12, 'float32': True}"""
+    variant = {}
+    for part in spec.split(','):
+        key, _, value = part.strip().partition('=')
+        try:
+            if key in ('trees', 'depth'):
+                variant[key] = int(value)
+                if variant[key] < 1:
+                    raise ValueError
+            elif key == 'ccp':
+                variant[key] = float(value)
+                if variant[key] < 0:
+                    raise ValueError
+            elif key == 'float32' and not value:
+                variant[key] = True
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid variant setting '{part}' (expected trees=N, depth=D, ccp=ALPHA or float32)")
+    return variant
+
+
+def variant_version(variant: Dict[str, Any]) -> str:
+    """Version name a variant is recorded under, e.g. compact-trees50-depth12-f32"""
+    parts = [f'{key}{variant[key]}' for key in ('trees', 'depth', 'ccp') if key in variant]
+    if variant.get('float32'):
+        parts.append('f32')
+    return '-'.join(['compact'] + parts)
+
+
+def decision_trees(estimator) -> List[Any]:
+    """The fitted DecisionTree / ExtraTree estimators of a forest, boosted ensemble or isolation forest"""
+    if isinstance(estimator, (GradientBoostingRegressor, GradientBoostingClassifier)):
+        return list(estimator.estimators_.ravel())
+    return list(estimator.estimators_)
+
+
+def node_count(estimator) -> int:
+    return int(sum(tree.tree_.node_count for tree in decision_trees(estimator)))
+
+
+def keep_trees(estimator, n_trees: int):
+    """Keep the first n_trees trees (for boosted ensembles: the first n_trees stages)"""
+    if isinstance(estimator, (GradientBoostingRegressor, GradientBoostingClassifier)):
+        n_trees = min(n_trees, estimator.estimators_.shape[0])
+        estimator.estimators_ = estimator.estimators_[:n_trees]
+        estimator.train_score_ = estimator.train_score_[:n_trees]
+        estimator.n_estimators_ = n_trees
+    else:
+        n_trees = min(n_trees, len(estimator.estimators_))
+        estimator.estimators_ = estimator.estimators_[:n_trees]
+        if hasattr(estimator, 'estimators_features_'):
+            estimator.estimators_features_ = estimator.estimators_features_[:n_trees]
+        if hasattr(estimator, '_seeds'):
+            estimator._seeds = estimator._seeds[:n_trees]
+    estimator.n_estimators = n_trees
+
+
+def limit_depth(tree: Tree, max_depth: int) -> Tree:
+    """
+    A copy of a fitted sklearn Tree cut at max_depth: nodes deeper are
+    dropped and the nodes at max_depth become leaves holding the value sklearn
+    stored for them while growing the tree
+    """
+    if tree.max_depth <= max_depth:
+        return tree
+    state = tree.__getstate__()
+    nodes, values = state['nodes'], state['values']
+
+    levels = [np.array([0], dtype=np.intp)]
+    for _ in range(max_depth):
+        parents = levels[-1][nodes['left_child'][levels[-1]] != TREE_LEAF]
+        levels.append(np.concatenate([nodes['left_child'][parents], nodes['right_child'][parents]]))
+    kept = np.sort(np.concatenate(levels))
+
+    pruned = nodes[kept]
+    cut = np.isin(kept, levels[-1]) & (pruned['left_child'] != TREE_LEAF)
+    pruned['left_child'][cut] = pruned['right_child'][cut] = TREE_LEAF
+    pruned['feature'][cut] = TREE_UNDEFINED
+    pruned['threshold'][cut] = TREE_UNDEFINED
+    pruned['missing_go_to_left'][cut] = 0
+
+    # Node ids are positions, so renumber the children of the nodes still splitting
+    remap = np.full(len(nodes), TREE_LEAF, dtype=np.intp)
+    remap[kept] = np.arange(len(kept))
+    split = pruned['left_child'] != TREE_LEAF
+    pruned['left_child'][split] = remap[pruned['left_child'][split]]
+    pruned['right_child'][split] = remap[pruned['right_child'][split]]
+
+    limited = Tree(*tree.__reduce__()[1])
+    limited.__setstate__({'max_depth': max_depth, 'node_count': len(kept), 'nodes': pruned,
+                          'values': np.ascontiguousarray(values[kept])})
+    return limited
+
+
+def refresh_isolation_forest(estimator: IsolationForest):
+    """Recompute the per-node path lengths an isolation forest caches at fit time (as fit does)"""
+    estimator._average_path_length_per_tree, estimator._decision_path_lengths = zip(*[
+        (_average_path_length(tree.tree_.n_node_samples), tree.tree_.compute_node_depths())
+        for tree in estimator.estimators_
+    ])
+
+
+def compact_model(model, variant: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Apply a variant to every tree ensemble of a loaded (not compiled) model
+    object in place; returns trees and nodes per estimator before and after
+    """
+    stats = {}
+    for name, estimator in list(vars(model).items()):
+        if not isinstance(estimator, supported_estimators()) or not hasattr(estimator, 'estimators_'):
+            continue
+        before = {'trees_before': len(decision_trees(estimator)), 'nodes_before': node_count(estimator)}
+
+        if 'trees' in variant:
+            keep_trees(estimator, variant['trees'])
+        for tree in decision_trees(estimator):
+            if 'depth' in variant:
+                tree.tree_ = limit_depth(tree.tree_, variant['depth'])
+            if variant.get('ccp') and not isinstance(estimator, IsolationForest):
+                # Isolation trees split at random; their impurity does not measure fit
+                tree.ccp_alpha = variant['ccp']
+                tree._prune_tree()
+        if isinstance(estimator, IsolationForest):
+            refresh_isolation_forest(estimator)
+        stats[name] = {**before, 'trees': len(decision_trees(estimator)), 'nodes': node_count(estimator)}
+
+        if variant.get('float32'):
+            compiled = CompiledEnsemble(estimator, max_rows=0, dtype=np.float32).strip()
+            stats[name]['node_bytes'] = compiled.trees.nbytes
+            setattr(model, name, compiled)
+    return stats
+
+
+def held_out_rows(model, n_rows: int, seed: int) -> List[Dict[str, float]]:
+    """
+    Feature dicts the model was not trained on. The synthetic generators
+    reseed numpy themselves, so the rows are drawn (under seed) from those
+    generated past the default sample count training uses.
+    """
+    n_train = inspect.signature(model.generate_synthetic_data).parameters['n_samples'].default
+    state = np.random.get_state()
+    try:
+        data = model.generate_synthetic_data(n_train + 4 * n_rows)
+    finally:
+        np.random.set_state(state)
+    unseen = data[model.feature_names].iloc[n_train:]
+    picked = np.sort(np.random.default_rng(seed).choice(len(unseen), n_rows, replace=False))
+    return unseen.iloc[picked].astype(float).to_dict('records')
+
+
+def _estimators(model) -> Dict[str, Any]:
+    return {name: value for name, value in vars(model).items()
+            if isinstance(value, supported_estimators() + (CompiledEnsemble,)) and hasattr(value, 'predict')}
+
+
+def measure_artifact(model_name: str, artifact: str, rows: List[Dict[str, float]], n_calls: int) -> Dict[str, Any]:
+    """
+    Load an artifact as the service does (load_model, then compile when
+    CTAS_NATIVE_TREES is on) and measure the memory it added, the latency of
+    single-row preprocessing + scaling + every estimator, and each
+    estimator's predictions on the held-out rows. Run in a fresh process so
+    memory is not shared with other variants.
+    """
+    if MODELS_DIR not in sys.path:
+        sys.path.append(MODELS_DIR)
+    from export_model_artifacts import load_model_class
+
+    model = load_model_class(model_name)()
+    gc.collect()
+    before = process_memory()
+    model.load_model(artifact, MODEL_MMAP_MODE)
+    if NATIVE_TREES:
+        compile_model(model)
+    estimators = _estimators(model)
+
+    X_scaled = model.scaler.transform(model.preprocess_data(rows))
+    predictions = {name: np.asarray(estimator.predict(X_scaled)) for name, estimator in estimators.items()}
+    gc.collect()
+    after = process_memory()
+
+    timings = []
+    for i in range(n_calls):
+        started = time.perf_counter()
+        X = model.scaler.transform(model.preprocess_data(rows[i % len(rows)]))
+        for estimator in estimators.values():
+            estimator.predict(X)
+            if hasattr(estimator.estimator if isinstance(estimator, CompiledEnsemble) else estimator, 'predict_proba'):
+                estimator.predict_proba(X)
+        timings.append(time.perf_counter() - started)
+
+    def delta(key):
+        if before.get(key) is None or after.get(key) is None:
+            return None
+        return after[key] - before[key]
+
+    return {
+        'artifact_bytes': os.path.getsize(artifact),
+        'memory': {'rss_bytes': delta('rss_bytes'), 'pss_bytes': delta('pss_bytes'),
+                   'private_bytes': delta('private_bytes')},
+        'latency_ms': {
+            'p50': round(float(np.percentile(timings, 50)) * 1000, 4),
+            'p99': round(float(np.percentile(timings, 99)) * 1000, 4)
+        },
+        'kinds': {name: getattr(estimator, '_estimator_type', None) for name, estimator in estimators.items()},
+        'predictions': predictions
+    }
+
+
+def compare_predictions(full: Dict[str, Any], variant: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """
+    Per estimator: share of held-out rows with the full model's label (or
+    anomaly flag), or for regressors the error against its outputs
+    """
+    comparison = {}
+    for name, expected in full['predictions'].items():
+        actual = variant['predictions'].get(name)
+        if actual is None:
+            continue
+        if full['kinds'].get(name) == 'regressor':
+            residual = actual.astype(np.float64) - expected
+            variance = float(np.sum((expected - expected.mean()) ** 2))
+            comparison[name] = {
+                'mae': round(float(np.mean(np.abs(residual))), 6),
+                'max_abs_error': round(float(np.max(np.abs(residual))), 6),
+                'r2': round(1 - float(np.sum(residual ** 2)) / variance, 6) if variance else None
+            }
+        else:
+            comparison[name] = {'agreement': round(float(np.mean(actual == expected)), 6)}
+    return comparison
+
+
+def compact_artifacts(model_name: str, model_dir: str, variants: List[str], n_rows: int = 2000,
+                      n_calls: int = 2000, seed: int = 12345, register: bool = True) -> Dict[str, Any]:
+    """
+    Build, measure and (with register) record every variant of a model's
+    served artifact; the full model is measured the same way as the baseline
+    """
+    if MODELS_DIR not in sys.path:
+        sys.path.append(MODELS_DIR)
+    from export_model_artifacts import load_model_class
+
+    store = ModelVersionStore(model_dir)
+    source = store.active_version(model_name)
+    if source is None:
+        raise FileNotFoundError(f"No artifact for {model_name} in {model_dir}")
+    rows = held_out_rows(load_model_class(model_name)(), n_rows, seed)
+
+    # One fresh process per measurement, so each sees only its own artifact's memory
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'), max_tasks_per_child=1)
+    try:
+        full = pool.submit(measure_artifact, model_name, source['artifact'], rows, n_calls).result()
+        report = {
+            'source_version': source['version'],
+            'held_out_rows': n_rows,
+            'full': {key: value for key, value in full.items() if key not in ('predictions', 'kinds')},
+            'variants': []
+        }
+
+        for spec in variants:
+            variant = parse_variant(spec)
+            version = variant_version(variant)
+            model = load_model_class(model_name)()
+            model.load_model(source['artifact'])
+            stats = compact_model(model, variant)
+
+            artifact = store.version_artifact(model_name, version)
+            os.makedirs(os.path.dirname(artifact), exist_ok=True)
+            model.save_model(artifact)
+            measured = pool.submit(measure_artifact, model_name, artifact, rows, n_calls).result()
+
+            entry = {
+                'version': version,
+                'variant': variant,
+                'artifact': artifact,
+                'estimators': stats,
+                **{key: value for key, value in measured.items() if key not in ('predictions', 'kinds')},
+                'comparison': compare_predictions(full, measured)
+            }
+            report['variants'].append(entry)
+            if register:
+                store.add_version(model_name, {
+                    'version': version,
+                    'artifact': artifact,
+                    'trained_at': source.get('trained_at'),
+                    'derived_from': source['version'],
+                    'variant': variant,
+                    'artifact_bytes': entry['artifact_bytes'],
+                    'latency_ms': entry['latency_ms'],
+                    'comparison': entry['comparison']
+                })
+    finally:
+        pool.shutdown()
+    return report
+
+
+if __name__ == "__main__":
+    sys.path.append(MODELS_DIR)
+    from export_model_artifacts import MODEL_SOURCES
+
+    parser = argparse.ArgumentParser(description="Build compact model variants and report their size, memory, latency and accuracy")
+    parser.add_argument('--model-dir', default=os.getenv('CTAS_MODEL_DIR', os.path.join(MODELS_DIR, 'models')))
+    parser.add_argument('--models', default=','.join(MODEL_SOURCES), help="Comma-separated model names")
+    parser.add_argument('--variant', action='append', help=f"Variant spec, repeatable (default: {' '.join(DEFAULT_VARIANTS)})")
+    parser.add_argument('--rows', type=int, default=2000, help="Held-out rows for the accuracy comparison")
+    parser.add_argument('--calls', type=int, default=2000, help="Single-row calls timed per variant")
+    parser.add_argument('--seed', type=int, default=12345, help="Seed picking the held-out rows")
+    parser.add_argument('--no-register', action='store_true', help="Write variant artifacts without recording them as versions")
+    parser.add_argument('--output', help="Write the JSON report to this file (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    variants = args.variant or DEFAULT_VARIANTS
+    for spec in variants:
+        parse_variant(spec)
+
+    report = {}
+    for model_name in args.models.split(','):
+        try:
+            report[model_name] = compact_artifacts(model_name, args.model_dir, variants, args.rows, args.calls,
+                                                   args.seed, not args.no_register)
+        except FileNotFoundError as e:
+            logger.warning(f"Skipping {model_name}: {e}")
+            continue
+        full = report[model_name]['full']
+        logger.info(f"{model_name} full: {full['artifact_bytes'] / 1e6:.1f} MB on disk, "
+                    f"{(full['memory']['rss_bytes'] or 0) / 1e6:.1f} MB RSS, "
+                    f"p50 {full['latency_ms']['p50']:.3f} ms, p99 {full['latency_ms']['p99']:.3f} ms")
+        for entry in report[model_name]['variants']:
+            logger.info(f"{model_name} {entry['version']}: {entry['artifact_bytes'] / 1e6:.1f} MB on disk, "
+                        f"{(entry['memory']['rss_bytes'] or 0) / 1e6:.1f} MB RSS, "
+                        f"p50 {entry['latency_ms']['p50']:.3f} ms, p99 {entry['latency_ms']['p99']:.3f} ms, "
+                        f"{json.dumps(entry['comparison'])}")
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
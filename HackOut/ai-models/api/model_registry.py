@@ -0,0 +1,90 @@
+"""
+CTAS Model Registry
+Imports each model module on first use (or at an explicit warm-up) instead of
+when the API is imported, including the hyphenated coastal-threat-model.py and
+mangrove-health-model.py
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from export_model_artifacts import MODEL_SOURCES, MODELS_DIR, load_model_class
+
+logger = logging.getLogger(__name__)
+
+DISPLAY_NAMES = {
+    'algal_bloom': 'Algal Bloom Predictor',
+    'sea_level': 'Sea Level Anomaly Detector',
+    'cyclone': 'Cyclone Trajectory Model',
+    'pollution': 'Pollution Event Classifier',
+    'blue_carbon': 'Blue Carbon Health Monitor',
+    'coastal_threat': 'Coastal Threat Model',
+    'mangrove_health': 'Mangrove Health Model'
+}
+
+
+class ModelRegistry:
+    def __init__(self, sources: Optional[Dict[str, Any]] = None):
+        self.sources = sources if sources is not None else MODEL_SOURCES
+
+        # Imports run in worker threads (artifact loading is off the event loop)
+        self._lock = threading.Lock()
+        self._classes: Dict[str, type] = {}
+        self._errors: Dict[str, str] = {}
+        self._import_times_ms: Dict[str, float] = {}
+
+    def __contains__(self, model_name: str) -> bool:
+        return model_name in self.sources
+
+    def names(self) -> List[str]:
+        return list(self.sources)
+
+    def display_name(self, model_name: str) -> str:
+        return DISPLAY_NAMES.get(model_name, model_name)
+
+    def available(self, model_name: str) -> bool:
+        """True when the model's module file exists (checked without importing it)"""
+        if model_name not in self.sources:
+            return False
+        return os.path.exists(os.path.join(MODELS_DIR, self.sources[model_name][0]))
+
+    def model_class(self, model_name: str) -> type:
+        """Import the model's module on first use and return its class"""
+        with self._lock:
+            if model_name not in self._classes:
+                started = time.perf_counter()
+                try:
+                    self._classes[model_name] = load_model_class(model_name)
+                except Exception as e:
+                    self._errors[model_name] = str(e)
+                    raise
+                self._import_times_ms[model_name] = (time.perf_counter() - started) * 1000
+                self._errors.pop(model_name, None)
+                logger.info(f"Imported {self.display_name(model_name)} in {self._import_times_ms[model_name]:.0f} ms")
+            return self._classes[model_name]
+
+    def warm_up(self, model_names: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """Import every (or the given) model module now; returns an error message per model that failed"""
+        errors = {}
+        for model_name in model_names or self.names():
+            try:
+                self.model_class(model_name)
+                errors[model_name] = None
+            except Exception as e:
+                logger.warning(f"{self.display_name(model_name)} could not be imported: {e}")
+                errors[model_name] = str(e)
+        return errors
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Which model modules are imported, and how long each import took"""
+        return {
+            model_name: {
+                'imported': model_name in self._classes,
+                'import_time_ms': self._import_times_ms.get(model_name),
+                'error': self._errors.get(model_name)
+            }
+            for model_name in self.sources
+        }
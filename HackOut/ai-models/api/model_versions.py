@@ -0,0 +1,163 @@
+"""
+CTAS Model Versioning
+Versioned model artifacts and out-of-process retraining, so training never
+runs in (or mutates models of) the serving process
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from batch_inference import to_builtin
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Version recorded for the artifact written by export_model_artifacts.py
+INITIAL_VERSION = 'initial'
+
+
+def train_model_artifact(model_name: str, artifact_path: str) -> Dict[str, Any]:
+    """Retraining worker entry point: train a fresh model and save it as a new artifact"""
+    if MODELS_DIR not in sys.path:
+        sys.path.append(MODELS_DIR)
+    from export_model_artifacts import load_model_class
+
+    started = time.perf_counter()
+    model = load_model_class(model_name)()
+    result = model.train()
+    model.save_model(artifact_path)
+
+    return {
+        'training_result': to_builtin(result),
+        'training_time_s': round(time.perf_counter() - started, 2)
+    }
+
+
+class ModelVersionStore:
+    def __init__(self, model_dir: str):
+        self.model_dir = model_dir
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _version_dir(self, model_name: str) -> str:
+        return os.path.join(self.model_dir, 'versions', model_name)
+
+    def _manifest_path(self, model_name: str) -> str:
+        return os.path.join(self._version_dir(model_name), 'manifest.json')
+
+    def initial_artifact(self, model_name: str) -> str:
+        """Artifact written by export_model_artifacts.py"""
+        return os.path.join(self.model_dir, f"{model_name}.pkl")
+
+    def manifest(self, model_name: str) -> Dict[str, Any]:
+        """Known versions of a model (oldest first), the active one and the versions activated before it"""
+        try:
+            with open(self._manifest_path(model_name)) as f:
+                manifest = json.load(f)
+            # Manifests written before activations were recorded
+            manifest.setdefault('history', [manifest['active']] if manifest['active'] else [])
+            return manifest
+        except (OSError, ValueError):
+            manifest = {'active': None, 'versions': [], 'history': []}
+            if os.path.exists(self.initial_artifact(model_name)):
+                manifest['active'] = INITIAL_VERSION
+                manifest['history'].append(INITIAL_VERSION)
+                manifest['versions'].append({
+                    'version': INITIAL_VERSION,
+                    'artifact': self.initial_artifact(model_name),
+                    'trained_at': datetime.fromtimestamp(os.path.getmtime(self.initial_artifact(model_name))).isoformat()
+                })
+            return manifest
+
+    def _write_manifest(self, model_name: str, manifest: Dict[str, Any]):
+        os.makedirs(self._version_dir(model_name), exist_ok=True)
+        path = self._manifest_path(model_name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2, default=str)
+        os.replace(path + '.tmp', path)
+
+    def get_version(self, model_name: str, version: str) -> Optional[Dict[str, Any]]:
+        for entry in self.manifest(model_name)['versions']:
+            if entry['version'] == version:
+                return entry
+        return None
+
+    def active_version(self, model_name: str) -> Optional[Dict[str, Any]]:
+        """Version to serve, or None when the model has no artifact yet"""
+        manifest = self.manifest(model_name)
+        return self.get_version(model_name, manifest['active']) if manifest['active'] else None
+
+    def previous_version(self, model_name: str) -> Optional[Dict[str, Any]]:
+        """Version that was active before the active one, used for rollback"""
+        history = self.manifest(model_name)['history']
+        return self.get_version(model_name, history[-2]) if len(history) > 1 else None
+
+    def version_artifact(self, model_name: str, version: str) -> str:
+        """Where the artifact of a new version is written"""
+        return os.path.join(self._version_dir(model_name), f"{version}.pkl")
+
+    def add_version(self, model_name: str, entry: Dict[str, Any]):
+        """Record a version produced outside retraining (a compacted variant, ...), replacing one of the same name; not activated"""
+        manifest = self.manifest(model_name)
+        manifest['versions'] = [v for v in manifest['versions'] if v['version'] != entry['version']] + [entry]
+        self._write_manifest(model_name, manifest)
+
+    def set_active(self, model_name: str, version: str):
+        """Activate a version, recording the activation so a rollback returns to the one it replaces"""
+        manifest = self.manifest(model_name)
+        manifest['active'] = version
+        if manifest['history'][-1:] != [version]:
+            manifest['history'].append(version)
+        self._write_manifest(model_name, manifest)
+
+    def rollback(self, model_name: str) -> Optional[Dict[str, Any]]:
+        """Undo the latest activation and return the version active again, None without one to return to"""
+        previous = self.previous_version(model_name)
+        if previous is None:
+            return None
+        manifest = self.manifest(model_name)
+        manifest['history'].pop()
+        manifest['active'] = manifest['history'][-1]
+        self._write_manifest(model_name, manifest)
+        return previous
+
+    async def train_version(self, model_name: str) -> Dict[str, Any]:
+        """
+        Train a new version in a separate process and record it (not yet active)
+
+        The retraining process is spawned fresh, so it shares neither the GIL
+        nor the loaded models with the serving process.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+
+        version = datetime.now().strftime('v%Y%m%d-%H%M%S')
+        artifact = self.version_artifact(model_name, version)
+        os.makedirs(self._version_dir(model_name), exist_ok=True)
+
+        loop = asyncio.get_running_loop()
+        outcome = await loop.run_in_executor(self._pool, train_model_artifact, model_name, artifact)
+
+        entry = {
+            'version': version,
+            'artifact': artifact,
+            'trained_at': datetime.now().isoformat(),
+            **outcome
+        }
+        manifest = self.manifest(model_name)
+        manifest['versions'].append(entry)
+        self._write_manifest(model_name, manifest)
+        return entry
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,115 @@
+"""
+CTAS Prediction Cache
+In-process LRU + TTL cache of model predictions, keyed on the feature vector
+quantized to a configurable number of decimals per feature
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from inference_executor import parse_model_settings
+
+
+class PredictionCache:
+    def __init__(self, max_entries: Optional[int] = None, ttl_s: Optional[float] = None,
+                 precision: Optional[int] = None, feature_precision: Optional[Dict[str, int]] = None):
+        self.max_entries = int(max_entries if max_entries is not None else os.getenv('CTAS_CACHE_MAX_ENTRIES', '4096'))
+        self.ttl_s = float(ttl_s if ttl_s is not None else os.getenv('CTAS_CACHE_TTL_S', '300'))
+        self.precision = int(precision if precision is not None else os.getenv('CTAS_CACHE_PRECISION', '3'))
+        self.feature_precision = feature_precision if feature_precision is not None else parse_model_settings(
+            os.getenv('CTAS_CACHE_FEATURE_PRECISION', '')
+        )
+
+        # Retraining invalidates from a worker thread while requests read on the event loop
+        self._lock = threading.Lock()
+        self._entries: Dict[str, OrderedDict] = {}
+        self._generations: Dict[str, int] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_s > 0
+
+    def _model_stats(self, model_name: str) -> Dict[str, int]:
+        if model_name not in self.stats:
+            self.stats[model_name] = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+        return self.stats[model_name]
+
+    def key(self, feature_names: List[str], features: Dict[str, Any]) -> Optional[Tuple]:
+        """Quantized feature vector in feature_names order, or None when the row can't be keyed"""
+        try:
+            return tuple(
+                round(float(features.get(name, 0)), self.feature_precision.get(name, self.precision))
+                for name in feature_names
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def generation(self, model_name: str) -> int:
+        """Bumped on every invalidation so results computed by a replaced model are not stored"""
+        return self._generations.get(model_name, 0)
+
+    def get(self, model_name: str, key: Tuple) -> Optional[Any]:
+        """Cached prediction for a key, counting the lookup as a hit or a miss"""
+        with self._lock:
+            stats = self._model_stats(model_name)
+            entries = self._entries.get(model_name)
+            entry = entries.get(key) if entries is not None else None
+
+            if entry is not None and entry[0] < time.monotonic():
+                del entries[key]
+                stats['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                stats['misses'] += 1
+                return None
+
+            entries.move_to_end(key)
+            stats['hits'] += 1
+            return entry[1]
+
+    def put(self, model_name: str, key: Tuple, value: Any, generation: Optional[int] = None):
+        """Store a prediction unless the model was invalidated since the lookup"""
+        with self._lock:
+            if generation is not None and generation != self.generation(model_name):
+                return
+
+            entries = self._entries.setdefault(model_name, OrderedDict())
+            entries[key] = (time.monotonic() + self.ttl_s, value)
+            entries.move_to_end(key)
+
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self._model_stats(model_name)['evictions'] += 1
+
+    def invalidate(self, model_name: str):
+        """Drop every cached prediction of a model (after retraining or reloading it)"""
+        with self._lock:
+            self._entries.pop(model_name, None)
+            self._generations[model_name] = self.generation(model_name) + 1
+            self._model_stats(model_name)['invalidations'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Hit/miss counters and sizes per model"""
+        with self._lock:
+            per_model = {}
+            for model_name, stats in self.stats.items():
+                lookups = stats['hits'] + stats['misses']
+                per_model[model_name] = {
+                    **stats,
+                    'entries': len(self._entries.get(model_name, ())),
+                    'hit_rate': stats['hits'] / lookups if lookups else 0.0
+                }
+
+        return {
+            'enabled': self.enabled,
+            'max_entries': self.max_entries,
+            'ttl_s': self.ttl_s,
+            'precision': self.precision,
+            'feature_precision': self.feature_precision,
+            'per_model': per_model
+        }
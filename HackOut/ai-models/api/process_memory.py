@@ -0,0 +1,84 @@
+"""
+CTAS Process Memory
+Resident, proportional and shared memory of serving processes read from /proc,
+to check that prefork workers keep sharing the parent's model pages
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+# smaps_rollup fields (kB) -> report keys
+SMAPS_FIELDS = {
+    'Rss': 'rss_bytes',
+    'Pss': 'pss_bytes',
+    'Shared_Clean': 'shared_clean_bytes',
+    'Shared_Dirty': 'shared_dirty_bytes',
+    'Private_Clean': 'private_clean_bytes',
+    'Private_Dirty': 'private_dirty_bytes'
+}
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Memory of one process in bytes
+
+    shared_bytes counts pages also mapped by another process (for a forked
+    worker: model pages still shared with the launcher); pss_bytes splits
+    shared pages between the processes mapping them, so PSS summed over all
+    workers is their real footprint. Without smaps_rollup only RSS and
+    file-backed shared pages (statm) are available.
+    """
+    pid = pid or os.getpid()
+    report: Dict[str, Any] = {'pid': pid}
+
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                field, _, value = line.partition(':')
+                if field in SMAPS_FIELDS:
+                    report[SMAPS_FIELDS[field]] = int(value.split()[0]) * 1024
+        report['shared_bytes'] = report.get('shared_clean_bytes', 0) + report.get('shared_dirty_bytes', 0)
+        report['private_bytes'] = report.get('private_clean_bytes', 0) + report.get('private_dirty_bytes', 0)
+        return report
+    except OSError:
+        pass
+
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            _, resident, shared = (int(value) for value in f.read().split()[:3])
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        report.update({'rss_bytes': resident * page_size, 'shared_bytes': shared * page_size,
+                       'pss_bytes': None, 'private_bytes': (resident - shared) * page_size})
+    except (OSError, ValueError):
+        report.update({'rss_bytes': None, 'shared_bytes': None, 'pss_bytes': None, 'private_bytes': None})
+    return report
+
+
+def child_pids(parent_pid: int) -> List[int]:
+    """Direct children of a process (the prefork workers of a launcher)"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields after it are space-separated
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent_pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def workers_memory(launcher_pid: int) -> Dict[str, Any]:
+    """Memory of a launcher and each of its workers, with totals over the workers"""
+    workers = [process_memory(pid) for pid in child_pids(launcher_pid)]
+    return {
+        'launcher': process_memory(launcher_pid),
+        'workers': workers,
+        'totals': {
+            key: sum(worker.get(key) or 0 for worker in workers)
+            for key in ('rss_bytes', 'pss_bytes', 'shared_bytes', 'private_bytes')
+        }
+    }
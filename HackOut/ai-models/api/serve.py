@@ -0,0 +1,167 @@
+"""
+CTAS Production Launcher
+Loads and warms every model once in a parent process, then forks uvicorn
+workers that share the parent's model memory copy-on-write
+
+    python serve.py --workers 8 --port 8000
+
+Forest arrays are only ever read after the fork, and the loaded objects are
+moved out of the garbage collector's reach (gc.freeze), so their pages stay
+shared: N workers cost one copy of the models plus per-worker request state.
+SIGHUP reloads the active model versions in the parent and replaces the
+workers one at a time; SIGTERM/SIGINT stop all workers.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import time
+from typing import Dict
+
+import uvicorn
+
+from process_memory import process_memory
+
+logger = logging.getLogger(__name__)
+
+
+def _mb(value) -> str:
+    return f"{value / 1e6:.0f} MB" if value is not None else "n/a"
+
+
+class PreforkLauncher:
+    def __init__(self, config: uvicorn.Config, workers: int, memory_report_interval_s: float = 60.0):
+        self.config = config
+        self.workers = workers
+        self.memory_report_interval_s = memory_report_interval_s
+
+        self._socket = None
+        self._children: Dict[int, int] = {}  # pid -> worker id
+        self._stopping = False
+        self._reload_requested = False
+
+    def preload(self):
+        """Load and warm the models, then freeze them so the collector never writes to their pages"""
+        import main
+
+        started = time.perf_counter()
+        main.preload_models()
+        gc.collect()
+        gc.freeze()
+
+        ready = sum(1 for status in main.model_status.values() if status.get('status') == 'ready')
+        memory = process_memory()
+        logger.info(f"Preloaded {ready} models in {time.perf_counter() - started:.1f} s "
+                    f"(launcher RSS {_mb(memory.get('rss_bytes'))})")
+
+    def spawn(self, worker_id: int) -> int:
+        """Fork one worker serving on the shared listening socket"""
+        pid = os.fork()
+        if pid:
+            self._children[pid] = worker_id
+            return pid
+
+        # Worker: restore default signal handling (uvicorn installs its own) and serve until stopped
+        exit_code = 0
+        try:
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_DFL)
+            os.environ['CTAS_WORKER_ID'] = str(worker_id)
+            os.environ['CTAS_LAUNCHER_PID'] = str(os.getppid())
+            uvicorn.Server(self.config).run(sockets=[self._socket])
+        except BaseException:
+            logger.exception(f"Worker {worker_id} failed")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def log_memory_report(self):
+        """Resident, proportional and shared memory of every worker"""
+        total_pss = 0
+        for pid, worker_id in sorted(self._children.items(), key=lambda item: item[1]):
+            memory = process_memory(pid)
+            total_pss += memory.get('pss_bytes') or 0
+            logger.info(f"worker {worker_id} (pid {pid}): RSS {_mb(memory.get('rss_bytes'))}, "
+                        f"shared {_mb(memory.get('shared_bytes'))}, private {_mb(memory.get('private_bytes'))}, "
+                        f"PSS {_mb(memory.get('pss_bytes'))}")
+        logger.info(f"{len(self._children)} workers: total PSS {_mb(total_pss)}")
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _reload(self):
+        """Reload models in the parent, then replace each worker with one forked from the new state"""
+        self._reload_requested = False
+        gc.unfreeze()
+        self.preload()
+        for pid, worker_id in list(self._children.items()):
+            self.spawn(worker_id)
+            self._stop_worker(pid)
+
+    def _stop_worker(self, pid: int):
+        self._children.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    def run(self):
+        self.preload()
+        self._socket = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+        logger.info(f"Serving on {self.config.host}:{self.config.port} with {self.workers} workers")
+
+        next_report = time.monotonic() + min(self.memory_report_interval_s or 10.0, 10.0)
+        while not self._stopping:
+            if self._reload_requested:
+                self._reload()
+
+            # Replace workers that exited on their own
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self._children and not self._stopping:
+                worker_id = self._children.pop(pid)
+                logger.warning(f"Worker {worker_id} (pid {pid}) exited with status {status}; restarting it")
+                self.spawn(worker_id)
+
+            if self.memory_report_interval_s and time.monotonic() >= next_report:
+                self.log_memory_report()
+                next_report = time.monotonic() + self.memory_report_interval_s
+
+            time.sleep(0.5)
+
+        logger.info("Stopping workers")
+        for pid in list(self._children):
+            self._stop_worker(pid)
+        self._socket.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the CTAS API with preloaded models shared across forked workers")
+    parser.add_argument('--host', default=os.getenv('CTAS_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('CTAS_PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('CTAS_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--memory-report-interval', type=float,
+                        default=float(os.getenv('CTAS_MEMORY_REPORT_INTERVAL_S', '60')),
+                        help="Seconds between per-worker memory reports in the log (0 disables)")
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from main import app
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level)
+    PreforkLauncher(config, args.workers, args.memory_report_interval).run()
@@ -0,0 +1,77 @@
+"""
+CTAS Request Coalescing
+Single-flight de-duplication: concurrent identical requests share one
+in-flight computation and all receive its result
+"""
+
+import asyncio
+import json
+import math
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Requests with deadlines share a computation only with deadlines in the same window of this width
+DEADLINE_WINDOW_MS = float(os.getenv('CTAS_COALESCE_DEADLINE_WINDOW_MS', '25'))
+
+
+def deadline_window(deadline: Optional[float], width_ms: float = DEADLINE_WINDOW_MS) -> Optional[Tuple[float, float]]:
+    """Start and end of the fixed window holding a deadline (part of the request key), None without one"""
+    if deadline is None:
+        return None
+    width_s = width_ms / 1000
+    start = math.floor(deadline / width_s) * width_s
+    return start, start + width_s
+
+
+def request_key(*parts: Any) -> str:
+    """Canonical key for a request payload (dict order and numpy/datetime values don't matter)"""
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+class SingleFlight:
+    def __init__(self, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv('CTAS_COALESCE_REQUESTS', 'true').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {'leaders': 0, 'coalesced': 0}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]]):
+        """
+        Await compute() once per key among concurrent callers
+
+        The computation runs as its own task, so a caller that stops waiting
+        (e.g. on a deadline) does not cancel it for the others, and context
+        variables it sets (such as the deadline it runs under) stay its own.
+        """
+        if not self.enabled:
+            return await asyncio.ensure_future(compute())
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.stats['leaders'] += 1
+        else:
+            self.stats['coalesced'] += 1
+
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every caller has given up
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Coalescing counters and the number of computations in flight"""
+        total = self.stats['leaders'] + self.stats['coalesced']
+        return {
+            'enabled': self.enabled,
+            'inflight': len(self._inflight),
+            **self.stats,
+            'coalesced_rate': self.stats['coalesced'] / total if total else 0.0
+        }
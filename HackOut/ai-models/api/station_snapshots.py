@@ -0,0 +1,217 @@
+"""
+CTAS Station Snapshots
+Refreshes the ensemble assessment of every monitored station on a fixed
+cadence in the background, so "current risk at station X" is a table lookup
+instead of a fresh ensemble run per poll
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from inference_executor import PRIORITIES, request_priority
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds between refreshes of the whole table (0 disables the scheduler)
+REFRESH_S = float(os.getenv('CTAS_STATION_REFRESH_S', '300'))
+
+# Seconds stations with new readings wait for their reassessment; readings within one wait share it
+READING_REFRESH_S = float(os.getenv('CTAS_STATION_READING_REFRESH_S', '10'))
+
+# Snapshots older than this are flagged stale (default: three refresh intervals)
+STALE_AFTER_S = float(os.getenv('CTAS_STATION_STALE_S', str(REFRESH_S * 3)))
+
+# Comma-separated station ids to monitor (empty = every known station)
+STATION_IDS = [s.strip() for s in os.getenv('CTAS_STATIONS', '').split(',') if s.strip()]
+
+
+def load_stations() -> Dict[str, Dict[str, Any]]:
+    """
+    Stations known to the NOAA current parser and the coastal flood dataset,
+    keyed by NOAA station id (a source whose module cannot be imported is
+    skipped)
+    """
+    if MODELS_DIR not in sys.path:
+        sys.path.append(MODELS_DIR)
+
+    stations = {}
+    try:
+        from noaa_current_parser import NOAACurrentDataParser
+        for station_id, station in NOAACurrentDataParser().current_stations.items():
+            stations[station_id] = {
+                'name': station['name'], 'latitude': station['lat'], 'longitude': station['lon'],
+                'source': 'noaa_currents'
+            }
+    except ImportError as e:
+        logger.warning(f"NOAA current stations unavailable: {e}")
+
+    try:
+        from coastal_flood_dataset import CoastalFloodDataset
+        for name, station in CoastalFloodDataset().stations.items():
+            stations[station['id']] = {
+                'name': name.replace('_', ' '), 'latitude': station['lat'], 'longitude': station['lon'],
+                'coastal_elevation': station['elevation'], 'source': 'coastal_flood'
+            }
+    except ImportError as e:
+        logger.warning(f"Coastal flood stations unavailable: {e}")
+
+    return stations
+
+
+class StationSnapshots:
+    """
+    One assessment per station, replaced whole by each refresh. Every serving
+    process keeps (and refreshes) its own table.
+    """
+
+    def __init__(self, refresh_s: float = REFRESH_S, stale_after_s: float = STALE_AFTER_S,
+                 station_ids: Optional[List[str]] = None, reading_refresh_s: float = READING_REFRESH_S):
+        self.refresh_s = refresh_s
+        self.reading_refresh_s = reading_refresh_s
+        self.stale_after_s = stale_after_s
+        self.station_ids = station_ids if station_ids is not None else STATION_IDS
+
+        self.stations: Dict[str, Dict[str, Any]] = {}
+        self.readings: Dict[str, Dict[str, Any]] = {}
+        self._table: Dict[str, Dict[str, Any]] = {}
+        self._assess: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+        self._ready: Optional[Callable[[], bool]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = set()
+        self._wake = asyncio.Event()
+        self.stats = {'refreshes': 0, 'assessments': 0, 'readings': 0, 'errors': 0, 'last_refresh_ms': None}
+
+    def start(self, assess: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+              ready: Optional[Callable[[], bool]] = None):
+        """
+        Start refreshing once ready() is true; assess maps a station's ensemble
+        context to its assessment
+        """
+        if self.refresh_s <= 0:
+            return
+        self._assess = assess
+        self._ready = ready
+        self._wake = asyncio.Event()
+        self._task = asyncio.ensure_future(self._refresh_forever())
+
+    def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def context(self, station_id: str) -> Dict[str, Any]:
+        """Ensemble context of a station: its location and elevation overlaid with its latest readings"""
+        station = self.stations[station_id]
+        context = {'latitude': station['latitude'], 'longitude': station['longitude']}
+        if 'coastal_elevation' in station:
+            context['coastal_elevation'] = station['coastal_elevation']
+        context.update(self.readings.get(station_id, {}))
+        return context
+
+    def record_reading(self, station_id: str, environmental_data: Dict[str, Any]):
+        """
+        Merge new sensor values (keyed by ensemble context field) into a
+        station's readings and mark the station for reassessment within
+        reading_refresh_s, ahead of the next full refresh
+        """
+        if station_id not in self.stations:
+            raise KeyError(station_id)
+        self.readings.setdefault(station_id, {}).update(environmental_data)
+        self.stats['readings'] += 1
+        self._dirty.add(station_id)
+        self._wake.set()
+
+    async def _refresh_forever(self):
+        # Station sources construct pandas-backed helpers; keep that off the event loop
+        stations = await asyncio.to_thread(load_stations)
+        unknown = [s for s in self.station_ids if s not in stations]
+        if unknown:
+            logger.warning(f"Ignoring unknown stations in CTAS_STATIONS: {', '.join(unknown)}")
+        self.stations = {s: stations[s] for s in (self.station_ids or stations) if s in stations}
+        logger.info(f"Refreshing assessments for {len(self.stations)} stations every {self.refresh_s:.0f}s")
+
+        # Models load in the background at startup; assessing before then would only record defaults
+        while self._ready is not None and not self._ready():
+            await asyncio.sleep(1)
+
+        # Background work yields to interactive requests in the executor
+        request_priority.set(PRIORITIES[-1])
+        next_refresh = 0.0
+        while True:
+            self._wake.clear()
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + self.refresh_s
+                await self.refresh()
+            elif self._dirty:
+                await self.refresh(list(self._dirty))
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, next_refresh - time.monotonic()))
+                # A reading arrived: let the station's further readings accumulate so they share one reassessment
+                await asyncio.sleep(min(self.reading_refresh_s, max(0.0, next_refresh - time.monotonic())))
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self, station_ids: Optional[List[str]] = None):
+        """Reassess every (or the given) station"""
+        started = time.perf_counter()
+        station_ids = list(self.stations) if station_ids is None else station_ids
+        self._dirty.difference_update(station_ids)
+        for station_id in station_ids:
+            try:
+                assessment = await self._assess(self.context(station_id))
+            except Exception as e:
+                # Keep serving the last good assessment; its age shows how old it is
+                self.stats['errors'] += 1
+                logger.warning(f"Assessment of station {station_id} failed: {e}")
+                if station_id in self._table:
+                    self._table[station_id]['error'] = str(e)
+                continue
+            self._table[station_id] = {
+                'station_id': station_id,
+                'station': self.stations[station_id],
+                'assessment': assessment,
+                'computed_at': datetime.now(),
+                'computed_at_s': time.time(),
+                'error': None
+            }
+            self.stats['assessments'] += 1
+        if len(station_ids) < len(self.stations):
+            return
+        self.stats['refreshes'] += 1
+        self.stats['last_refresh_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    def get(self, station_id: str) -> Optional[Dict[str, Any]]:
+        """A station's latest snapshot with its age and staleness, None before its first assessment"""
+        entry = self._table.get(station_id)
+        if entry is None:
+            return None
+        age_s = time.time() - entry['computed_at_s']
+        return {
+            'station_id': entry['station_id'],
+            'station': entry['station'],
+            'assessment': entry['assessment'],
+            'computed_at': entry['computed_at'],
+            'age_s': round(age_s, 3),
+            'stale': age_s > self.stale_after_s or entry['error'] is not None,
+            'error': entry['error']
+        }
+
+    def all(self) -> List[Dict[str, Any]]:
+        return [self.get(station_id) for station_id in self._table]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'stations': len(self.stations),
+            'assessed': len(self._table),
+            'refresh_s': self.refresh_s,
+            'reading_refresh_s': self.reading_refresh_s,
+            'stale_after_s': self.stale_after_s,
+            **self.stats
+        }
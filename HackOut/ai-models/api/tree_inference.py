@@ -0,0 +1,672 @@
+"""
+CTAS Tree Inference
+Compiles fitted scikit-learn forests, gradient-boosted ensembles and isolation
+forests into flat, contiguous node arrays evaluated with vectorized NumPy,
+skipping sklearn's per-call validation and joblib dispatch. Outputs match
+sklearn bit for bit: inputs are compared as float32 like sklearn's trees, and
+tree outputs are summed in sklearn's order.
+
+A model's StandardScaler can also be folded into the split thresholds: each
+threshold becomes the exact cut-off on the raw feature, so the scaled matrix
+is never built.
+"""
+
+import copy
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# sklearn takes about a second to import: it is imported where estimators are compiled (by then a loaded model
+# has imported it anyway), so importing this module stays cheap for the service
+if TYPE_CHECKING:
+    from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+# Compile the serving models' tree ensembles at load time (0 keeps sklearn)
+NATIVE_TREES = os.getenv('CTAS_NATIVE_TREES', '1') != '0'
+
+# Batches above this many rows go to sklearn, whose compiled traversal wins on large inputs (0 = never)
+NATIVE_TREES_MAX_ROWS = int(os.getenv('CTAS_NATIVE_TREES_MAX_ROWS', '256'))
+
+# Fold each model's StandardScaler into its compiled trees' thresholds (0 keeps scaling every request)
+FOLD_SCALER = os.getenv('CTAS_FOLD_SCALER', '1') != '0'
+
+
+def supported_estimators() -> Tuple[type, ...]:
+    """Estimator classes CompiledEnsemble compiles"""
+    from sklearn.ensemble import (
+        GradientBoostingClassifier, GradientBoostingRegressor, IsolationForest, RandomForestClassifier,
+        RandomForestRegressor
+    )
+    return (RandomForestClassifier, RandomForestRegressor, GradientBoostingRegressor, GradientBoostingClassifier,
+            IsolationForest)
+
+
+def estimator_kind(estimator) -> str:
+    """Which of the supported_estimators() an estimator is, as CompiledEnsemble dispatches on it"""
+    kinds = ('random_forest_classifier', 'random_forest_regressor', 'gradient_boosting_regressor',
+             'gradient_boosting_classifier', 'isolation_forest')
+    for cls, kind in zip(supported_estimators(), kinds):
+        if isinstance(estimator, cls):
+            return kind
+    raise TypeError(f"Cannot compile {type(estimator).__name__}")
+
+
+# Methods compared against sklearn when checking a compiled estimator
+CHECKED_METHODS = ('predict', 'predict_proba', 'decision_function', 'score_samples')
+
+_SIGN = np.int64(-2 ** 63)
+_MAX_KEY = np.float64(np.finfo(np.float64).max).view(np.int64)
+
+
+def _from_keys(keys: np.ndarray) -> np.ndarray:
+    """float64 values of int64 keys ordered like the floats (adjacent floats have adjacent keys)"""
+    return np.where(keys < 0, (-keys) | _SIGN, keys).view(np.float64)
+
+
+def fold_thresholds(threshold: np.ndarray, feature: np.ndarray, scaler: 'StandardScaler') -> np.ndarray:
+    """
+    Raw-feature cut-offs equivalent to StandardScaler + tree thresholds
+
+    A row goes left when float32((x - mean) / scale) <= threshold. That
+    expression is monotone in x, so the largest float64 x still going left is
+    found by bisection over the ordered float64 values; x <= cut-off then
+    decides exactly like the scaled comparison (-inf/+inf when every finite
+    value goes right/left).
+    """
+    mean = scaler.mean_[feature] if scaler.with_mean else None
+    scale = scaler.scale_[feature] if scaler.with_std else None
+
+    def goes_left(keys, nodes):
+        z = _from_keys(keys)
+        if mean is not None:
+            z = z - mean[nodes]
+        if scale is not None:
+            z = z / scale[nodes]
+        return z.astype(np.float32).astype(np.float64) <= threshold[nodes]
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        nodes = np.arange(len(threshold))
+        lowest = goes_left(np.full(len(nodes), -_MAX_KEY), nodes)
+        highest = goes_left(np.full(len(nodes), _MAX_KEY), nodes)
+        cutoffs = np.where(highest, np.inf, -np.inf)
+
+        # Invariant: lo goes left, hi goes right
+        nodes = np.nonzero(lowest & ~highest)[0]
+        lo = np.full(len(nodes), -_MAX_KEY)
+        hi = np.full(len(nodes), _MAX_KEY)
+        while len(nodes) and (hi > lo + 1).any():
+            mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+            left = goes_left(mid, nodes)
+            lo = np.where(left, mid, lo)
+            hi = np.where(left, hi, mid)
+        cutoffs[nodes] = _from_keys(lo)
+    return cutoffs
+
+
+class FlatTrees:
+    """
+    Every node of a list of sklearn trees in shared arrays; children index
+    into the same arrays and leaves point at themselves, so all trees are
+    walked together one level per step
+    """
+
+    def __init__(self, trees: List[Any], values: List[np.ndarray], features: Optional[List[np.ndarray]] = None,
+                 scaler: Optional['StandardScaler'] = None, dtype=np.float64):
+        sizes = [tree.node_count for tree in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        self.roots = offsets
+        self.max_depth = max(tree.max_depth for tree in trees)
+
+        n_nodes = int(sum(sizes))
+        self.feature = np.empty(n_nodes, dtype=np.intp)
+        self.threshold = np.empty(n_nodes, dtype=np.float64)
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        self.children = np.empty(2 * n_nodes, dtype=np.intp)
+        is_split = np.empty(n_nodes, dtype=bool)
+        for i, (tree, offset, size) in enumerate(zip(trees, offsets, sizes)):
+            nodes = slice(offset, offset + size)
+            is_leaf = tree.children_left == -1
+            own = np.arange(offset, offset + size, dtype=np.intp)
+            # Trees fitted on a feature subset (isolation forests) index into it
+            tree_features = tree.feature if features is None else features[i][np.where(is_leaf, 0, tree.feature)]
+            self.feature[nodes] = np.where(is_leaf, 0, tree_features)
+            self.threshold[nodes] = np.where(is_leaf, 0.0, tree.threshold)
+            self.children[2 * offset:2 * (offset + size):2] = np.where(is_leaf, own, tree.children_left + offset)
+            self.children[2 * offset + 1:2 * (offset + size):2] = np.where(is_leaf, own, tree.children_right + offset)
+            is_split[nodes] = ~is_leaf
+        self.values = np.ascontiguousarray(np.concatenate(values))
+
+        if scaler is not None:
+            self.threshold[is_split] = fold_thresholds(self.threshold[is_split], self.feature[is_split], scaler)
+
+        if np.dtype(dtype) == np.float32:
+            self._store_float32(scaler is not None)
+
+    def _store_float32(self, folded: bool):
+        """
+        float32 thresholds and leaf values. Inputs are compared as float32, so
+        rounding each threshold down to a float32 keeps every split decision;
+        only leaf values lose precision. Indices stay intp: numpy would cast
+        narrower index arrays on every gather, slowing traversal.
+        """
+        if folded:
+            raise ValueError("float32 node storage needs unfolded thresholds (raw features are compared as float64)")
+        threshold = self.threshold.astype(np.float32)
+        above = threshold.astype(np.float64) > self.threshold
+        threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+        self.threshold = threshold
+        self.values = self.values.astype(np.float32)
+
+    def __setstate__(self, state):
+        # joblib's mmap_mode loads arrays as np.memmap, whose per-operation subclass
+        # overhead adds up over a traversal; plain views keep the shared pages
+        self.__dict__.update({key: value.view(np.ndarray) if isinstance(value, np.memmap) else value
+                              for key, value in state.items()})
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.roots, self.feature, self.threshold, self.children, self.values))
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node of every (tree, row): shape (n_trees, n_rows)"""
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[None, :]
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_right = flat_X[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Leaf value of every (tree, row): shape (n_trees, n_rows, n_outputs)"""
+        return self.values[self.leaves(X)]
+
+
+def ordered_sum(terms: np.ndarray) -> np.ndarray:
+    """
+    terms[0] + terms[1] + ... strictly left to right in float64, as sklearn's
+    accumulation loops add them (np.sum may switch to pairwise summation,
+    which rounds differently)
+    """
+    return np.add.accumulate(terms, axis=0, dtype=np.float64)[-1]
+
+
+def as_tree_input(X: Any, n_features: int, dtype=np.float32) -> np.ndarray:
+    """
+    The matrix compared against the thresholds: float32 like sklearn's trees,
+    or float64 raw features for folded thresholds; non-finite values are
+    rejected as sklearn does
+    """
+    X = np.ascontiguousarray(X, dtype=dtype)
+    if X.ndim != 2 or X.shape[1] != n_features:
+        raise ValueError(f"X has {X.shape[-1] if X.ndim else 0} features, but the model expects {n_features} features")
+    if not np.isfinite(X).all():
+        raise ValueError(f"Input X contains NaN, infinity or a value too large for dtype('{np.dtype(dtype).name}').")
+    return X
+
+
+class CompiledEnsemble:
+    """
+    A drop-in for a fitted tree ensemble: prediction methods run on flat node
+    arrays, everything else (and batches above max_rows) is answered by the
+    original estimator. With a scaler, thresholds are folded and the methods
+    take raw, unscaled features.
+    """
+
+    def __init__(self, estimator, max_rows: int = NATIVE_TREES_MAX_ROWS, scaler: Optional['StandardScaler'] = None,
+                 dtype=np.float64):
+        self.kind = estimator_kind(estimator)
+        self.estimator = estimator
+        self.scaler = scaler
+        self.max_rows = max_rows
+        self.n_features = estimator.n_features_in_
+        self.boosted = self.kind.startswith('gradient_boosting')
+        features = None
+
+        if self.boosted:
+            stages = estimator.estimators_
+            trees = [tree.tree_ for tree in stages.ravel()]
+            # Each stage adds learning_rate * leaf value (the product sklearn computes per row)
+            values = [estimator.learning_rate * tree.value[:, 0, :] for tree in trees]
+            self.n_stages, self.n_outputs = stages.shape
+            self.init = estimator._raw_predict_init(np.zeros((1, self.n_features), dtype=np.float32))
+        elif self.kind == 'isolation_forest':
+            from sklearn.ensemble._iforest import _average_path_length
+
+            trees = [tree.tree_ for tree in estimator.estimators_]
+            # Per leaf: path length + average path length of its samples - 1, as sklearn adds them
+            values = [(path_lengths + average_lengths - 1.0)[:, None] for path_lengths, average_lengths
+                      in zip(estimator._decision_path_lengths, estimator._average_path_length_per_tree)]
+            features = estimator.estimators_features_
+            self.denominator = len(estimator.estimators_) * _average_path_length([estimator._max_samples])
+        else:
+            trees = [tree.tree_ for tree in estimator.estimators_]
+            if self.kind == 'random_forest_classifier':
+                values = [tree.value[:, 0, :estimator.n_classes_] for tree in trees]
+            else:
+                values = [tree.value[:, 0, :1] for tree in trees]
+        self.trees = FlatTrees(trees, values, features, scaler, dtype)
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes not set in __init__ (classes_, feature_importances_, ...)
+        if name in ('estimator', 'scaler', 'kind'):
+            raise AttributeError(name)
+        return getattr(self.estimator, name)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Artifacts exported before the kind was recorded
+        if 'kind' not in state:
+            self.kind = estimator_kind(self.estimator)
+
+    def fit(self, *args, **kwargs):
+        raise RuntimeError("Compiled ensembles are inference-only; fit the original estimator and compile it again")
+
+    def strip(self) -> 'CompiledEnsemble':
+        """
+        Drop the original estimator's trees, the bulk of its memory, keeping
+        the fitted attributes predictions need (classes_, offset_, ...); every
+        batch then runs natively
+        """
+        shell = copy.copy(self.estimator)
+        if self.boosted:
+            shell.estimators_ = np.empty((0, self.n_outputs), dtype=object)
+        else:
+            shell.estimators_ = []
+        if self.kind == 'isolation_forest':
+            shell.estimators_features_ = []
+            shell._decision_path_lengths = shell._average_path_length_per_tree = ()
+        self.estimator = shell
+        self.max_rows = 0
+        return self
+
+    def _native(self, X) -> bool:
+        return not self.max_rows or len(X) <= self.max_rows
+
+    def _sklearn(self, method: str, X):
+        return getattr(self.estimator, method)(X if self.scaler is None else self.scaler.transform(X))
+
+    def _input(self, X) -> np.ndarray:
+        return as_tree_input(X, self.n_features, np.float32 if self.scaler is None else np.float64)
+
+    def _forest_output(self, X: np.ndarray) -> np.ndarray:
+        total = ordered_sum(self.trees.leaf_values(X))
+        total /= len(self.trees.roots)
+        return total
+
+    def _raw_predict(self, X: np.ndarray) -> np.ndarray:
+        """init + stage 1 + stage 2 + ..., accumulated per output column in stage order"""
+        n_rows = len(X)
+        contributions = self.trees.leaf_values(X)[:, :, 0].reshape(self.n_stages, self.n_outputs, n_rows)
+        terms = np.empty((self.n_stages + 1, n_rows, self.n_outputs), dtype=np.float64)
+        terms[0] = self.init
+        terms[1:] = contributions.transpose(0, 2, 1)
+        return ordered_sum(terms)
+
+    def _decision(self, X: np.ndarray) -> np.ndarray:
+        raw = self._raw_predict(X)
+        return raw.ravel() if raw.shape[1] == 1 else raw
+
+    def _score_samples(self, X: np.ndarray) -> np.ndarray:
+        depths = ordered_sum(self.trees.leaf_values(X)[:, :, 0])
+        scores = 2 ** (
+            -np.divide(depths, self.denominator, out=np.ones_like(depths), where=self.denominator != 0)
+        )
+        return -scores
+
+    def predict_proba(self, X):
+        if not self._native(X):
+            return self._sklearn('predict_proba', X)
+        X = self._input(X)
+        if self.boosted:
+            return self.estimator._loss.predict_proba(self._decision(X))
+        return self._forest_output(X)
+
+    def decision_function(self, X):
+        if not self._native(X):
+            return self._sklearn('decision_function', X)
+        X = self._input(X)
+        if self.kind == 'isolation_forest':
+            return self._score_samples(X) - self.estimator.offset_
+        return self._decision(X)
+
+    def score_samples(self, X):
+        if not self._native(X):
+            return self._sklearn('score_samples', X)
+        return self._score_samples(self._input(X))
+
+    def predict(self, X):
+        if not self._native(X):
+            return self._sklearn('predict', X)
+        X = self._input(X)
+        if self.kind == 'random_forest_classifier':
+            return self.estimator.classes_.take(np.argmax(self._forest_output(X), axis=1), axis=0)
+        if self.kind == 'random_forest_regressor':
+            return self._forest_output(X).ravel()
+        if self.kind == 'gradient_boosting_regressor':
+            return self._raw_predict(X).ravel()
+        if self.kind == 'isolation_forest':
+            decision = self._score_samples(X) - self.estimator.offset_
+            is_inlier = np.ones_like(decision, dtype=int)
+            is_inlier[decision < 0] = -1
+            return is_inlier
+        raw = self._decision(X)
+        encoded = (raw >= 0).astype(int) if raw.ndim == 1 else np.argmax(raw, axis=1)
+        return self.estimator.classes_[encoded]
+
+
+class FoldedScaler:
+    """
+    Stands in for a StandardScaler folded into a model's compiled trees:
+    transform hands the raw features through, everything else is answered by
+    the original scaler
+    """
+
+    def __init__(self, scaler: 'StandardScaler'):
+        self.scaler = scaler
+
+    def __getattr__(self, name: str):
+        if name == 'scaler':
+            raise AttributeError(name)
+        return getattr(self.scaler, name)
+
+    def transform(self, X, copy=None):
+        return np.ascontiguousarray(X, dtype=np.float64)
+
+    def fit(self, *args, **kwargs):
+        raise RuntimeError("This scaler is folded into compiled trees; fit the original scaler instead")
+
+    fit_transform = partial_fit = fit
+
+
+def mismatches(compiled: CompiledEnsemble, X: np.ndarray) -> List[str]:
+    """
+    Methods whose native output differs in any bit from the original pipeline's
+    (the scaler, when folded, then sklearn) for the rows of X
+    """
+    failed = []
+    max_rows, compiled.max_rows = compiled.max_rows, 0
+    try:
+        for method in CHECKED_METHODS:
+            if not hasattr(compiled.estimator, method):
+                continue
+            expected = compiled._sklearn(method, X)
+            actual = getattr(compiled, method)(X)
+            if expected.shape != actual.shape or expected.dtype != actual.dtype or \
+                    expected.tobytes() != np.ascontiguousarray(actual).tobytes():
+                failed.append(method)
+    finally:
+        compiled.max_rows = max_rows
+    return failed
+
+
+def probe_rows(n_features: int, n_rows: int = 256, seed: int = 0,
+               scaler: Optional['StandardScaler'] = None) -> np.ndarray:
+    """Rows that are standard normal after the model's StandardScaler (raw features when a scaler is given)"""
+    X = np.random.default_rng(seed).standard_normal((n_rows, n_features))
+    if scaler is not None:
+        X = scaler.inverse_transform(X)
+    return X
+
+
+def boundary_rows(compiled: CompiledEnsemble, base: np.ndarray, n_rows: int = 256, seed: int = 0) -> np.ndarray:
+    """
+    Rows sitting exactly on (and one float above) randomly chosen split
+    thresholds, where a folded or float32 comparison would first go wrong
+    """
+    rng = np.random.default_rng(seed)
+    trees = compiled.trees
+    splits = np.nonzero(trees.children[0::2] != np.arange(len(trees.feature)))[0]
+    splits = splits[np.isfinite(trees.threshold[splits])]
+    if not len(splits):
+        return base[:0]
+
+    nodes = rng.choice(splits, size=n_rows // 2)
+    X = base[rng.integers(0, len(base), size=2 * len(nodes))].copy()
+    on = trees.threshold[nodes]
+    if compiled.scaler is None:
+        # Unfolded trees compare float32 inputs: the threshold's float32 neighbours
+        on = on.astype(np.float32).astype(np.float64)
+        above = np.nextafter(on.astype(np.float32), np.float32(np.inf)).astype(np.float64)
+    else:
+        above = np.nextafter(on, np.inf)
+    X[np.arange(len(nodes)), trees.feature[nodes]] = on
+    X[np.arange(len(nodes), 2 * len(nodes)), trees.feature[nodes]] = above
+    return X
+
+
+def check_compiled(compiled: CompiledEnsemble, X: Optional[np.ndarray] = None, seed: int = 0) -> List[str]:
+    """Bit-exactness check on probe rows (or X) plus rows on the split thresholds"""
+    if X is None:
+        X = probe_rows(compiled.n_features, seed=seed, scaler=compiled.scaler)
+    return mismatches(compiled, np.concatenate([X, boundary_rows(compiled, X, seed=seed)]))
+
+
+def compile_model(model, max_rows: int = NATIVE_TREES_MAX_ROWS, fold_scaler: bool = FOLD_SCALER,
+                  X: Optional[np.ndarray] = None) -> Dict[str, str]:
+    """
+    Swap every supported estimator attribute of a model object for its compiled
+    form, after checking on probe rows (or X, unscaled) that the outputs are
+    bit-identical. When every estimator is a supported tree ensemble, the
+    model's StandardScaler is folded into their thresholds and replaced with a
+    FoldedScaler; if folding fails the check, estimators are compiled
+    unfolded, and those that still fail keep running on sklearn. Returns the
+    outcome per attribute.
+    """
+    from sklearn.base import BaseEstimator
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    supported = supported_estimators()
+    estimators = {name: value for name, value in vars(model).items()
+                  if isinstance(value, supported) and hasattr(value, 'estimators_')}
+    scaler = getattr(model, 'scaler', None)
+    others = [value for value in vars(model).values() if isinstance(value, BaseEstimator)
+              and not isinstance(value, supported + (StandardScaler, LabelEncoder))]
+
+    if fold_scaler and estimators and type(scaler) is StandardScaler and not others:
+        try:
+            compiled = {name: CompiledEnsemble(estimator, max_rows, scaler) for name, estimator in estimators.items()}
+            failed = {name: check_compiled(c, X) for name, c in compiled.items()}
+        except Exception as e:
+            failed = {'scaler': [str(e)]}
+        if not any(failed.values()):
+            for name, c in compiled.items():
+                setattr(model, name, c)
+            model.scaler = FoldedScaler(scaler)
+            return {name: 'compiled, scaler folded' for name in compiled}
+        logger.warning(f"{type(model).__name__}: folding the scaler changed outputs ({failed}); compiling unfolded")
+
+    scaled = None if X is None or scaler is None or isinstance(scaler, FoldedScaler) else scaler.transform(X)
+    outcomes = {}
+    for name, estimator in estimators.items():
+        try:
+            compiled = CompiledEnsemble(estimator, max_rows)
+            failed = check_compiled(compiled, scaled)
+        except Exception as e:
+            outcomes[name] = f'error: {e}'
+            logger.warning(f"{type(model).__name__}.{name} could not be compiled: {e}")
+            continue
+        if failed:
+            outcomes[name] = f"mismatch: {', '.join(failed)}"
+            logger.warning(f"{type(model).__name__}.{name} differs from sklearn in {', '.join(failed)}; keeping sklearn")
+            continue
+        setattr(model, name, compiled)
+        outcomes[name] = 'compiled'
+    return outcomes
+
+
+def _best_ms(fn, X, min_time_s: float) -> float:
+    """Mean wall time of fn(X) in ms, repeated for at least min_time_s after one warm-up call"""
+    fn(X)
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        fn(X)
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time_s:
+            return elapsed / calls * 1000
+
+
+def benchmark(model, sizes: List[int], min_time_s: float = 0.2, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    sklearn vs native latency of every supported estimator of a model object
+    for each batch size, with the bit-exactness check at that size
+    """
+    results = []
+    for name, estimator in vars(model).items():
+        if not isinstance(estimator, supported_estimators()) or not hasattr(estimator, 'estimators_'):
+            continue
+        compiled = CompiledEnsemble(estimator, max_rows=0)
+        method = 'predict_proba' if hasattr(estimator, 'predict_proba') else 'predict'
+        for size in sizes:
+            X = probe_rows(compiled.n_features, size, seed)
+            sklearn_ms = _best_ms(getattr(estimator, method), X, min_time_s)
+            native_ms = _best_ms(getattr(compiled, method), X, min_time_s)
+            results.append({
+                'estimator': name,
+                'type': type(estimator).__name__,
+                'method': method,
+                'rows': size,
+                'sklearn_ms': round(sklearn_ms, 4),
+                'native_ms': round(native_ms, 4),
+                'speedup': round(sklearn_ms / native_ms, 2),
+                'bit_exact': not mismatches(compiled, X)
+            })
+    return results
+
+
+def _legacy_preprocess(feature_names: List[str], rows: List[Dict[str, Any]]) -> np.ndarray:
+    """Feature dicts -> matrix as preprocess_data built them before feature_assembly"""
+    return np.array([[row.get(feature, 0) for feature in feature_names] for row in rows])
+
+
+def benchmark_pipeline(model, sizes: List[int], min_time_s: float = 0.2, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Feature dicts -> preprocessing -> scaler -> every estimator, as a
+    predict_* method runs them: the original pipeline (list-built matrix,
+    sklearn) against the assembled, scaler-free compiled one, with the
+    preprocessing step also timed on its own (model must be loaded, not yet
+    compiled)
+    """
+    from feature_assembly import feature_assembler
+
+    estimators = [name for name, value in vars(model).items() if isinstance(value, supported_estimators())]
+    methods = {name: 'predict_proba' if hasattr(getattr(model, name), 'predict_proba') else 'predict'
+               for name in estimators}
+    feature_names = list(model.feature_names)
+    assembler = feature_assembler(feature_names)
+
+    def assemble(rows):
+        return assembler.row(rows[0]) if len(rows) == 1 else assembler.rows(rows)[0]
+
+    def run(pipeline, preprocess):
+        def call(rows):
+            X_scaled = pipeline.scaler.transform(preprocess(rows))
+            return [getattr(getattr(pipeline, name), method)(X_scaled) for name, method in methods.items()]
+        return call
+
+    def legacy(rows):
+        return _legacy_preprocess(feature_names, rows)
+
+    original = type(model).__new__(type(model))
+    original.__dict__.update(vars(model))
+    outcomes = compile_model(model, max_rows=0, fold_scaler=True)
+    results = []
+    for size in sizes:
+        X = probe_rows(original.scaler.n_features_in_, size, seed, original.scaler)
+        rows = [dict(zip(feature_names, row)) for row in X.tolist()]
+        expected, actual = run(original, legacy)(rows), run(model, assemble)(rows)
+        results.append({
+            'rows': size,
+            'preprocess_legacy_ms': round(_best_ms(legacy, rows, min_time_s), 4),
+            'preprocess_ms': round(_best_ms(assemble, rows, min_time_s), 4),
+            'original_ms': round(_best_ms(run(original, legacy), rows, min_time_s), 4),
+            'scaler_free_ms': round(_best_ms(run(model, assemble), rows, min_time_s), 4),
+            'equivalent': all(e.tobytes() == np.ascontiguousarray(a).tobytes() for e, a in zip(expected, actual)),
+            'estimators': outcomes
+        })
+    return results
+
+
+def export_scaler_free(model, artifact: str) -> Dict[str, str]:
+    """
+    Write a scaler-free inference artifact: the model's components with
+    compiled, folded estimators and a FoldedScaler, loadable by the model's own
+    load_model (the original estimators stay inside for large batches)
+    """
+    outcomes = compile_model(model, max_rows=NATIVE_TREES_MAX_ROWS, fold_scaler=True)
+    if not isinstance(getattr(model, 'scaler', None), FoldedScaler):
+        raise ValueError(f"Scaler could not be folded: {outcomes}")
+    model.save_model(artifact)
+    return outcomes
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    MODELS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.append(MODELS_DIR)
+    from export_model_artifacts import MODEL_SOURCES, load_model_class
+    # Exported artifacts must reference tree_inference's classes, not __main__'s copies
+    from tree_inference import export_scaler_free
+
+    parser = argparse.ArgumentParser(description="Compiled tree ensembles: benchmark against sklearn, or export scaler-free artifacts")
+    parser.add_argument('command', choices=['benchmark', 'export-scaler-free'])
+    parser.add_argument('--model-dir', default=os.getenv('CTAS_MODEL_DIR', os.path.join(MODELS_DIR, 'models')))
+    parser.add_argument('--output-dir', help="Where export-scaler-free writes <model_name>.pkl (default: <model-dir>/scaler_free)")
+    parser.add_argument('--models', default=','.join(MODEL_SOURCES), help="Comma-separated model names")
+    parser.add_argument('--sizes', default='1,10,100,1000,10000', help="Comma-separated batch sizes")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds each measurement is repeated for")
+    parser.add_argument('--output', help="Write the JSON report to this file (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sizes = [int(size) for size in args.sizes.split(',')]
+    output_dir = args.output_dir or os.path.join(args.model_dir, 'scaler_free')
+    report = {}
+    for model_name in args.models.split(','):
+        artifact = os.path.join(args.model_dir, f'{model_name}.pkl')
+        if not os.path.exists(artifact):
+            logger.warning(f"Skipping {model_name}: no artifact at {artifact}")
+            continue
+        model = load_model_class(model_name)()
+        model.load_model(artifact)
+
+        if args.command == 'export-scaler-free':
+            os.makedirs(output_dir, exist_ok=True)
+            target = os.path.join(output_dir, f'{model_name}.pkl')
+            try:
+                report[model_name] = {'artifact': target, 'estimators': export_scaler_free(model, target)}
+                logger.info(f"{model_name}: scaler-free artifact written to {target}")
+            except Exception as e:
+                report[model_name] = {'error': str(e)}
+                logger.warning(f"{model_name}: {e}")
+            continue
+
+        report[model_name] = {
+            'estimators': benchmark(model, sizes, args.min_time),
+            'pipeline': benchmark_pipeline(model, sizes, args.min_time)
+        }
+        for row in report[model_name]['estimators']:
+            logger.info(f"{model_name}.{row['estimator']} {row['rows']:>6} rows: sklearn {row['sklearn_ms']:.3f} ms, "
+                        f"native {row['native_ms']:.3f} ms ({row['speedup']}x){'' if row['bit_exact'] else ' MISMATCH'}")
+        for row in report[model_name]['pipeline']:
+            logger.info(f"{model_name} pipeline {row['rows']:>6} rows: original {row['original_ms']:.3f} ms "
+                        f"(preprocessing {row['preprocess_legacy_ms']:.3f} ms), scaler-free {row['scaler_free_ms']:.3f} ms "
+                        f"(preprocessing {row['preprocess_ms']:.3f} ms){'' if row['equivalent'] else ' MISMATCH'}")
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
@@ -1,12 +1,10 @@
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, IsolationForest
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 import logging
 from datetime import datetime, timedelta
+from feature_assembly import feature_assembler
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -100,6 +98,7 @@ class BlueCarbonHealthMonitor:
 
     def generate_synthetic_data(self, n_samples=3000):
         """Generate synthetic blue carbon ecosystem data"""
+        import pandas as pd
         np.random.seed(42)
         
         data = []
@@ -380,17 +379,13 @@ class BlueCarbonHealthMonitor:
         return max(0, carbon_storage)
 
     def preprocess_data(self, data):
-        """Preprocess input data for model"""
-        if isinstance(data, dict):
-            features = [data.get(feature, 0) for feature in self.feature_names]
-            return np.array(features).reshape(1, -1)
-        elif isinstance(data, pd.DataFrame):
-            return data[self.feature_names].values
-        else:
-            return data
+        """Preprocess input data for model (missing features are handled per CTAS_MISSING_FEATURES)"""
+        return feature_assembler(self.feature_names).assemble(data)
 
     def train(self, data=None):
         """Train the blue carbon health monitoring models"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_squared_error, r2_score
         if data is None:
             self.logger.info("Generating synthetic training data...")
             data = self.generate_synthetic_data()
@@ -443,8 +438,8 @@ class BlueCarbonHealthMonitor:
             'carbon_feature_importance': dict(zip(self.feature_names, self.carbon_regressor.feature_importances_))
         }
 
-    def assess_ecosystem_health(self, features):
-        """Assess blue carbon ecosystem health and carbon storage"""
+    def assess_ecosystem_health(self, features, profile='full'):
+        """Assess blue carbon ecosystem health and carbon storage ('minimal' profile: labels and scores only)"""
         if not self.is_trained:
             raise ValueError("Model must be trained before assessment")
         
@@ -462,6 +457,15 @@ class BlueCarbonHealthMonitor:
         # Determine health category
         health_category = self.determine_health_category(health_score)
         
+        if profile == 'minimal':
+            return {
+                'health_score': float(health_score),
+                'health_category': health_category,
+                'carbon_storage_tonnes_per_ha': float(carbon_storage),
+                'is_anomalous': is_anomalous,
+                'anomaly_score': float(anomaly_score)
+            }
+        
         # Assess threats and stressors
         threat_assessment = self.assess_threats(features)
         
@@ -750,9 +754,9 @@ class BlueCarbonHealthMonitor:
         joblib.dump(model_data, filepath)
         self.logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath):
+    def load_model(self, filepath, mmap_mode=None):
         """Load trained model"""
-        model_data = joblib.load(filepath)
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         
         self.health_regressor = model_data['health_regressor']
         self.carbon_regressor = model_data['carbon_regressor']
@@ -1,12 +1,10 @@
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, mean_squared_error
 import joblib
 import logging
 from datetime import datetime, timedelta
+from feature_assembly import feature_assembler
 
 class CoastalThreatModel:
     def __init__(self):
@@ -34,6 +32,7 @@ class CoastalThreatModel:
 
     def generate_synthetic_data(self, n_samples=2000):
         """Generate synthetic coastal threat data for training"""
+        import pandas as pd
         np.random.seed(42)
         
         # Generate base features
@@ -132,20 +131,13 @@ class CoastalThreatModel:
         return threat, max(0, severity)
 
     def preprocess_data(self, data):
-        """Preprocess input data for model"""
-        if isinstance(data, dict):
-            # Convert single prediction input
-            features = [data.get(feature, 0) for feature in self.feature_names]
-            return np.array(features).reshape(1, -1)
-        elif isinstance(data, pd.DataFrame):
-            # Convert DataFrame
-            return data[self.feature_names].values
-        else:
-            # Assume it's already a numpy array
-            return data
+        """Preprocess input data for model (missing features are handled per CTAS_MISSING_FEATURES)"""
+        return feature_assembler(self.feature_names).assemble(data)
 
     def train(self, data=None):
         """Train the coastal threat prediction models"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report, mean_squared_error
         if data is None:
             self.logger.info("Generating synthetic training data...")
             data = self.generate_synthetic_data()
@@ -190,8 +182,8 @@ class CoastalThreatModel:
             'feature_importance': dict(zip(self.feature_names, self.threat_classifier.feature_importances_))
         }
 
-    def predict_threat(self, features):
-        """Predict coastal threat type and severity"""
+    def predict_threat(self, features, profile='full'):
+        """Predict coastal threat type and severity ('minimal' profile: labels and scores only)"""
         if not self.is_trained:
             raise ValueError("Model must be trained before making predictions")
         
@@ -213,6 +205,14 @@ class CoastalThreatModel:
         # Calculate overall risk level
         risk_level = self.calculate_risk_level(severity_score, threat_confidence)
         
+        if profile == 'minimal':
+            return {
+                'primary_threat': most_likely_threat,
+                'threat_confidence': threat_confidence,
+                'severity_score': severity_score,
+                'risk_level': risk_level
+            }
+        
         return {
             'primary_threat': most_likely_threat,
             'threat_confidence': threat_confidence,
@@ -382,9 +382,9 @@ class CoastalThreatModel:
         joblib.dump(model_data, filepath)
         self.logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath):
+    def load_model(self, filepath, mmap_mode=None):
         """Load trained model from file"""
-        model_data = joblib.load(filepath)
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         
         self.threat_classifier = model_data['threat_classifier']
         self.severity_regressor = model_data['severity_regressor']
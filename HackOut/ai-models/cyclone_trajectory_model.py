@@ -1,12 +1,10 @@
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, classification_report
 import joblib
 import logging
 from datetime import datetime, timedelta
+from feature_assembly import feature_assembler
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -61,6 +59,7 @@ class CycloneTrajectoryModel:
 
     def generate_synthetic_data(self, n_samples=5000):
         """Generate synthetic cyclone trajectory data"""
+        import pandas as pd
         np.random.seed(42)
         
         # Generate cyclone tracks starting in typical formation areas
@@ -206,17 +205,13 @@ class CycloneTrajectoryModel:
             return 'category_5'
 
     def preprocess_data(self, data):
-        """Preprocess input data for model"""
-        if isinstance(data, dict):
-            features = [data.get(feature, 0) for feature in self.feature_names]
-            return np.array(features).reshape(1, -1)
-        elif isinstance(data, pd.DataFrame):
-            return data[self.feature_names].values
-        else:
-            return data
+        """Preprocess input data for model (missing features are handled per CTAS_MISSING_FEATURES)"""
+        return feature_assembler(self.feature_names).assemble(data)
 
     def train(self, data=None):
         """Train the cyclone trajectory prediction models"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_squared_error, classification_report
         if data is None:
             self.logger.info("Generating synthetic training data...")
             data = self.generate_synthetic_data()
@@ -284,8 +279,8 @@ class CycloneTrajectoryModel:
             'feature_importance_lon': dict(zip(self.feature_names, self.path_regressor_lon.feature_importances_))
         }
 
-    def predict_trajectory(self, features, forecast_hours=72):
-        """Predict cyclone trajectory and intensity"""
+    def predict_trajectory(self, features, forecast_hours=72, profile='full'):
+        """Predict cyclone trajectory and intensity ('minimal' profile: track points and categories only)"""
         if not self.is_trained:
             raise ValueError("Model must be trained before prediction")
         
@@ -304,6 +299,17 @@ class CycloneTrajectoryModel:
             
             # Predict intensity
             intensity_category = self.intensity_classifier.predict(X_scaled)[0]
+            
+            if profile == 'minimal':
+                predictions.append({
+                    'forecast_hour': hours,
+                    'predicted_lat': float(next_lat),
+                    'predicted_lon': float(next_lon),
+                    'intensity_category': intensity_category
+                })
+                current_features = self.update_features_for_next_step(current_features, next_lat, next_lon, hours)
+                continue
+            
             intensity_probabilities = self.intensity_classifier.predict_proba(X_scaled)[0]
             intensity_prob_dict = dict(zip(self.intensity_categories, intensity_probabilities))
             
@@ -326,6 +332,9 @@ class CycloneTrajectoryModel:
             # Update features for next iteration
             current_features = self.update_features_for_next_step(current_features, next_lat, next_lon, hours)
         
+        if profile == 'minimal':
+            return {'predictions': predictions}
+        
         # Calculate additional trajectory metrics
         trajectory_analysis = self.analyze_trajectory(predictions, features)
         
@@ -664,9 +673,9 @@ class CycloneTrajectoryModel:
         joblib.dump(model_data, filepath)
         self.logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath):
+    def load_model(self, filepath, mmap_mode=None):
         """Load trained model"""
-        model_data = joblib.load(filepath)
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         
         self.path_regressor_lat = model_data['path_regressor_lat']
         self.path_regressor_lon = model_data['path_regressor_lon']
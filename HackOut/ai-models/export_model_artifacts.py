@@ -0,0 +1,87 @@
+"""
+CTAS Model Artifact Export
+Trains each model once and writes <model_name>.pkl artifacts that the API loads at startup
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Model name -> (module file, class name)
+MODEL_SOURCES = {
+    'algal_bloom': ('algal_bloom_predictor.py', 'AlgalBloomPredictor'),
+    'sea_level': ('sea_level_anomaly_detector.py', 'SeaLevelAnomalyDetector'),
+    'cyclone': ('cyclone_trajectory_model.py', 'CycloneTrajectoryModel'),
+    'pollution': ('pollution_event_classifier.py', 'PollutionEventClassifier'),
+    'blue_carbon': ('blue_carbon_health_monitor.py', 'BlueCarbonHealthMonitor'),
+    'coastal_threat': ('coastal-threat-model.py', 'CoastalThreatModel'),
+    'mangrove_health': ('mangrove-health-model.py', 'MangroveHealthModel')
+}
+
+
+def load_model_class(model_name):
+    """
+    Import a model class by file path (works for the hyphenated module names too)
+
+    The module is registered under its underscored name, so it is executed
+    once per process and pickles can refer to its classes.
+    """
+    filename, class_name = MODEL_SOURCES[model_name]
+    module_name = os.path.splitext(filename)[0].replace('-', '_')
+    module = sys.modules.get(module_name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(MODELS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+    return getattr(module, class_name)
+
+
+def export_artifacts(output_dir, model_names=None):
+    """Train the requested models and save one artifact per model"""
+    os.makedirs(output_dir, exist_ok=True)
+    report = {}
+
+    for model_name in model_names or MODEL_SOURCES:
+        started = time.perf_counter()
+        try:
+            model = load_model_class(model_name)()
+            model.train()
+            filepath = os.path.join(output_dir, f"{model_name}.pkl")
+            model.save_model(filepath)
+            report[model_name] = {
+                'artifact': filepath,
+                'training_time_s': round(time.perf_counter() - started, 2),
+                'size_bytes': os.path.getsize(filepath)
+            }
+        except Exception as e:
+            logger.error(f"Failed to export {model_name}: {e}")
+            report[model_name] = {'error': str(e)}
+
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Train CTAS models and export artifacts for the API")
+    parser.add_argument('--output-dir', default=os.getenv('CTAS_MODEL_DIR', os.path.join(MODELS_DIR, 'models')))
+    parser.add_argument('--models', nargs='*', choices=list(MODEL_SOURCES), help="Models to export (default: all)")
+    args = parser.parse_args()
+
+    results = export_artifacts(args.output_dir, args.models)
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"✗ {name}: {result['error']}")
+        else:
+            print(f"✓ {name}: {result['artifact']} ({result['size_bytes'] / 1e6:.1f} MB, {result['training_time_s']} s)")
@@ -1,11 +1,10 @@
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, IsolationForest
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 import joblib
 import logging
 from datetime import datetime, timedelta
+from feature_assembly import feature_assembler
 
 class MangroveHealthModel:
     def __init__(self):
@@ -25,6 +24,7 @@ class MangroveHealthModel:
 
     def generate_synthetic_data(self, n_samples=1000):
         """Generate synthetic mangrove health data for training"""
+        import pandas as pd
         np.random.seed(42)
         
         # Generate features
@@ -64,20 +64,12 @@ class MangroveHealthModel:
         return df
 
     def preprocess_data(self, data):
-        """Preprocess input data for model"""
-        if isinstance(data, dict):
-            # Convert single prediction input
-            features = [data.get(feature, 0) for feature in self.feature_names]
-            return np.array(features).reshape(1, -1)
-        elif isinstance(data, pd.DataFrame):
-            # Convert DataFrame
-            return data[self.feature_names].values
-        else:
-            # Assume it's already a numpy array
-            return data
+        """Preprocess input data for model (missing features are handled per CTAS_MISSING_FEATURES)"""
+        return feature_assembler(self.feature_names).assemble(data)
 
     def train(self, data=None):
         """Train the mangrove health prediction model"""
+        from sklearn.model_selection import train_test_split
         if data is None:
             self.logger.info("Generating synthetic training data...")
             data = self.generate_synthetic_data()
@@ -116,8 +108,8 @@ class MangroveHealthModel:
             'feature_importance': dict(zip(self.feature_names, self.health_model.feature_importances_))
         }
 
-    def predict_health(self, features):
-        """Predict mangrove health score"""
+    def predict_health(self, features, profile='full'):
+        """Predict mangrove health score ('minimal' profile: labels and scores only)"""
         if not self.is_trained:
             raise ValueError("Model must be trained before making predictions")
         
@@ -127,6 +119,13 @@ class MangroveHealthModel:
         health_score = self.health_model.predict(X_scaled)[0]
         is_anomaly = self.anomaly_detector.predict(X_scaled)[0] == -1
         
+        if profile == 'minimal':
+            return {
+                'health_score': max(0, min(100, health_score)),
+                'health_category': self.categorize_health(health_score),
+                'is_anomaly': bool(is_anomaly)
+            }
+        
         # Calculate confidence based on feature values
         confidence = self.calculate_confidence(features)
         
@@ -285,9 +284,9 @@ class MangroveHealthModel:
         joblib.dump(model_data, filepath)
         self.logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath):
+    def load_model(self, filepath, mmap_mode=None):
         """Load trained model from file"""
-        model_data = joblib.load(filepath)
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         
         self.health_model = model_data['health_model']
         self.anomaly_detector = model_data['anomaly_detector']
@@ -1,12 +1,10 @@
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import RandomForestClassifier, IsolationForest
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
 import joblib
 import logging
 from datetime import datetime, timedelta
+from feature_assembly import feature_assembler
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -70,6 +68,7 @@ class PollutionEventClassifier:
 
     def generate_synthetic_data(self, n_samples=4000):
         """Generate synthetic pollution event data"""
+        import pandas as pd
         np.random.seed(42)
         
         # Generate base environmental conditions
@@ -260,17 +259,13 @@ class PollutionEventClassifier:
         return event_type, max(0, severity)
 
     def preprocess_data(self, data):
-        """Preprocess input data for model"""
-        if isinstance(data, dict):
-            features = [data.get(feature, 0) for feature in self.feature_names]
-            return np.array(features).reshape(1, -1)
-        elif isinstance(data, pd.DataFrame):
-            return data[self.feature_names].values
-        else:
-            return data
+        """Preprocess input data for model (missing features are handled per CTAS_MISSING_FEATURES)"""
+        return feature_assembler(self.feature_names).assemble(data)
 
     def train(self, data=None):
         """Train the pollution event classification model"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report, accuracy_score
         if data is None:
             self.logger.info("Generating synthetic training data...")
             data = self.generate_synthetic_data()
@@ -316,8 +311,8 @@ class PollutionEventClassifier:
             'feature_importance': dict(zip(self.feature_names, self.pollution_classifier.feature_importances_))
         }
 
-    def classify_pollution(self, features):
-        """Classify pollution event type and assess severity"""
+    def classify_pollution(self, features, profile='full'):
+        """Classify pollution event type and assess severity ('minimal' profile: labels and scores only)"""
         if not self.is_trained:
             raise ValueError("Model must be trained before classification")
         
@@ -339,6 +334,15 @@ class PollutionEventClassifier:
         # Calculate severity based on indicators
         severity = self.calculate_pollution_severity(features, pollution_type)
         
+        if profile == 'minimal':
+            return {
+                'pollution_type': pollution_type,
+                'pollution_severity': float(severity),
+                'is_anomalous_pattern': is_anomalous,
+                'anomaly_score': float(anomaly_score),
+                'risk_level': self.determine_risk_level(pollution_type, severity)
+            }
+        
         # Assess environmental impact
         impact_assessment = self.assess_environmental_impact(features, pollution_type, severity)
         
@@ -586,9 +590,9 @@ class PollutionEventClassifier:
         joblib.dump(model_data, filepath)
         self.logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath):
+    def load_model(self, filepath, mmap_mode=None):
         """Load trained model"""
-        model_data = joblib.load(filepath)
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         
         self.pollution_classifier = model_data['pollution_classifier']
         self.anomaly_detector = model_data['anomaly_detector']
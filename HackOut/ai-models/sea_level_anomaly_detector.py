@@ -1,12 +1,10 @@
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
 import joblib
 import logging
 from datetime import datetime, timedelta
+from feature_assembly import feature_assembler
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -52,6 +50,7 @@ class SeaLevelAnomalyDetector:
 
     def generate_synthetic_data(self, n_samples=5000):
         """Generate synthetic sea level data with anomalies"""
+        import pandas as pd
         np.random.seed(42)
         
         # Generate normal sea level patterns
@@ -123,17 +122,13 @@ class SeaLevelAnomalyDetector:
         return df
 
     def preprocess_data(self, data):
-        """Preprocess input data for model"""
-        if isinstance(data, dict):
-            features = [data.get(feature, 0) for feature in self.feature_names]
-            return np.array(features).reshape(1, -1)
-        elif isinstance(data, pd.DataFrame):
-            return data[self.feature_names].values
-        else:
-            return data
+        """Preprocess input data for model (missing features are handled per CTAS_MISSING_FEATURES)"""
+        return feature_assembler(self.feature_names).assemble(data)
 
     def train(self, data=None):
         """Train the sea level anomaly detection model"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report
         if data is None:
             self.logger.info("Generating synthetic training data...")
             data = self.generate_synthetic_data()
@@ -159,8 +154,8 @@ class SeaLevelAnomalyDetector:
         self.is_trained = True
         return {'status': 'trained', 'feature_count': len(self.feature_names)}
 
-    def detect_anomaly(self, features):
-        """Detect sea level anomalies"""
+    def detect_anomaly(self, features, profile='full'):
+        """Detect sea level anomalies ('minimal' profile: labels and scores only)"""
         if not self.is_trained:
             raise ValueError("Model must be trained before detection")
         
@@ -177,6 +172,14 @@ class SeaLevelAnomalyDetector:
         # Calculate confidence (inverse of anomaly score)
         confidence = max(0, min(1, (anomaly_score + 0.5) / 1.0))
         
+        if profile == 'minimal':
+            return {
+                'is_anomaly': anomaly_prediction == -1,
+                'anomaly_score': float(anomaly_score),
+                'severity': severity,
+                'confidence': float(confidence)
+            }
+        
         return {
             'is_anomaly': anomaly_prediction == -1,
             'anomaly_score': float(anomaly_score),
@@ -304,9 +307,9 @@ class SeaLevelAnomalyDetector:
         joblib.dump(model_data, filepath)
         self.logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath):
+    def load_model(self, filepath, mmap_mode=None):
         """Load trained model"""
-        model_data = joblib.load(filepath)
+        model_data = joblib.load(filepath, mmap_mode=mmap_mode)
         
         self.anomaly_detector = model_data['anomaly_detector']
         self.scaler = model_data['scaler']
@@ -0,0 +1,59 @@
+"""
+Shared fixtures: a small trained algal bloom model and an API client serving
+it from a temporary model directory
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+AI_MODELS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (AI_MODELS_DIR, os.path.join(AI_MODELS_DIR, 'api')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(scope='session')
+def algal_bloom_model():
+    """AlgalBloomPredictor trained on its synthetic data with fewer trees"""
+    from algal_bloom_predictor import AlgalBloomPredictor
+
+    model = AlgalBloomPredictor()
+    model.bloom_classifier.n_estimators = 20
+    model.severity_regressor.n_estimators = 20
+    model.train()
+    return model
+
+
+@pytest.fixture(scope='session')
+def bloom_csv(algal_bloom_model) -> bytes:
+    """20 rows of algal bloom features as a CSV upload"""
+    data = algal_bloom_model.generate_synthetic_data(20)[algal_bloom_model.feature_names]
+    return data.to_csv(index=False).encode()
+
+
+@pytest.fixture(scope='session')
+def api_client(tmp_path_factory, algal_bloom_model):
+    """TestClient of the app serving the algal bloom model (other models have no artifact)"""
+    model_dir = tmp_path_factory.mktemp('models')
+    algal_bloom_model.save_model(str(model_dir / 'algal_bloom.pkl'))
+    # Read when main is imported
+    os.environ.update({
+        'CTAS_MODEL_DIR': str(model_dir),
+        'CTAS_BULK_JOBS_DIR': str(tmp_path_factory.mktemp('bulk_jobs')),
+        'CTAS_STATION_REFRESH_S': '0',
+        'CTAS_CACHE_MAX_ENTRIES': '0'
+    })
+    import main
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 60
+        while not main.startup_report['completed'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert main.model_ready('algal_bloom')
+        # Tests monkeypatch model calls; a cached result would leak into later tests
+        assert not main.prediction_cache.enabled
+        yield client
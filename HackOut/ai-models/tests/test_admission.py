@@ -0,0 +1,19 @@
+from admission import PriorityResolver
+
+
+def test_unkeyed_requests_default_to_high_and_background_paths_to_low():
+    resolver = PriorityResolver(api_key_priorities={'batch-key': 'low'}, allow_header=True)
+
+    assert resolver.resolve({}, '/predict/algal-bloom') == 'high'
+    assert resolver.resolve({}, '/predict/ensemble') == 'high'
+    assert resolver.resolve({}, '/predict/grid') == 'low'
+    assert resolver.resolve({'x-ctas-priority': 'high'}, '/predict/grid') == 'high'
+    assert resolver.resolve({'x-ctas-priority': 'low'}, '/predict/algal-bloom') == 'low'
+    assert resolver.resolve({'x-api-key': 'batch-key', 'x-ctas-priority': 'high'}, '/predict/algal-bloom') == 'low'
+
+
+def test_default_priority_is_configurable():
+    resolver = PriorityResolver(api_key_priorities={}, default_priority='low', background_paths=())
+
+    assert resolver.resolve({}, '/predict/grid') == 'low'
+    assert resolver.resolve({'x-ctas-priority': 'high'}, '/predict/grid') == 'high'
@@ -0,0 +1,115 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from algal_bloom_predictor import ENVIRONMENT_DEFAULTS
+from tree_inference import compile_model
+
+# Values the single-row path compares readings against (assess_environmental_risks and generate_recommendations)
+READING_CUTOFFS = {
+    'chlorophyll_a': [5, 15, 30, 50],
+    'dissolved_oxygen': [3, 4, 5],
+    'ph_level': [7.5, 8.5],
+    'nitrate_nitrogen': [2, 3, 5, 8],
+    'water_temperature': [26]
+}
+
+
+@pytest.fixture(scope='module', params=['sklearn', 'compiled'])
+def model(request, algal_bloom_model):
+    if request.param == 'sklearn':
+        return algal_bloom_model
+    compiled = copy.deepcopy(algal_bloom_model)
+    compile_model(compiled)
+    return compiled
+
+
+@pytest.fixture(scope='module')
+def threshold_rows(algal_bloom_model):
+    """Rows of every predicted bloom type with each reading on, just below and just above each cut-off"""
+    model = algal_bloom_model
+    data = model.generate_synthetic_data(600)[model.feature_names].astype(float)
+    predicted = model.predict_bloom_batch(data).bloom_type
+    bases = [data.iloc[np.nonzero(predicted == bloom_type)[0][0]].to_dict() for bloom_type in np.unique(predicted)]
+
+    rows = []
+    for base in bases:
+        rows.append(base)
+        for reading, cutoffs in READING_CUTOFFS.items():
+            for cutoff in cutoffs:
+                for value in (np.nextafter(cutoff, -np.inf), float(cutoff), np.nextafter(cutoff, np.inf)):
+                    # Nutrients are nitrate + phosphate
+                    rows.append({**base, reading: float(value), 'phosphate_phosphorus': 0.0}
+                                if reading == 'nitrate_nitrogen' else {**base, reading: float(value)})
+    return rows + data.iloc[:200].to_dict('records')
+
+
+@pytest.mark.parametrize('profile', ['full', 'minimal'])
+def test_batch_matches_single_rows_for_dicts(model, threshold_rows, profile):
+    # Without the readings the single-row path fills with defaults, and with int values
+    rows = threshold_rows + [{k: v for k, v in row.items() if k not in ENVIRONMENT_DEFAULTS}
+                             for row in threshold_rows[::3]]
+    rows += [{k: int(v) for k, v in row.items()} for row in threshold_rows[:20]]
+
+    result = model.predict_bloom_batch(rows, profile=profile)
+
+    assert len(result) == len(rows)
+    for i, row in enumerate(rows):
+        assert result.row(i) == model.predict_bloom(row, profile=profile)
+
+
+@pytest.mark.parametrize('profile', ['full', 'minimal'])
+def test_batch_matches_single_rows_for_frames_and_arrays(model, threshold_rows, profile):
+    frame = pd.DataFrame(threshold_rows)
+    expected = [model.predict_bloom(row, profile=profile) for row in threshold_rows]
+
+    for data in (frame, frame[model.feature_names].to_numpy()):
+        result = model.predict_bloom_batch(data, profile=profile)
+        assert result.rows() == expected
+        assert list(result) == expected
+
+
+def test_matrix_with_feature_dicts_uses_single_row_defaults(model, threshold_rows):
+    rows = [{k: v for k, v in row.items() if k != 'dissolved_oxygen'} for row in threshold_rows[:30]]
+    X = model.preprocess_data(rows)
+
+    result = model.predict_bloom_batch(X, features=rows)
+
+    assert result.rows() == [model.predict_bloom(row) for row in rows]
+
+
+def test_risk_tiers_match_single_row_rules(algal_bloom_model):
+    model = algal_bloom_model
+    cutoffs = [30, 40, 50, 60, 70, 80]
+    severities = np.unique(np.concatenate([
+        np.linspace(0, 100, 401),
+        [np.nextafter(c, direction) for c in cutoffs for direction in (-np.inf, np.inf)]
+    ]))
+    bloom_types = np.repeat(model.bloom_types, len(severities)).astype(object)
+    severities = np.tile(severities, len(model.bloom_types))
+
+    risk_levels = model.determine_risk_levels(bloom_types, severities)
+    priorities = model.determine_monitoring_priorities(bloom_types, severities)
+
+    for bloom_type, severity, risk_level, priority in zip(bloom_types, severities, risk_levels, priorities):
+        assert risk_level == model.determine_risk_level(bloom_type, severity)
+        assert priority == model.determine_monitoring_priority(bloom_type, severity)
+
+
+def test_severity_regressor_runs_on_blooming_rows_only(algal_bloom_model, threshold_rows, monkeypatch):
+    model = copy.deepcopy(algal_bloom_model)
+    called_with = []
+    predict = model.severity_regressor.predict
+    monkeypatch.setattr(model.severity_regressor, 'predict', lambda X: called_with.append(len(X)) or predict(X))
+
+    result = model.predict_bloom_batch(threshold_rows)
+
+    assert called_with == [int(np.sum(result.bloom_type != 'no_bloom'))]
+    assert (result.bloom_severity[result.bloom_type == 'no_bloom'] == 0).all()
+
+
+def test_empty_batch(algal_bloom_model):
+    assert len(algal_bloom_model.predict_bloom_batch([])) == 0
+    assert algal_bloom_model.predict_bloom_batch(np.empty((0, 16))).rows() == []
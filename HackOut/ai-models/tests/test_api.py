@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def bloom_rows(algal_bloom_model):
+    """Synthetic feature dicts and the predictor's own full-profile prediction of each"""
+    data = algal_bloom_model.generate_synthetic_data(400)
+    rows = data[algal_bloom_model.feature_names].astype(float).to_dict('records')
+    return [(row, algal_bloom_model.predict_bloom(row)) for row in rows]
+
+
+def first_row(bloom_rows, condition):
+    return next((row, prediction) for row, prediction in bloom_rows if condition(prediction))
+
+
+@pytest.mark.parametrize('profile', ['full', 'minimal'])
+def test_ensemble_counts_bloom_severity(api_client, bloom_rows, profile):
+    row, prediction = first_row(bloom_rows, lambda p: p['bloom_type'] != 'no_bloom' and p['risk_level'] != 'low')
+    response = api_client.post(f'/predict/ensemble?profile={profile}', json={
+        'location': {'latitude': 36.9, 'longitude': -76.0},
+        'environmental_data': row
+    })
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body['member_status']['algal_bloom'] == 'ok'
+    # The algal bloom model is the only member with an artifact
+    assert body['combined_severity'] == pytest.approx(prediction['bloom_severity'])
+    assert body['combined_severity'] > 0
+    assert 'algal_bloom' in body['priority_threats']
+
+
+def test_ensemble_ignores_no_bloom(api_client, bloom_rows):
+    row, _ = first_row(bloom_rows, lambda p: p['bloom_type'] == 'no_bloom')
+    body = api_client.post('/predict/ensemble', json={
+        'location': {'latitude': 36.9, 'longitude': -76.0},
+        'environmental_data': row
+    }).json()
+
+    assert body['combined_severity'] == 0
+    assert 'algal_bloom' not in body['priority_threats']
+
+
+def expected_bloom_response(prediction):
+    probabilities = prediction['bloom_probabilities']
+    return {
+        'bloom_type': prediction['bloom_type'],
+        'bloom_probability': pytest.approx(1 - probabilities['no_bloom']),
+        'severity_score': pytest.approx(prediction['bloom_severity']),
+        'risk_level': prediction['risk_level'],
+        'confidence': pytest.approx(probabilities[prediction['bloom_type']] * 100)
+    }
+
+
+def test_bloom_response_reports_prediction(api_client, bloom_rows):
+    for row, prediction in (first_row(bloom_rows, lambda p: p['risk_level'] != 'low'),
+                            first_row(bloom_rows, lambda p: p['bloom_type'] == 'no_bloom')):
+        body = api_client.post('/predict/algal-bloom', json=row).json()
+        minimal = api_client.post('/predict/algal-bloom?profile=minimal', json=row).json()
+
+        assert {key: body[key] for key in expected_bloom_response(prediction)} == expected_bloom_response(prediction)
+        assert minimal['bloom_severity'] == pytest.approx(body['severity_score'])
+        assert minimal['risk_level'] == body['risk_level']
+
+
+def test_bloom_batch_matches_single_rows(api_client, bloom_rows):
+    rows = bloom_rows[:50]
+    body = api_client.post('/predict/algal-bloom/batch', json={'items': [row for row, _ in rows]}).json()
+
+    assert body['succeeded'] == len(rows)
+    for result, (_, prediction) in zip(body['results'], rows):
+        expected = expected_bloom_response(prediction)
+        assert {key: result['prediction'][key] for key in expected} == expected
+
+
+def with_deadline(deadline, coroutine_fn, *args):
+    """Run coroutine_fn(*args) as a request with an absolute deadline (None: no deadline)"""
+    from deadlines import request_deadline
+
+    async def run():
+        request_deadline.set(deadline)
+        started = time.perf_counter()
+        try:
+            return await coroutine_fn(*args), time.perf_counter() - started
+        except Exception as e:
+            return e, time.perf_counter() - started
+    return run()
+
+
+def test_coalesced_prediction_keeps_each_callers_deadline(api_client, monkeypatch):
+    import main
+    from deadlines import DeadlineExceededError, request_deadline
+
+    async def slow_submit(model_name, features, profile):
+        # Like the micro-batcher: a row whose deadline passed while queued is dropped
+        await asyncio.sleep(0.2)
+        deadline = request_deadline.get()
+        if deadline is not None and deadline <= time.perf_counter():
+            raise DeadlineExceededError(f'{model_name} inference')
+        return {'bloom_type': 'no_bloom'}
+
+    monkeypatch.setattr(main.micro_batcher, 'submit', slow_submit)
+    features = {'chlorophyll_a': 1.0}
+
+    async def run():
+        # The caller with the shortest deadline starts the computation
+        short = asyncio.ensure_future(
+            with_deadline(time.perf_counter() + 0.05, main.predict_features, 'algal_bloom', 'predict_bloom', features))
+        await asyncio.sleep(0.01)
+        return await asyncio.gather(
+            short,
+            with_deadline(None, main.predict_features, 'algal_bloom', 'predict_bloom', features),
+            with_deadline(time.perf_counter() + 5, main.predict_features, 'algal_bloom', 'predict_bloom', features)
+        )
+    (short, short_s), (unbounded, _), (long, _) = asyncio.run(run())
+
+    assert isinstance(short, DeadlineExceededError) and short_s < 0.15
+    assert unbounded == {'bloom_type': 'no_bloom'}
+    assert long == {'bloom_type': 'no_bloom'}
+
+
+def test_coalesced_ensemble_callers_stop_at_their_deadline(api_client, monkeypatch):
+    import main
+
+    async def slow_members(context, profile='full'):
+        # Ignores the deadline it runs under
+        await asyncio.sleep(0.3)
+        return {}, {name: 'unavailable' for name in main.ENSEMBLE_MEMBERS}
+
+    monkeypatch.setattr(main, 'run_ensemble_members', slow_members)
+    request = main.EnsemblePredictionInput(location={'latitude': 36.9, 'longitude': -76.0}, environmental_data={})
+    coalesced = main.single_flight.stats['coalesced']
+
+    async def run():
+        deadline = time.perf_counter() + 0.05
+        return await asyncio.gather(*(with_deadline(deadline, main.predict_ensemble, request, 'minimal')
+                                      for _ in range(2)))
+    results = asyncio.run(run())
+
+    assert main.single_flight.stats['coalesced'] == coalesced + 1
+    for error, elapsed_s in results:
+        assert error.status_code == 504
+        assert elapsed_s < 0.2
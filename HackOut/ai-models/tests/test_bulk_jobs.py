@@ -0,0 +1,59 @@
+import json
+import os
+
+from bulk_jobs import BulkJobManager
+
+
+def test_job_ids_cannot_leave_jobs_dir(tmp_path):
+    jobs_dir = tmp_path / 'jobs'
+    jobs_dir.mkdir()
+    # A finished-looking job record one level above the jobs directory
+    (tmp_path / 'job.json').write_text(json.dumps({'id': '..', 'status': 'completed'}))
+    manager = BulkJobManager(jobs_dir=str(jobs_dir))
+
+    for job_id in ('..', '.', '../jobs', 'ABC', ''):
+        assert manager.load(job_id) is None
+        assert manager.delete(job_id) is False
+        assert manager.cancel(job_id) is None
+    assert jobs_dir.is_dir() and (tmp_path / 'job.json').exists()
+
+
+def test_upload_above_limit_is_refused(api_client, bloom_csv, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.bulk_jobs, 'max_upload_bytes', len(bloom_csv) - 1)
+    before = set(os.listdir(main.bulk_jobs.jobs_dir))
+
+    response = api_client.post('/jobs/algal_bloom', content=bloom_csv, headers={'content-type': 'text/csv'})
+
+    assert response.status_code == 413
+    assert set(os.listdir(main.bulk_jobs.jobs_dir)) == before
+
+
+def test_upload_within_limit_is_accepted(api_client, bloom_csv, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.bulk_jobs, 'max_upload_bytes', len(bloom_csv))
+
+    response = api_client.post('/jobs/algal_bloom', content=bloom_csv, headers={'content-type': 'text/csv'})
+
+    assert response.status_code == 202, response.text
+    assert response.json()['total_rows'] == 20
+    api_client.delete(f"/jobs/{response.json()['id']}")
+
+
+def test_upload_limit_applies_to_streamed_bodies(tmp_path):
+    import asyncio
+
+    import pytest
+    from bulk_jobs import UploadTooLargeError
+
+    manager = BulkJobManager(jobs_dir=str(tmp_path))
+    manager.max_upload_bytes = 10
+
+    async def blocks():
+        for _ in range(3):
+            yield b'12345'
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(manager.save_upload(blocks(), str(tmp_path / 'input.csv')))
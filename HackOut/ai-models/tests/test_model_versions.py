@@ -0,0 +1,53 @@
+import json
+
+from model_versions import INITIAL_VERSION, ModelVersionStore
+
+
+def record_version(store, version):
+    store.add_version('algal_bloom', {'version': version, 'artifact': store.version_artifact('algal_bloom', version)})
+
+
+def test_rollback_follows_activation_history(tmp_path):
+    (tmp_path / 'algal_bloom.pkl').write_bytes(b'')
+    store = ModelVersionStore(str(tmp_path))
+    assert store.previous_version('algal_bloom') is None
+
+    # retrain -> rollback -> retrain -> rollback
+    record_version(store, 'v2')
+    store.set_active('algal_bloom', 'v2')
+    assert store.rollback('algal_bloom')['version'] == INITIAL_VERSION
+    record_version(store, 'v3')
+    store.set_active('algal_bloom', 'v3')
+    assert store.previous_version('algal_bloom')['version'] == INITIAL_VERSION
+    assert store.rollback('algal_bloom')['version'] == INITIAL_VERSION
+
+    assert store.active_version('algal_bloom')['version'] == INITIAL_VERSION
+    assert store.rollback('algal_bloom') is None
+
+
+def test_rollback_returns_to_an_older_activated_version(tmp_path):
+    store = ModelVersionStore(str(tmp_path))
+    for version in ('v1', 'v2', 'v3'):
+        record_version(store, version)
+    for version in ('v1', 'v3', 'v3', 'v2'):
+        store.set_active('algal_bloom', version)
+
+    assert store.rollback('algal_bloom')['version'] == 'v3'
+    assert store.rollback('algal_bloom')['version'] == 'v1'
+    assert store.rollback('algal_bloom') is None
+    assert store.active_version('algal_bloom')['version'] == 'v1'
+
+
+def test_manifest_without_history_starts_from_active(tmp_path):
+    store = ModelVersionStore(str(tmp_path))
+    record_version(store, 'v1')
+    record_version(store, 'v2')
+    manifest_path = tmp_path / 'versions' / 'algal_bloom' / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text())
+    manifest.pop('history')
+    manifest['active'] = 'v2'
+    manifest_path.write_text(json.dumps(manifest))
+
+    assert store.previous_version('algal_bloom') is None
+    store.set_active('algal_bloom', 'v1')
+    assert store.rollback('algal_bloom')['version'] == 'v2'
@@ -0,0 +1,50 @@
+import asyncio
+
+import station_snapshots
+from station_snapshots import StationSnapshots
+
+STATIONS = {
+    'A': {'name': 'Station A', 'latitude': 25.0, 'longitude': -80.0, 'source': 'coastal_flood'},
+    'B': {'name': 'Station B', 'latitude': 26.0, 'longitude': -81.0, 'source': 'coastal_flood'}
+}
+
+
+def test_streamed_readings_share_one_reassessment(monkeypatch):
+    monkeypatch.setattr(station_snapshots, 'load_stations', lambda: STATIONS)
+    snapshots = StationSnapshots(refresh_s=60, stale_after_s=180, station_ids=[], reading_refresh_s=0.1)
+    assessed = []
+
+    async def assess(context):
+        assessed.append(dict(context))
+        return {'combined_severity': context.get('water_temperature', 0)}
+
+    async def stream():
+        snapshots.start(assess)
+        while snapshots.stats['refreshes'] < 1:
+            await asyncio.sleep(0.01)
+        for temperature in range(20, 30):
+            snapshots.record_reading('A', {'water_temperature': temperature})
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.3)
+        snapshots.shutdown()
+
+    asyncio.run(stream())
+
+    # The full refresh, then one reassessment of A for all ten readings
+    assert len(assessed) == 3
+    assert assessed[-1]['water_temperature'] == 29 and assessed[-1]['latitude'] == 25.0
+    assert snapshots.get('A')['assessment'] == {'combined_severity': 29}
+    assert snapshots.stats['readings'] == 10
+
+
+def test_stream_readings_use_ensemble_context_fields(api_client):
+    import main
+
+    features = {'ndvi': 0.6, 'water_temp': 31.0, 'rainfall': 250.0, 'salinity': 30.0}
+    context = main.ensemble_context_fields('mangrove_health', features)
+
+    assert context == {'ndvi': 0.6, 'water_temperature': 31.0, 'monthly_rainfall': 250.0, 'salinity': 30.0}
+    assert main.extract_mangrove_features(context)['water_temp'] == 31.0
+    assert main.extract_mangrove_features(context)['rainfall'] == 250.0
+    bloom = {'water_temperature': 27.0, 'chlorophyll_a': 12.0}
+    assert main.ensemble_context_fields('algal_bloom', bloom) == bloom
@@ -0,0 +1,241 @@
+import copy
+import os
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import (
+    GradientBoostingClassifier, GradientBoostingRegressor, IsolationForest, RandomForestClassifier,
+    RandomForestRegressor
+)
+from sklearn.preprocessing import StandardScaler
+
+from tree_inference import (
+    CHECKED_METHODS, CompiledEnsemble, FoldedScaler, boundary_rows, compile_model, export_scaler_free
+)
+
+N_FEATURES = 6
+
+
+def training_data(seed=0, n_rows=400):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, N_FEATURES)) * [1, 10, 0.1, 100, 1, 5] + [0, 50, 0, -20, 3, 0]
+    signal = X[:, 0] + X[:, 1] / 10 - X[:, 2] * 5
+    return X, signal, rng
+
+
+def fitted_estimators():
+    X, signal, rng = training_data()
+    three_classes = np.digitize(signal, np.quantile(signal, [1 / 3, 2 / 3]))
+    labels = np.array(['calm', 'watch', 'warning'])[three_classes]
+    return {
+        'random_forest_classifier': RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X, labels),
+        'random_forest_regressor': RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(X, signal),
+        'gradient_boosting_regressor': GradientBoostingRegressor(n_estimators=20, random_state=0).fit(X, signal),
+        'gradient_boosting_binary': GradientBoostingClassifier(n_estimators=20, random_state=0).fit(
+            X, signal > np.median(signal)),
+        'gradient_boosting_multiclass': GradientBoostingClassifier(n_estimators=20, random_state=0).fit(X, labels),
+        'isolation_forest': IsolationForest(n_estimators=25, random_state=0).fit(X),
+        'isolation_forest_feature_subsets': IsolationForest(n_estimators=25, max_features=0.5, random_state=0).fit(X)
+    }
+
+
+ESTIMATORS = fitted_estimators()
+
+
+def assert_bit_identical(expected, actual):
+    actual = np.ascontiguousarray(actual)
+    assert actual.dtype == expected.dtype
+    assert actual.shape == expected.shape
+    assert actual.tobytes() == expected.tobytes()
+
+
+def probe(n_rows, seed=1):
+    X, _, _ = training_data(seed, n_rows)
+    return X
+
+
+@pytest.mark.parametrize('name', ESTIMATORS)
+@pytest.mark.parametrize('n_rows', [1, 100, 500])
+def test_compiled_matches_sklearn(name, n_rows):
+    estimator = ESTIMATORS[name]
+    # max_rows=0: every batch, including those above the default max_rows, runs natively
+    compiled = CompiledEnsemble(estimator, max_rows=0)
+    X = probe(n_rows)
+
+    for method in CHECKED_METHODS:
+        if hasattr(estimator, method):
+            assert_bit_identical(getattr(estimator, method)(X), getattr(compiled, method)(X))
+
+
+def exact_threshold_rows(compiled, base):
+    """Rows holding the float64 split thresholds themselves, which float32 rounds to either side"""
+    trees = compiled.trees
+    splits = np.nonzero(trees.children[0::2] != np.arange(len(trees.feature)))[0]
+    X = base[np.arange(len(splits)) % len(base)].copy()
+    X[np.arange(len(splits)), trees.feature[splits]] = trees.threshold[splits]
+    return X
+
+
+@pytest.mark.parametrize('name', ESTIMATORS)
+def test_compiled_matches_sklearn_on_split_thresholds(name):
+    estimator = ESTIMATORS[name]
+    compiled = CompiledEnsemble(estimator, max_rows=0)
+    base = probe(50)
+    X = np.concatenate([boundary_rows(compiled, base, n_rows=400), exact_threshold_rows(compiled, base)])
+    assert len(X)
+
+    for method in CHECKED_METHODS:
+        if hasattr(estimator, method):
+            assert_bit_identical(getattr(estimator, method)(X), getattr(compiled, method)(X))
+            assert_bit_identical(getattr(estimator, method)(X[:1]), getattr(compiled, method)(X[:1]))
+
+
+@pytest.mark.parametrize('name', ESTIMATORS)
+def test_batches_above_max_rows_use_sklearn(name):
+    estimator = ESTIMATORS[name]
+    compiled = CompiledEnsemble(estimator, max_rows=64)
+    X = probe(65)
+
+    # Compiled trees never touch the large batch
+    compiled.trees = None
+    assert_bit_identical(estimator.predict(X), compiled.predict(X))
+    with pytest.raises(AttributeError):
+        compiled.predict(X[:64])
+
+
+def test_compiled_ensemble_is_inference_only():
+    compiled = CompiledEnsemble(ESTIMATORS['random_forest_regressor'])
+    X, signal, _ = training_data()
+
+    with pytest.raises(RuntimeError):
+        compiled.fit(X, signal)
+    assert compiled.n_estimators == 15
+    with pytest.raises(TypeError):
+        CompiledEnsemble(object())
+
+
+def test_compiled_ensembles_pickled_without_kind_still_load():
+    compiled = CompiledEnsemble(ESTIMATORS['isolation_forest'], max_rows=0)
+    state = dict(vars(compiled))
+    del state['kind']
+    restored = CompiledEnsemble.__new__(CompiledEnsemble)
+    restored.__setstate__(pickle.loads(pickle.dumps(state)))
+
+    assert restored.kind == 'isolation_forest'
+    X = probe(20)
+    assert_bit_identical(compiled.predict(X), restored.predict(X))
+
+
+def test_service_import_leaves_sklearn_unloaded():
+    api_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+    code = "import sys; import main, tree_inference; print('sklearn' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=api_dir, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == 'False'
+
+
+def test_compile_model_swaps_checked_estimators(algal_bloom_model):
+    model = copy.deepcopy(algal_bloom_model)
+    outcomes = compile_model(model, fold_scaler=False)
+
+    assert outcomes == {'bloom_classifier': 'compiled', 'severity_regressor': 'compiled'}
+    assert isinstance(model.bloom_classifier, CompiledEnsemble)
+    row = model.generate_synthetic_data(5)[model.feature_names].iloc[0].to_dict()
+    assert model.predict_bloom(row) == algal_bloom_model.predict_bloom(row)
+
+
+# Scaled models: each estimator refitted on StandardScaler output
+SCALER = StandardScaler().fit(training_data()[0])
+FLOAT32_MAX = np.finfo(np.float32).max
+
+
+def scaled_estimators():
+    X, signal, _ = training_data()
+    X = SCALER.transform(X)
+    three_classes = np.digitize(signal, np.quantile(signal, [1 / 3, 2 / 3]))
+    return {
+        'random_forest_classifier': RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(
+            X, three_classes),
+        'gradient_boosting_regressor': GradientBoostingRegressor(n_estimators=20, random_state=0).fit(X, signal),
+        'gradient_boosting_multiclass': GradientBoostingClassifier(n_estimators=20, random_state=0).fit(
+            X, three_classes),
+        'isolation_forest_feature_subsets': IsolationForest(n_estimators=25, max_features=0.5, random_state=0).fit(X)
+    }
+
+
+SCALED_ESTIMATORS = scaled_estimators()
+
+
+def extreme_rows(n_rows=40, seed=2):
+    """Raw rows far outside the training range whose scaled values still fit float32"""
+    rng = np.random.default_rng(seed)
+    magnitudes = 10.0 ** rng.integers(3, 30, size=(n_rows, N_FEATURES))
+    return rng.choice([-1, 1], size=(n_rows, N_FEATURES)) * magnitudes * SCALER.scale_
+
+
+@pytest.mark.parametrize('name', SCALED_ESTIMATORS)
+def test_folded_scaler_matches_scaling_then_sklearn(name):
+    estimator = SCALED_ESTIMATORS[name]
+    compiled = CompiledEnsemble(estimator, max_rows=0, scaler=SCALER)
+    base = probe(50)
+    # boundary_rows of folded trees: raw values on each folded cut-off and one float above it
+    X = np.concatenate([base, extreme_rows(), boundary_rows(compiled, base, n_rows=400)])
+
+    for method in CHECKED_METHODS:
+        if hasattr(estimator, method):
+            expected = getattr(estimator, method)(SCALER.transform(X))
+            assert_bit_identical(expected, getattr(compiled, method)(X))
+            assert_bit_identical(expected[:1], getattr(compiled, method)(X[:1]))
+
+
+@pytest.mark.parametrize('name', SCALED_ESTIMATORS)
+def test_folded_scaler_accepts_float32_overflow(name):
+    estimator = SCALED_ESTIMATORS[name]
+    compiled = CompiledEnsemble(estimator, max_rows=0, scaler=SCALER)
+    X = probe(5)
+    X[:, 1] = np.array([1e300, -1e300, 1e200, -1e45, 1e40]) * SCALER.scale_[1]
+
+    # The original pipeline rejects scaled values beyond float32
+    with pytest.raises(ValueError):
+        estimator.predict(SCALER.transform(X))
+    # Folded trees send them where float32's largest finite values go
+    clipped = np.clip(SCALER.transform(X), -FLOAT32_MAX, FLOAT32_MAX)
+    assert_bit_identical(estimator.predict(clipped), compiled.predict(X))
+    # Non-finite inputs are still rejected
+    X[0, 1] = np.inf
+    with pytest.raises(ValueError):
+        compiled.predict(X)
+
+
+def test_scaler_free_artifact_matches_original_pipeline(algal_bloom_model, tmp_path):
+    from algal_bloom_predictor import AlgalBloomPredictor
+
+    artifact = str(tmp_path / 'algal_bloom.pkl')
+    outcomes = export_scaler_free(copy.deepcopy(algal_bloom_model), artifact)
+    assert outcomes == {'bloom_classifier': 'compiled, scaler folded', 'severity_regressor': 'compiled, scaler folded'}
+
+    exported = AlgalBloomPredictor()
+    exported.load_model(artifact)
+    assert isinstance(exported.scaler, FoldedScaler)
+    assert isinstance(exported.bloom_classifier, CompiledEnsemble)
+
+    original = algal_bloom_model
+    data = original.generate_synthetic_data(60)[original.feature_names].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(3)
+    extremes = data[:20] + rng.choice([-1, 1], size=(20, data.shape[1])) * 10.0 ** rng.integers(
+        3, 25, size=(20, data.shape[1])) * original.scaler.scale_
+    for name in ('bloom_classifier', 'severity_regressor'):
+        compiled = getattr(exported, name)
+        X = np.concatenate([data, extremes, boundary_rows(compiled, data, n_rows=200)])
+        estimator = getattr(original, name)
+        for method in ('predict', 'predict_proba'):
+            if hasattr(estimator, method):
+                # Natively within max_rows, through the original scaler and sklearn above it
+                for rows in (X[:1], X[:compiled.max_rows], X):
+                    expected = getattr(estimator, method)(original.scaler.transform(rows))
+                    assert_bit_identical(expected, getattr(compiled, method)(exported.scaler.transform(rows)))
+
+    row = dict(zip(original.feature_names, data[0]))
+    assert exported.predict_bloom(row) == original.predict_bloom(row)
@@ -4,6 +4,22 @@ class AIService {
   constructor() {
     this.aiServiceURL = process.env.PYTHON_AI_SERVICE_URL || 'http://localhost:8000';
     this.timeout = 30000; // 30 seconds timeout
+    // Deadline sent to the AI service, a little under our own timeout so its partial result still arrives in time
+    this.deadlineMarginMs = 500;
+  }
+
+  /**
+   * Axios options for prediction calls: our timeout plus the matching server-side deadline,
+   * at high priority (dashboard calls are interactive; the AI service sheds low-priority work first)
+   */
+  predictionOptions() {
+    return {
+      timeout: this.timeout,
+      headers: {
+        'X-CTAS-Deadline-Ms': String(this.timeout - this.deadlineMarginMs),
+        'X-CTAS-Priority': 'high'
+      }
+    };
   }
 
   /**
@@ -53,7 +69,7 @@ class AIService {
       const response = await axios.post(
         `${this.aiServiceURL}/predict/coastal-threat`,
         payload,
-        { timeout: this.timeout }
+        this.predictionOptions()
       );
 
       return {
@@ -93,7 +109,7 @@ class AIService {
       const response = await axios.post(
         `${this.aiServiceURL}/predict/mangrove-health`,
         payload,
-        { timeout: this.timeout }
+        this.predictionOptions()
       );
 
       return {
@@ -140,7 +156,7 @@ class AIService {
       const response = await axios.post(
         `${this.aiServiceURL}/predict/algal-bloom`,
         payload,
-        { timeout: this.timeout }
+        this.predictionOptions()
       );
 
       return {
@@ -190,7 +206,7 @@ class AIService {
       const response = await axios.post(
         `${this.aiServiceURL}/predict/ensemble`,
         payload,
-        { timeout: this.timeout }
+        this.predictionOptions()
       );
 
       return {